@@ -1,33 +1,31 @@
-from flask import Flask, request, render_template, send_file, make_response
-import io
-import csv
+from flask import Flask, request, render_template, send_file, jsonify, url_for, Response
+from functools import wraps
+import hmac
+import mimetypes
 import os
-import tempfile
-from extractorv2 import extract_pathologies_from_pdf, extract_front_page_info, compose_final_report
-from datetime import datetime
+from pipeline import run_report_pipeline, run_extraction_pipeline, iter_items_csv
+from pdf_document import UNREADABLE_PDF_ERRORS
+from extractor_pathologies import RULES, DEFAULT_SEVERITIES
+from jobs import submit_job, get_job_store, STATUS_DONE
+from upload_workspace import create_request_workspace, request_workspace
+from pathology_index import get_pathology_index
+from tracing import metrics_text
+from extractorv2 import warm_report_templates
+from pdf_summary import generate_summary_page
 
 app = Flask(__name__)
 
-def items_to_csv(items):
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Número", "Tipo de Patología", "Descripción Corta", "Habitación", "Página"])
-    for item in items:
-        writer.writerow([item["code"], item["type"], item["description"], item["room"], item["page"]])
-    return output.getvalue()
+# Token de las consultas al índice (/pathologies, /properties/.../history), que
+# devuelven datos de clientes: sin token configurado esos endpoints no existen
+PATHOLOGY_API_TOKEN = os.getenv("PATHOLOGY_API_TOKEN", "")
 
 @app.route("/", methods=["GET"])
 def index():
     return render_template("index.html")
 
-@app.route("/process_pdf", methods=["POST"])
-def process_pdf():
-    file = request.files.get("pdf_file")
-    if not file:
-        return render_template("index.html", error="No file uploaded")
-
+def form_data_from_request():
     # Recopilar todos los datos del formulario
-    form_data = {
+    return {
         # Datos del inspector
         "inspector": request.form.get("inspector", ""),
         "inspector_phone": request.form.get("inspector_phone", ""),
@@ -52,51 +50,180 @@ def process_pdf():
         "property_ficha": request.form.get("property_ficha", "")
     }
 
-    # Extract front page info
-    front_page_info = extract_front_page_info(file)
-
-    # Reset file stream position to start for next read
-    file.seek(0)
-
-    # Extract pathology items
-    pathology_items = extract_pathologies_from_pdf(file)
-
-    # Reset file stream position to start for composing final report
-    file.seek(0)
-
-    # Create a temporary file for the output PDF
-    temp_output = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    temp_output.close()
+@app.route("/process_pdf", methods=["POST"])
+def process_pdf():
+    file = request.files.get("pdf_file")
+    if not file:
+        return render_template("index.html", error="No file uploaded")
 
-    # Compose final report PDF
-    # Save uploaded file to a temporary file to get a valid file path
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_input:
-        file.seek(0)
-        temp_input.write(file.read())
-        temp_input_path = temp_input.name
+    form_data = form_data_from_request()
 
-    from pdf_summary import get_pdf_summary, generate_summary_page
-    summary_text = get_pdf_summary(temp_input_path)
-    summary_pdf = generate_summary_page(summary_text)
+    # Every temporary file of the request lives in its own workspace,
+    # removed when the request ends whether it succeeded or failed
+    workspace = create_request_workspace()
+    try:
+        input_path = workspace.save_upload(file)
 
-    compose_final_report(temp_input_path, front_page_info, pathology_items, temp_output.name, form_data, summary_pdf=summary_pdf)
+        # Extract, summarise and compose final report PDF
+        run_report_pipeline(input_path, workspace.output_path, form_data, file_name=file.filename)
 
-    # Read the generated PDF to send as response
-    with open(temp_output.name, "rb") as f:
-        pdf_data = f.read()
+        # Stream the report from disk instead of buffering it in memory. The
+        # workspace is removed right away: the open file stays readable until
+        # the server closes it after sending, then the OS frees it.
+        output = open(workspace.output_path, "rb")
+    finally:
+        workspace.cleanup()
 
-    # Remove the temporary file
-    os.unlink(temp_output.name)
+    response = send_file(output, mimetype="application/pdf",
+                         as_attachment=True, download_name="reporte_final.pdf")
+    response.content_length = os.fstat(output.fileno()).st_size
 
-    # Generate pathology table CSV for display
-    csv_data = items_to_csv(pathology_items)
+    return response
 
-    response = make_response(pdf_data)
-    response.headers.set('Content-Type', 'application/pdf')
-    response.headers.set('Content-Disposition', 'attachment', filename='reporte_final.pdf')
+@app.route("/extract", methods=["POST"])
+def extract():
+    """
+    Front page info and pathology items of the uploaded report as JSON, or
+    as CSV with ?format=csv. No summary and no report composition.
+    `severities` (comma separated, default ROJO) selects the items.
+    """
+    file = request.files.get("pdf_file")
+    if not file:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    requested = request.values.get("severities")
+    try:
+        severities = RULES.select([s.strip() for s in requested.split(",")] if requested else DEFAULT_SEVERITIES)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        with request_workspace() as workspace:
+            result = run_extraction_pipeline(workspace.save_upload(file), severities, file_name=file.filename)
+    except UNREADABLE_PDF_ERRORS:
+        return jsonify({"error": "The uploaded file is not a readable PDF"}), 400
+
+    items = result["pathology_items"]
+    if request.values.get("format", "json").lower() == "csv":
+        # Con más de una severidad pedida el CSV lleva la columna de severidad
+        rows = iter_items_csv(items, severity_column=severities != DEFAULT_SEVERITIES)
+        return Response(rows, mimetype="text/csv",
+                        headers={"Content-Disposition": "attachment; filename=patologias.csv"})
+    return jsonify({
+        "front_page_info": result["front_page_info"],
+        "pathology_items": items,
+    })
+
+def require_index_token(view):
+    """
+    Serves the view only with "Authorization: Bearer <PATHOLOGY_API_TOKEN>";
+    404 while no token is configured.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not PATHOLOGY_API_TOKEN:
+            return jsonify({"error": "Not found"}), 404
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), PATHOLOGY_API_TOKEN.encode()):
+            return jsonify({"error": "Unauthorized"}), 401, {"WWW-Authenticate": "Bearer"}
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route("/pathologies", methods=["GET"])
+@require_index_token
+def search_pathologies():
+    """
+    Searches the items of every processed report. Query parameters: q (free
+    text), type, severity, room, locality, ficha, from, to (YYYY-MM-DD),
+    limit, offset. See PathologyIndex.search().
+    """
+    index = get_pathology_index()
+    if index is None:
+        return jsonify({"error": "Pathology index disabled"}), 404
+    args = request.args
+    try:
+        limit, offset = int(args.get("limit", 100)), int(args.get("offset", 0))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    items = index.search(
+        text=args.get("q"), type=args.get("type"), severity=args.get("severity"), room=args.get("room"),
+        locality=args.get("locality"), property_ficha=args.get("ficha"),
+        date_from=args.get("from"), date_to=args.get("to"), limit=limit, offset=offset,
+    )
+    return jsonify({"count": len(items), "items": items})
+
+@app.route("/properties/<path:property_ficha>/history", methods=["GET"])
+@require_index_token
+def property_history(property_ficha):
+    """
+    Every processed report of a property (by property_ficha), oldest first.
+    """
+    index = get_pathology_index()
+    if index is None:
+        return jsonify({"error": "Pathology index disabled"}), 404
+    return jsonify({"property_ficha": property_ficha, "reports": index.property_history(property_ficha)})
+
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    """
+    Queues the report generation and returns the job id immediately.
+    """
+    file = request.files.get("pdf_file")
+    if not file:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    job_id = submit_job(file, form_data_from_request())
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("job_status", job_id=job_id),
+        "download_url": url_for("job_download", job_id=job_id),
+    }), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_job_store().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({
+        "job_id": job_id,
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "error": job["error"],
+    })
+
+@app.route("/jobs/<job_id>/download", methods=["GET"])
+def job_download(job_id):
+    store = get_job_store()
+    job = store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] != STATUS_DONE:
+        return jsonify({"error": "Job not finished", "status": job["status"]}), 409
+    # conditional=True answers Range and If-None-Match so clients can resume large reports
+    return send_file(store.output_path(job_id), mimetype="application/pdf",
+                     as_attachment=True, download_name="reporte_final.pdf", conditional=True)
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Stage timings and report sizes of every worker and job process, in Prometheus format.
+    """
+    return metrics_text(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+def warm_up():
+    """
+    Loads what the first request would otherwise pay for: static pages,
+    images, generated pages, HTML templates and the mimetypes table. The
+    modules (openai, reportlab, pdfplumber, report_styles) are already
+    imported with app. Called once in the gunicorn master before forking
+    (see gunicorn.conf.py).
+    """
+    warm_report_templates()
+    generate_summary_page("")
+    app.jinja_env.get_template("index.html")
+    mimetypes.init()
 
-    # Render the page with pathology table and download link
-    return response
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
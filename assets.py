@@ -0,0 +1,120 @@
+import io
+import os
+import threading
+import time
+
+from PyPDF2 import PdfReader
+from reportlab.lib.utils import ImageReader
+
+# Páginas estáticas que se agregan a cada informe
+STATIC_PDFS = {
+    "page2": os.path.join("pdf", "page2.pdf"),
+    "page3": os.path.join("pdf", "page3.pdf"),
+    "page4": os.path.join("pdf", "page4.pdf"),
+    "termspage1": os.path.join("pdf", "termspage1.pdf"),
+    "termspage2": os.path.join("pdf", "termspage2.pdf"),
+    "lastpage": os.path.join("pdf", "lastpage.pdf"),
+}
+
+# Imágenes de la portada y del encabezado de la página 3
+IMAGES = {
+    "lineas_check_front": os.path.join("images", "lineas_check_front.png"),
+    "logo_check_front": os.path.join("images", "Logo_check_front.png"),
+    "logo_header": os.path.join("images", "Logoheader.png"),
+}
+
+# Segundos entre comprobaciones de mtime de un mismo archivo
+ASSET_CHECK_INTERVAL = float(os.getenv("ASSET_CHECK_INTERVAL", "2"))
+
+
+class AssetRegistry:
+    """
+    Process-wide cache of the static PDFs and images used to compose every
+    report. Files are read and decoded once and shared read-only across
+    requests; a file is reloaded when its mtime changes.
+    """
+
+    def __init__(self, check_interval=ASSET_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        # Los objetos de PyPDF2 se resuelven de forma perezosa desde el stream
+        # del reader: copiar sus páginas a un writer debe hacerse con este lock.
+        self.lock = threading.RLock()
+        self._entries = {}
+        self._templates = {}
+
+    def _get(self, path, loader):
+        now = time.monotonic()
+        entry = self._entries.get(path)
+        if entry is not None and now - entry["checked_at"] < self.check_interval:
+            return entry["value"]
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        with self.lock:
+            entry = self._entries.get(path)
+            if entry is None or entry["mtime"] != mtime:
+                value = loader(path) if mtime is not None else None
+                entry = {"mtime": mtime, "value": value}
+                self._entries[path] = entry
+            entry["checked_at"] = now
+            return entry["value"]
+
+    @staticmethod
+    def _load_pdf_pages(path):
+        with open(path, "rb") as f:
+            reader = PdfReader(io.BytesIO(f.read()))
+        return list(reader.pages)
+
+    @staticmethod
+    def _load_image(path):
+        image = ImageReader(path)
+        # Decodificar ahora y no en el primer request
+        image.getRGBData()
+        return image
+
+    def pdf_pages(self, name):
+        """
+        Pages of a static PDF by name (see STATIC_PDFS); empty if the file is missing.
+        """
+        return self._get(STATIC_PDFS[name], self._load_pdf_pages) or []
+
+    def image(self, name):
+        """
+        Decoded ImageReader by name (see IMAGES).
+        """
+        return self._get(IMAGES[name], self._load_image)
+
+    def template_pages(self, name, render, images=()):
+        """
+        Memoised pages of a generated template whose output depends only on
+        static inputs. `render()` returns a PDF buffer and runs once per
+        combination of `images` (names in IMAGES): reloading one of those
+        images renders the template again.
+        """
+        key = (name,) + tuple(self.image(image) for image in images)
+        pages = self._templates.get(key)
+        if pages is None:
+            with self.lock:
+                pages = self._templates.get(key)
+                if pages is None:
+                    pages = list(PdfReader(render()).pages)
+                    # Descartar versiones anteriores del mismo template
+                    for old_key in [k for k in self._templates if k[0] == name]:
+                        del self._templates[old_key]
+                    self._templates[key] = pages
+        return pages
+
+    def preload(self):
+        """
+        Loads every static PDF and image; call once at worker startup.
+        """
+        for name in STATIC_PDFS:
+            self.pdf_pages(name)
+        for name in IMAGES:
+            self.image(name)
+
+
+assets = AssetRegistry()
@@ -0,0 +1,182 @@
+"""
+Generates the final report for every PDF in a folder, in parallel.
+
+Usage:
+    python batch.py informes/ --form-data informes.csv [--output-dir informes/finales] [--workers 8] [--skip-summary]
+
+The sidecar (CSV or JSON) holds the same fields as the web form, one row per
+source PDF, with a `file` column naming it:
+
+    file,inspector,client_name,property_address,...
+    informe_01.pdf,Ana,Juan Pérez,Formosa 157,...
+
+A JSON sidecar is either a list of such objects or an object keyed by file
+name. PDFs without a row get an empty form (static page 3).
+
+Progress is saved in <output-dir>/batch_progress.json after every file:
+running the same command again skips the reports already generated. All
+pathology items end up in <output-dir>/patologias.csv.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pipeline import run_report_pipeline, items_to_csv
+
+PROGRESS_FILE = "batch_progress.json"
+COMBINED_CSV = "patologias.csv"
+
+
+def load_form_data(path):
+    """
+    Reads the form_data sidecar into {file name: form_data}.
+    """
+    if path is None:
+        return {}
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return {name: dict(fields) for name, fields in data.items()}
+        rows = data
+    else:
+        # utf-8-sig: los CSV exportados desde Excel traen BOM
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    form_data = {}
+    for row in rows:
+        row = {key: value or "" for key, value in row.items()}
+        name = row.pop("file", "")
+        if name:
+            form_data[os.path.basename(name)] = row
+    return form_data
+
+
+def _load_progress(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_progress(path, progress):
+    # Escritura atómica: un corte a mitad de camino no pierde lo ya hecho
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(progress, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _process_report(input_path, output_path, form_data, skip_summary):
+    """
+    Worker process entry point: generates one report and returns its items.
+    """
+    start = time.perf_counter()
+    result = run_report_pipeline(input_path, output_path, form_data, skip_summary=skip_summary,
+                                 file_name=os.path.basename(input_path))
+    return result["pathology_items"], time.perf_counter() - start
+
+
+def run_batch(input_dir, output_dir, form_data=None, workers=None, skip_summary=False):
+    """
+    Processes every PDF in `input_dir` not already done according to the
+    progress file, on a pool of `workers` processes (default: one per core).
+    Returns the progress dict {file name: entry}. Raises ValueError if
+    `output_dir` is `input_dir`: each report would overwrite its source.
+    """
+    form_data = form_data or {}
+    os.makedirs(output_dir, exist_ok=True)
+    if os.path.samefile(output_dir, input_dir):
+        raise ValueError(f"Output folder {output_dir} is the input folder: the reports would overwrite the sources")
+    progress_path = os.path.join(output_dir, PROGRESS_FILE)
+    progress = _load_progress(progress_path)
+
+    pending = []
+    for name in sorted(os.listdir(input_dir)):
+        if not name.lower().endswith(".pdf"):
+            continue
+        input_path, output_path = os.path.join(input_dir, name), os.path.join(output_dir, name)
+        # Un enlace en la carpeta de salida no puede apuntar al original
+        if os.path.exists(output_path) and os.path.samefile(output_path, input_path):
+            progress[name] = {"status": "failed", "error": f"{output_path} is the source file"}
+            print(f"{name}: ERROR la salida es el mismo archivo que el original")
+            continue
+        entry = progress.get(name)
+        if entry and entry["status"] == "done" and os.path.exists(output_path):
+            continue
+        pending.append((name, input_path, output_path))
+
+    pending_names = {name for name, _, _ in pending}
+    done = sum(1 for name, entry in progress.items() if entry["status"] == "done" and name not in pending_names)
+    print(f"{len(pending)} informes pendientes ({done} ya generados)")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(_process_report, input_path, output_path, form_data.get(name, {}), skip_summary): name
+            for name, input_path, output_path in pending
+        }
+        for n, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+            try:
+                items, elapsed = future.result()
+            except Exception as e:
+                progress[name] = {"status": "failed", "error": str(e)}
+                print(f"[{n}/{len(pending)}] {name}: ERROR {e}")
+            else:
+                progress[name] = {"status": "done", "seconds": round(elapsed, 2), "items": items}
+                print(f"[{n}/{len(pending)}] {name}: {len(items)} patologías en {elapsed:.1f} s")
+            _save_progress(progress_path, progress)
+
+    elapsed = time.perf_counter() - start
+    if pending:
+        print(f"{len(pending)} informes en {elapsed:.1f} s ({len(pending) / elapsed:.2f} informes/s)")
+    return progress
+
+
+def write_combined_csv(progress, path):
+    """
+    Writes the items of every generated report to one CSV, with the source
+    file as first column.
+    """
+    items = [
+        dict(item, file=name)
+        for name, entry in sorted(progress.items()) if entry["status"] == "done"
+        for item in entry["items"]
+    ]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(items_to_csv(items, file_column=True))
+    return len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_dir", help="folder with the source PDFs")
+    parser.add_argument("--form-data", help="CSV or JSON sidecar with the form fields per file")
+    parser.add_argument("--output-dir", help="folder for the reports (default: <input_dir>/informes_finales)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--skip-summary", action="store_true", help="do not request the AI summary")
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or os.path.join(args.input_dir, "informes_finales")
+    try:
+        progress = run_batch(args.input_dir, output_dir, load_form_data(args.form_data),
+                             workers=args.workers, skip_summary=args.skip_summary)
+    except ValueError as e:
+        parser.error(str(e))
+
+    combined_path = os.path.join(output_dir, COMBINED_CSV)
+    count = write_combined_csv(progress, combined_path)
+    failed = sorted(name for name, entry in progress.items() if entry["status"] == "failed")
+    print(f"{count} patologías en {combined_path}")
+    if failed:
+        print(f"{len(failed)} informes con error (se reintentan en la próxima ejecución): {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
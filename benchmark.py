@@ -0,0 +1,8 @@
+"""
+Benchmarks for the report pipeline: `python benchmark.py <name>` is the same
+as `python -m benchmarks <name>` (see benchmarks/__init__.py).
+"""
+from benchmarks.__main__ import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Benchmarks for the report pipeline, one module per area:
+
+    extraction  page text extraction and pathology scanning
+    summary     summary requests against the local fake OpenAI server
+    report      report rendering and composition
+    service     web app, worker startup, pathology index and tracing
+
+Shared fixtures and timing helpers are in benchmarks.common. Correctness
+checks belong in tests/; the benchmarks only measure.
+
+Usage:
+    python -m benchmarks extraction [--pdf uploads/test_report_final.pdf] [--workers 4]
+    python -m benchmarks scanner [--pages 100 250 500 1000]
+    python -m benchmarks severities [--pages 100 1000]
+    python -m benchmarks prefilter [--pdf uploads/test_report_final.pdf] [--synthetic-pages 100]
+    python -m benchmarks memory [--pages 50 200 1000] [--image-size 640x480]
+    python -m benchmarks summary [--pages 300] [--latency 0.5] [--failure-rate 0.1]
+    python -m benchmarks digest [--pdf uploads/test_report_final.pdf] [--synthetic-pages 200] [--latency-per-1k-tokens 0.05]
+    python -m benchmarks ratelimit [--requests 60] [--workers 4] [--rpm 20] [--tpm 40000] [--window 10]
+    python -m benchmarks stages [--pages 20 60 200] [--items-per-page 3] [--image-size 640x480] [--json stages.json]
+    python -m benchmarks optimize [--pdf uploads/test_report_final.pdf] [--profiles email web]
+    python -m benchmarks table [--rows 100 1000 10000] [--classic-max-rows 1000]
+    python -m benchmarks uploads [--requests 1000]
+    python -m benchmarks startup [--runs 5] [--requests 10]
+    python -m benchmarks index [--reports 2000] [--items 30]
+    python -m benchmarks tracing [--iterations 100000]
+"""
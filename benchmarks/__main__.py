@@ -0,0 +1,19 @@
+import argparse
+
+import benchmarks
+from benchmarks import extraction, report, service, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=benchmarks.__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for module in (extraction, summary, report, service):
+        module.add_parsers(subparsers)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Fixtures and timing helpers shared by the benchmarks.
+"""
+import io
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+SAMPLE_PDF = os.path.join("uploads", "test_report_final.pdf")
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def synthetic_page_texts(pages, items_per_page=3):
+    """
+    Page texts shaped like the inspection reports: room headers, ROJO and
+    AMARILLO items, "Foto" placeholders, "Page x/y" footers and items that
+    continue onto the next page.
+    """
+    page_texts = []
+    code = 1
+    for page_number in range(1, pages + 1):
+        lines = [
+            "Formosa 157, Piso 6, Depto 21",
+            "SUPERFICIE TOTAL: 88.84 m² • PISOS: 1 •",
+            f"▼ Habitación {page_number}/6º piso",
+        ]
+        if page_number > 1 and (page_number - 1) % 5 == 0:
+            # Continuación del último ítem de la página anterior
+            lines += [f"{code - 1} HUMEDAD ROJO", "Manchas de humedad en muro", "-Identificación: continuación."]
+        for n in range(items_per_page):
+            severity = "ROJO" if n % 2 == 0 else "AMARILLO"
+            lines += [
+                f"{code} HUMEDAD {severity}",
+                "Foto",
+                f"Humedad {severity.lower()}",
+                "Manchas de humedad en muro",
+                "-Identificación: se observan manchas., -Recomendación: revisar.",
+            ]
+            code = code % 999 + 1
+        lines.append(f"Page {page_number}/{pages}")
+        page_texts.append((page_number, "\n".join(lines)))
+    return page_texts
+
+
+def synthetic_items(rows, seed=0):
+    """
+    Pathology items with descriptions of one to four lines, for the table
+    renderer.
+    """
+    import random
+    from synthetic_report import PATHOLOGY_TYPES, ROOMS
+
+    rng = random.Random(seed)
+    sentences = [
+        "Manchas de humedad en muro por filtración desde el balcón superior.",
+        "Falta de puesta a tierra en tomacorrientes del ambiente.",
+        "Fisura en revestimiento cerámico junto a la abertura.",
+        "Burlete deteriorado en ventana corrediza.",
+        "Pérdida en sifón de bacha con goteo constante.",
+    ]
+    return [
+        {
+            "code": str(code),
+            "type": rng.choice(PATHOLOGY_TYPES),
+            "description": " ".join(rng.choice(sentences) for _ in range(rng.randint(1, 4))),
+            "room": f"{rng.choice(ROOMS)}/6º piso",
+            "page": f"{code // 3 + 2}, {code // 3 + 3}" if code % 5 == 0 else str(code // 3 + 2),
+        }
+        for code in range(1, rows + 1)
+    ]
+
+
+def tiny_report_pdf():
+    """
+    Two-page PDF with one ROJO item, enough to run the whole pipeline quickly.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    c.drawString(72, 720, "Formosa 157, CABA, Buenos Aires")
+    c.showPage()
+    for y, line in zip(range(720, 600, -15), ["▼ Cocina", "1 HUMEDAD ROJO", "Foto", "Manchas de humedad", "Page 2/2"]):
+        c.drawString(72, y, line)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def use_fake_openai(**options):
+    """
+    Points the shared OpenAI client at a local fake chat-completions server,
+    with a rate limiter of its own that does not limit.
+    """
+    from fake_openai_server import start_fake_server
+    from openai_client import configure_openai_client, configure_rate_limiter
+
+    server = start_fake_server(**options)
+    configure_openai_client(base_url=server.base_url, api_key="fake")
+    configure_rate_limiter(os.path.join(tempfile.mkdtemp(), "rate_limit.sqlite3"), rpm=0, tpm=0)
+    return server
+
+
+def profile_stage(fn, repeat):
+    """
+    Runs `fn` `repeat` times for wall/CPU time, then once more under
+    tracemalloc for the peak of Python allocations (kept out of the timings).
+    """
+    walls, cpus = [], []
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = fn()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return result, {
+        "wall_s": round(statistics.median(walls), 6),
+        "wall_min_s": round(min(walls), 6),
+        "cpu_s": round(statistics.median(cpus), 6),
+        "peak_alloc_kb": round(peak / 1024, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
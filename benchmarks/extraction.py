@@ -0,0 +1,165 @@
+"""
+Page text extraction and pathology scanning benchmarks.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import SAMPLE_PDF, synthetic_page_texts, timed
+from extractor_pathologies import extract_pathologies_from_texts, extract_pathologies_from_pdf
+from pdf_document import load_pdf_document
+from synthetic_report import parse_image_size
+
+
+def bench_extraction(args):
+    """
+    Serial vs process-pool page text extraction on the same PDF.
+    """
+    serial_doc, serial_time = timed(load_pdf_document, args.pdf, workers=1)
+    print(f"{args.pdf}: {serial_doc.page_count} páginas")
+    print(f"serial:              {serial_time:8.2f} s")
+
+    for workers in args.workers:
+        parallel_doc, parallel_time = timed(load_pdf_document, args.pdf, workers=workers)
+        assert parallel_doc.page_texts == serial_doc.page_texts, "parallel extraction differs from serial"
+        print(f"paralelo ({workers:2d} procs): {parallel_time:8.2f} s  speedup x{serial_time / parallel_time:.2f}")
+
+
+def bench_scanner(args):
+    """
+    Pathology scanner on synthetic page texts: time per page should stay flat.
+    """
+    for pages in args.pages:
+        page_texts = synthetic_page_texts(pages)
+        items, elapsed = timed(extract_pathologies_from_texts, page_texts)
+        print(f"{pages:6d} páginas: {elapsed * 1000:9.1f} ms  {elapsed / pages * 1e6:7.1f} µs/página  {len(items)} ítems")
+
+
+def bench_severities(args):
+    """
+    One sweep classifying every severity vs one extraction per severity.
+    Items of a severity differ only where a block of the separate run ran
+    into a header of another severity.
+    """
+    from extractor_pathologies import RULES, group_by_severity
+
+    for pages in args.pages:
+        page_texts = synthetic_page_texts(pages)
+        items, combined_time = timed(extract_pathologies_from_texts, page_texts, None)
+        combined = group_by_severity(items)
+
+        separate_time = 0
+        differ = 0
+        for severity in RULES.severities:
+            separate, elapsed = timed(extract_pathologies_from_texts, page_texts, [severity])
+            separate_time += elapsed
+            differ += sum(1 for a, b in zip(separate, combined[severity]) if a != b)
+            differ += abs(len(separate) - len(combined[severity]))
+
+        counts = "  ".join(f"{severity} {len(combined[severity])}" for severity in RULES.severities)
+        print(f"{pages:6d} páginas: una pasada {combined_time * 1000:8.1f} ms  "
+              f"por severidad {separate_time * 1000:8.1f} ms  ({counts}; {differ} ítems distintos)")
+
+
+def bench_prefilter(args):
+    """
+    Full layout extraction vs raw-text pre-filter plus layout extraction of
+    the candidate pages only: items must be identical; reports pages skipped
+    and time saved.
+    """
+    from extractor_pathologies import DEFAULT_SEVERITIES
+    from extractorv2 import extract_front_page_info
+    from page_prefilter import candidate_pages
+    from synthetic_report import generate_synthetic_report
+
+    def compare(path):
+        full, full_time = timed(load_pdf_document, path)
+        (pages, stats), prefilter_time = timed(candidate_pages, path, DEFAULT_SEVERITIES)
+        partial, partial_time = timed(load_pdf_document, path, pages=sorted(set(pages) | {1}))
+
+        assert extract_pathologies_from_pdf(partial) == extract_pathologies_from_pdf(full), f"{path}: items differ"
+        assert extract_front_page_info(partial) == extract_front_page_info(full), f"{path}: front page differs"
+        filtered_time = prefilter_time + partial_time
+        print(f"{path}: {stats['pages_skipped']}/{stats['pages']} páginas salteadas")
+        print(f"  completo:  {full_time:7.2f} s")
+        print(f"  filtrado:  {filtered_time:7.2f} s (pre-filtro {prefilter_time:.2f} s)"
+              f"  ahorro {full_time - filtered_time:.2f} s ({(1 - filtered_time / full_time) * 100:.0f}%)")
+
+    for path in args.pdf:
+        compare(path)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "sintetico.pdf")
+        generate_synthetic_report(path, pages=args.synthetic_pages, rojo_ratio=0.2)
+        compare(path)
+
+
+def _memory_worker(path):
+    """
+    Child process of bench_memory: peak RSS added by extracting one PDF.
+    """
+    from pdf_document import current_rss_mb
+
+    def peak_rss_mb():
+        # VmHWM: pico de RSS de este proceso (ru_maxrss arrastra el del proceso padre)
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) / 1024
+
+    # Reinicia el pico (Linux): los imports no cuentan
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    base = current_rss_mb()
+    document, elapsed = timed(load_pdf_document, path, workers=1)
+    print(json.dumps({"pages": document.page_count, "peak_mb": peak_rss_mb() - base, "seconds": elapsed}))
+
+
+def bench_memory(args):
+    """
+    Peak memory of the text extraction of photo-heavy synthetic reports,
+    each in a fresh process. With pages released as soon as their text is
+    taken the peak should stay flat, growing only by the page texts kept.
+    """
+    from synthetic_report import generate_synthetic_report
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for pages in args.pages:
+            path = os.path.join(tmp_dir, f"sintetico-{pages}.pdf")
+            generate_synthetic_report(path, pages=pages, image_size=args.image_size)
+            code = f"from benchmarks.extraction import _memory_worker; _memory_worker({path!r})"
+            output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.splitlines()[-1])
+            results.append(result)
+            print(f"{pages:6d} páginas ({os.path.getsize(path) / 2 ** 20:6.1f} MB): pico {result['peak_mb']:7.1f} MB  "
+                  f"{result['seconds']:6.1f} s")
+            os.remove(path)
+
+    first, last = results[0], results[-1]
+    growth = (last["peak_mb"] - first["peak_mb"]) / max(1, last["pages"] - first["pages"])
+    print(f"crecimiento: {growth * 1024:.1f} KB/página")
+
+
+def add_parsers(subparsers):
+    extraction = subparsers.add_parser("extraction", help="serial vs parallel page text extraction")
+    extraction.add_argument("--pdf", default=SAMPLE_PDF)
+    extraction.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1])
+    extraction.set_defaults(func=bench_extraction)
+
+    scanner = subparsers.add_parser("scanner", help="pathology scanner scaling on synthetic pages")
+    scanner.add_argument("--pages", type=int, nargs="+", default=[100, 250, 500, 1000])
+    scanner.set_defaults(func=bench_scanner)
+
+    severities = subparsers.add_parser("severities", help="one sweep for every severity vs one run per severity")
+    severities.add_argument("--pages", type=int, nargs="+", default=[100, 1000])
+    severities.set_defaults(func=bench_severities)
+
+    prefilter = subparsers.add_parser("prefilter", help="pages skipped and time saved by the page pre-filter")
+    prefilter.add_argument("--pdf", nargs="+", default=[SAMPLE_PDF])
+    prefilter.add_argument("--synthetic-pages", type=int, default=100)
+    prefilter.set_defaults(func=bench_prefilter)
+
+    memory = subparsers.add_parser("memory", help="peak extraction memory as page count grows")
+    memory.add_argument("--pages", type=int, nargs="+", default=[50, 200, 1000])
+    memory.add_argument("--image-size", type=parse_image_size, default=(640, 480))
+    memory.set_defaults(func=bench_memory)
@@ -0,0 +1,148 @@
+"""
+Report rendering and composition benchmarks.
+"""
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.common import SAMPLE_PDF, git_commit, profile_stage, synthetic_items, timed
+from extractor_pathologies import extract_pathologies_from_texts, extract_pathologies_from_pdf
+from pdf_document import load_pdf_document
+from synthetic_report import parse_image_size
+
+
+def bench_stages(args):
+    """
+    Times and memory-profiles each report stage separately on synthetic
+    reports: text extraction, front page pass, pathology extraction, table,
+    page 3, summary page and merge. Writes the results as JSON for comparing
+    runs across commits.
+    """
+    from extractorv2 import extract_front_page_info, generate_pathology_table_pdf, compose_final_report, \
+        warm_report_templates
+    from pdf_page3_generator import generate_page3_pdf
+    from pdf_summary import generate_summary_page, SUMMARY_SECTIONS
+    from synthetic_report import generate_synthetic_report
+
+    warm_report_templates()
+    form_data = {"inspector": "Mendez Mariano Jeremias", "client_name": "Juan Pérez", "property_address": "Formosa 157"}
+    summary_text = "\n\n".join(f"{section}: texto de ejemplo del resumen." for section in SUMMARY_SECTIONS)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for pages in args.pages:
+            source = os.path.join(tmp_dir, f"informe_{pages}.pdf")
+            output = os.path.join(tmp_dir, f"reporte_{pages}.pdf")
+            page_texts = generate_synthetic_report(source, pages=pages, items_per_page=args.items_per_page,
+                                                   image_size=args.image_size, seed=args.seed)
+            stages = {}
+            document, stages["text_extraction"] = profile_stage(lambda: load_pdf_document(source), args.repeat)
+            front_page_info, stages["front_page"] = profile_stage(lambda: extract_front_page_info(document), args.repeat)
+            items, stages["pathologies"] = profile_stage(lambda: extract_pathologies_from_pdf(document), args.repeat)
+            assert items == extract_pathologies_from_texts(page_texts), "extraction differs from the generated report"
+            table_pdf, stages["table"] = profile_stage(lambda: generate_pathology_table_pdf(items), args.repeat)
+            page3_pdf, stages["page3"] = profile_stage(lambda: generate_page3_pdf(form_data), args.repeat)
+            summary_pdf, stages["summary_page"] = profile_stage(lambda: generate_summary_page(summary_text), args.repeat)
+            rendered_pages = {"page3_pdf": page3_pdf, "pathology_table_pdf": table_pdf}
+            _, stages["merge"] = profile_stage(
+                lambda: compose_final_report(source, front_page_info, items, output, form_data, summary_pdf=summary_pdf,
+                                             rendered_pages=rendered_pages, optimize_profile=""),
+                args.repeat)
+
+            result = {
+                "pages": pages,
+                "pathology_items": len(items),
+                "input_bytes": os.path.getsize(source),
+                "output_bytes": os.path.getsize(output),
+                "stages": stages,
+            }
+            results.append(result)
+
+            print(f"{pages} páginas, {len(items)} patologías, {result['input_bytes']} bytes", file=sys.stderr)
+            for name, stage in stages.items():
+                print(f"  {name:16s} {stage['wall_s'] * 1000:10.1f} ms  cpu {stage['cpu_s'] * 1000:10.1f} ms"
+                      f"  pico {stage['peak_alloc_kb']:10.0f} KB", file=sys.stderr)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "params": {"items_per_page": args.items_per_page, "image_size": args.image_size,
+                   "repeat": args.repeat, "seed": args.seed},
+        "results": results,
+    }
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"resultados en {args.json}", file=sys.stderr)
+
+
+def bench_optimize(args):
+    """
+    Output size, time and image quality (PSNR) of each optimisation profile.
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+    from pdf_optimizer import optimize_pdf_writer
+
+    print(f"{args.pdf}: {os.path.getsize(args.pdf)} bytes")
+    for profile in args.profiles:
+        writer = PdfWriter()
+        for page in PdfReader(args.pdf).pages:
+            writer.add_page(page)
+        stats, elapsed = timed(optimize_pdf_writer, writer, profile, measure_quality=True)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        psnr = stats["psnr"]
+        quality = f"PSNR media {sum(psnr) / len(psnr):.1f} dB, mínima {min(psnr):.1f} dB" if psnr else "sin fotos"
+        print(f"{profile:6s} {len(buffer.getvalue()):10d} bytes  {elapsed:6.2f} s  "
+              f"{stats['images_recompressed']} imágenes, {stats['objects_deduplicated']} objetos duplicados  {quality}")
+
+
+def bench_table(args):
+    """
+    Pathology table rendering: classic single Table split by reportlab vs
+    long-table mode (one table per page). Both use fixed widths and wrapped
+    cells. The long mode should stay linear: µs/row flat from 100 to 10,000 rows.
+    """
+    from PyPDF2 import PdfReader
+    from extractorv2 import generate_pathology_table_pdf
+
+    for rows in args.rows:
+        items = synthetic_items(rows)
+        pdf, elapsed = timed(generate_pathology_table_pdf, items, long_table=True)
+        line = (f"{rows:6d} filas: largo {elapsed:7.2f} s {elapsed / rows * 1e6:7.0f} µs/fila "
+                f"{len(PdfReader(pdf).pages):5d} págs")
+        if rows <= args.classic_max_rows:
+            pdf, elapsed = timed(generate_pathology_table_pdf, items, long_table=False)
+            line += (f"  | clásico {elapsed:7.2f} s {elapsed / rows * 1e6:7.0f} µs/fila "
+                     f"{len(PdfReader(pdf).pages):5d} págs")
+        print(line)
+
+
+def add_parsers(subparsers):
+    stages = subparsers.add_parser("stages", help="time and memory of each report stage on synthetic reports")
+    stages.add_argument("--pages", type=int, nargs="+", default=[20, 60, 200])
+    stages.add_argument("--items-per-page", type=int, default=3)
+    stages.add_argument("--image-size", type=parse_image_size, default=(640, 480), help="WxH in pixels, or 0 for no photos")
+    stages.add_argument("--repeat", type=int, default=3)
+    stages.add_argument("--seed", type=int, default=0)
+    stages.add_argument("--json", default="-", help="output file for the JSON results ('-' = stdout)")
+    stages.set_defaults(func=bench_stages)
+
+    optimize = subparsers.add_parser("optimize", help="size and quality of the report optimisation profiles")
+    optimize.add_argument("--pdf", default=SAMPLE_PDF)
+    optimize.add_argument("--profiles", nargs="+", default=["email", "web"])
+    optimize.set_defaults(func=bench_optimize)
+
+    table = subparsers.add_parser("table", help="classic vs long-table rendering of the pathology table")
+    table.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    table.add_argument("--classic-max-rows", type=int, default=1000, help="skip the classic table above this size")
+    table.set_defaults(func=bench_table)
@@ -0,0 +1,209 @@
+"""
+Web app, worker startup, pathology index and tracing benchmarks.
+"""
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import synthetic_items, synthetic_page_texts, timed, tiny_report_pdf
+from extractor_pathologies import extract_pathologies_from_texts
+
+
+def bench_uploads(args):
+    """
+    Times many /process_pdf requests (one in ten with a corrupt upload) and
+    reports the temporary files left behind (see tests/test_upload_workspace.py).
+    """
+    import pdf_summary
+    from app import app
+
+    pdf_summary.SUMMARY_BACKEND = "local"
+    client = app.test_client()
+    pdf_bytes = tiny_report_pdf()
+    tmp_dir = tempfile.gettempdir()
+    before = set(os.listdir(tmp_dir))
+
+    start = time.perf_counter()
+    failures = 0
+    for n in range(args.requests):
+        data = pdf_bytes if n % 10 else b"%PDF-1.4 corrupt"
+        try:
+            response = client.post("/process_pdf", data={"pdf_file": (io.BytesIO(data), "informe.pdf")},
+                                   content_type="multipart/form-data")
+            failures += response.status_code != 200
+            # Como un servidor WSGI: cerrar la respuesta libera el archivo enviado
+            response.close()
+        except Exception:
+            failures += 1
+    elapsed = time.perf_counter() - start
+
+    leftover = set(os.listdir(tmp_dir)) - before
+    print(f"{args.requests} requests en {elapsed:.1f} s ({failures} fallidos a propósito)")
+    print(f"archivos temporales restantes en {tmp_dir}: {len(leftover)}")
+
+
+def _startup_worker(preload, requests, result_path):
+    """
+    Child process of bench_startup: imports the app (and warms it up, as the
+    gunicorn master does with preload_app) either before or after forking a
+    worker, then times the worker's requests. Writes the timings as JSON.
+    """
+    timings = {}
+    start = time.perf_counter()
+    if preload:
+        import app
+        timings["import"] = time.perf_counter() - start
+        app.warm_up()
+        timings["warm_up"] = time.perf_counter() - start - timings["import"]
+
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return
+
+    # Worker: lo que paga antes de atender y en cada request
+    worker_start = time.perf_counter()
+    import app
+    timings["worker_boot"] = time.perf_counter() - worker_start
+    client = app.app.test_client()
+    pdf_bytes = tiny_report_pdf()
+    form = {"inspector": "Inspector", "client_name": "Cliente", "property_address": "Formosa 157",
+            "property_ficha": "F-1"}
+    timings["index"] = timed(client.get, "/")[1]
+    latencies = []
+    for _ in range(requests):
+        response, elapsed = timed(client.post, "/process_pdf", content_type="multipart/form-data",
+                                   data=dict(form, pdf_file=(io.BytesIO(pdf_bytes), "informe.pdf")))
+        assert response.status_code == 200, response.status_code
+        response.close()
+        latencies.append(elapsed)
+    timings["requests"] = latencies
+    with open(result_path, "w") as f:
+        json.dump(timings, f)
+    os._exit(0)
+
+
+def bench_startup(args):
+    """
+    Cold worker vs worker forked from a preloaded master: import and warm-up
+    time, time from fork to ready, and latency of the first /process_pdf
+    request compared with the following ones. Each mode runs in a fresh
+    interpreter so nothing is imported beforehand.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, SUMMARY_BACKEND="local", EXTRACTION_CACHE_ENABLED="0",
+                   PATHOLOGY_INDEX_PATH=os.path.join(tmp_dir, "index.sqlite3"), JOBS_DIR=os.path.join(tmp_dir, "jobs"),
+                   TRACING_ENABLED="0")
+        for name, preload in (("sin precarga", False), ("preload_app", True)):
+            first, rest, boot = [], [], []
+            for run in range(args.runs):
+                result_path = os.path.join(tmp_dir, f"{preload}-{run}.json")
+                code = (f"from benchmarks.service import _startup_worker; "
+                        f"_startup_worker({preload}, {args.requests}, {result_path!r})")
+                subprocess.run([sys.executable, "-c", code], env=env, check=True)
+                with open(result_path) as f:
+                    timings = json.load(f)
+                boot.append(timings["worker_boot"] + timings["index"])
+                first.append(timings["requests"][0])
+                rest += timings["requests"][1:]
+            warm = statistics.median(rest)
+            print(f"{name:13s} worker listo {statistics.median(boot) * 1000:7.1f} ms  "
+                  f"primer request {statistics.median(first) * 1000:7.1f} ms  "
+                  f"siguientes {warm * 1000:6.1f} ms  (primero/siguientes x{statistics.median(first) / warm:.2f})")
+            if preload:
+                print(f"{'':13s} en el master: import {timings['import'] * 1000:.0f} ms, "
+                      f"warm_up {timings['warm_up'] * 1000:.0f} ms")
+
+
+def bench_index(args):
+    """
+    Pathology index: time to add synthetic reports and latency of typical
+    cross-report queries, which should stay in the milliseconds.
+    """
+    import random
+    from pathology_index import PathologyIndex
+    from synthetic_report import ROOMS
+
+    rng = random.Random(0)
+    localities = [("CABA", "Buenos Aires"), ("La Plata", "Buenos Aires"), ("Rosario", "Santa Fe"), ("Córdoba", "Córdoba")]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = PathologyIndex(os.path.join(tmp_dir, "pathologies.sqlite3"))
+        start = time.perf_counter()
+        for n in range(args.reports):
+            locality, province = rng.choice(localities)
+            form_data = {"property_locality": locality, "property_province": province,
+                         "property_ficha": f"F-{n % (args.reports // 4 or 1)}", "client_name": f"Cliente {n}"}
+            front_page_info = {"address": f"Calle {n}, {locality}", "inspector": "",
+                               "date": f"{rng.choice([2024, 2025])}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"}
+            items = [dict(item, severity=rng.choice(["ROJO", "AMARILLO", "VERDE"]), room=f"{rng.choice(ROOMS)}/6º piso")
+                     for item in synthetic_items(args.items, seed=n)]
+            index.add_report(f"{n:064x}", front_page_info, items, form_data, f"informe_{n}.pdf")
+        elapsed = time.perf_counter() - start
+        print(f"{args.reports} informes, {args.reports * args.items} ítems: {elapsed:.1f} s "
+              f"({elapsed / args.reports * 1000:.1f} ms/informe)")
+
+        queries = {
+            "HUMEDAD en Buenos Aires 2025": dict(type="HUMEDAD", locality="Buenos Aires",
+                                                date_from="2025-01-01", date_to="2025-12-31"),
+            "texto 'filtración balcón'": dict(text="filtración balcón"),
+            "texto + severidad + habitación": dict(text="humedad", severity="ROJO", room="Baño"),
+            "historial de una ficha": dict(property_ficha="F-7", limit=1000),
+        }
+        for name, query in queries.items():
+            times = []
+            for _ in range(5):
+                items, elapsed = timed(index.search, **query)
+                times.append(elapsed)
+            print(f"  {name:32s} {statistics.median(times) * 1000:7.2f} ms  {len(items)} ítems")
+        history, elapsed = timed(index.property_history, "F-7")
+        print(f"  {'property_history F-7':32s} {elapsed * 1000:7.2f} ms  {len(history)} informes")
+
+
+def bench_tracing(args):
+    """
+    Cost of a tracing stage() with and without an active trace, against
+    the time of the cheapest real stage (pathology scan of 100 pages).
+    """
+    import tracing
+
+    def run_stages():
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            with tracing.stage("bench"):
+                pass
+        return (time.perf_counter() - start) / args.iterations
+
+    idle = run_stages()
+    with tracing.trace("bench") as current:
+        active = run_stages() if current is not None else None
+    _, scan_time = timed(extract_pathologies_from_texts, synthetic_page_texts(100))
+
+    print(f"stage() sin traza activa: {idle * 1e6:6.2f} µs")
+    if active is not None:
+        print(f"stage() con traza activa: {active * 1e6:6.2f} µs")
+    print(f"etapa más barata (patologías, 100 páginas): {scan_time * 1e6:.0f} µs")
+
+
+def add_parsers(subparsers):
+    uploads = subparsers.add_parser("uploads", help="time requests and count leftover temporary files")
+    uploads.add_argument("--requests", type=int, default=1000)
+    uploads.set_defaults(func=bench_uploads)
+
+    startup = subparsers.add_parser("startup", help="cold worker vs preloaded worker: boot and first-request latency")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument("--requests", type=int, default=10)
+    startup.set_defaults(func=bench_startup)
+
+    index = subparsers.add_parser("index", help="pathology index insert time and query latency")
+    index.add_argument("--reports", type=int, default=2000)
+    index.add_argument("--items", type=int, default=30)
+    index.set_defaults(func=bench_index)
+
+    tracing_parser = subparsers.add_parser("tracing", help="overhead of the tracing layer")
+    tracing_parser.add_argument("--iterations", type=int, default=100000)
+    tracing_parser.set_defaults(func=bench_tracing)
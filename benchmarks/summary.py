@@ -0,0 +1,157 @@
+"""
+Summary benchmarks against the local fake OpenAI server: chunked summary
+(summary), raw text vs pathology digest input (digest) and the shared
+rate limiter across workers (ratelimit).
+"""
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import SAMPLE_PDF, synthetic_page_texts, timed, use_fake_openai
+from extractor_pathologies import extract_pathologies_from_texts
+from pdf_document import PDFDocument, load_pdf_document
+
+
+def bench_summary(args):
+    """
+    Single-prompt vs chunked map-reduce summary against the local fake server.
+    """
+    import pdf_summary
+
+    server = use_fake_openai(latency=args.latency, failure_rate=args.failure_rate)
+    document = PDFDocument(None, [text for _, text in synthetic_page_texts(args.pages)])
+
+    requests_before = len(server.requests)
+    summary, elapsed = timed(pdf_summary.get_pdf_summary, document, mode="single", input_mode="raw")
+    print(f"single:  {elapsed:6.2f} s  {len(server.requests) - requests_before} requests")
+
+    requests_before = len(server.requests)
+    (summary, metrics), elapsed = timed(pdf_summary.summarize_chunked, document.page_texts, token_budget=args.chunk_tokens)
+    print(f"chunked: {elapsed:6.2f} s  {len(server.requests) - requests_before} requests  {sum(isinstance(m['chunk'], int) for m in metrics)} chunks")
+    for m in metrics:
+        print(f"  {m}")
+    server.shutdown()
+
+
+def bench_digest(args):
+    """
+    Summary prompt in raw vs digest mode against the local fake server:
+    prompt tokens, request latency and time to build the digest. Checks that
+    the digest still names every item of every severity.
+    """
+    import pdf_summary
+    from synthetic_report import generate_synthetic_report
+
+    server = use_fake_openai(latency=args.latency, token_latency=args.latency_per_1k_tokens)
+    sources = [(path, load_pdf_document(path)) for path in args.pdf]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        page_texts = generate_synthetic_report(os.path.join(tmp_dir, "sintetico.pdf"), pages=args.synthetic_pages,
+                                               image_size=None)
+    sources.append((f"sintético {args.synthetic_pages} págs", PDFDocument(None, [text for _, text in page_texts])))
+    # Primera conexión del cliente fuera de las mediciones
+    pdf_summary._chat_completion([{"role": "user", "content": "ping"}])
+
+    for name, document in sources:
+        print(name)
+        items = extract_pathologies_from_texts(document.iter_pages(), None)
+        results = {}
+        for input_mode in ("raw", "digest"):
+            (intro, pages), build_time = timed(pdf_summary.summary_input, document, input_mode)
+            requests_before = len(server.requests)
+            _, elapsed = timed(pdf_summary.get_pdf_summary, document, mode="single", input_mode=input_mode)
+            prompt_tokens = sum(r["prompt_tokens"] for r in server.requests[requests_before:])
+            results[input_mode] = prompt_tokens
+            print(f"  {input_mode:6s} {sum(len(text or '') for text in pages):8d} chars {prompt_tokens:7d} tokens "
+                  f"{elapsed:6.2f} s  (armado {build_time * 1000:.1f} ms)")
+            if input_mode == "digest":
+                missing = [item["code"] for item in items if f"- {item['code']} {item['type']} " not in pages[0]]
+                assert not missing, f"{name}: items missing from the digest: {missing}"
+        print(f"  {len(items)} ítems, tokens -{(1 - results['digest'] / results['raw']) * 100:.0f}%")
+
+
+def _init_ratelimit_worker(base_url, limiter_options):
+    from openai_client import configure_openai_client, configure_rate_limiter
+
+    configure_openai_client(base_url=base_url, api_key="fake")
+    configure_rate_limiter(**limiter_options)
+
+
+def _ratelimit_request(prompt):
+    import openai
+    from openai_client import create_chat_completion
+    from pdf_summary import estimate_tokens
+
+    start = time.perf_counter()
+    try:
+        create_chat_completion([{"role": "user", "content": prompt}], estimated_tokens=estimate_tokens(prompt),
+                               model="gpt-4o")
+        ok = True
+    except openai.OpenAIError:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def bench_ratelimit(args):
+    """
+    A burst of summary requests from several worker processes against the
+    fake server with rate limits: with the shared token bucket (sized like
+    the server limits) vs with retries and backoff only. Reports throughput,
+    429s received, failed requests and latency.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    from fake_openai_server import start_fake_server
+
+    server = start_fake_server(latency=args.latency, rpm=args.rpm, tpm=args.tpm, window=args.window)
+    prompt = "Patología ROJO en cocina: manchas de humedad.\n" * (args.prompt_tokens * 4 // 46)
+    print(f"{args.requests} pedidos, {args.workers} procesos, límite {args.rpm} pedidos / {args.tpm} tokens "
+          f"cada {args.window:g} s")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, rpm, tpm in (("solo reintentos", 0, 0), ("token bucket", args.rpm, args.tpm)):
+            # Cupo del servidor lleno al comenzar cada escenario
+            time.sleep(args.window)
+            limiter_options = {"path": os.path.join(tmp_dir, f"{name}.sqlite3"), "rpm": rpm, "tpm": tpm,
+                               "period": args.window}
+            limited_before, requests_before = server.rate_limited, len(server.requests)
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_ratelimit_worker,
+                                     initargs=(server.base_url, limiter_options)) as executor:
+                results = list(executor.map(_ratelimit_request, [prompt] * args.requests))
+            elapsed = time.perf_counter() - start
+
+            latencies = sorted(seconds for ok, seconds in results if ok)
+            failed = sum(not ok for ok, _ in results)
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+            print(f"  {name:16s} {elapsed:6.2f} s  {(len(results) - failed) / elapsed:5.2f} pedidos/s  "
+                  f"{len(server.requests) - requests_before:4d} enviados  {server.rate_limited - limited_before:4d} x 429  "
+                  f"{failed:3d} fallidos  p50 {statistics.median(latencies) if latencies else 0:5.2f} s  p95 {p95:5.2f} s")
+    server.shutdown()
+
+
+def add_parsers(subparsers):
+    summary = subparsers.add_parser("summary", help="single vs chunked summary on a local fake server")
+    summary.add_argument("--pages", type=int, default=300)
+    summary.add_argument("--chunk-tokens", type=int, default=12000)
+    summary.add_argument("--latency", type=float, default=0.5)
+    summary.add_argument("--failure-rate", type=float, default=0.0)
+    summary.set_defaults(func=bench_summary)
+
+    digest = subparsers.add_parser("digest", help="raw vs digest summary prompt: tokens and latency")
+    digest.add_argument("--pdf", nargs="*", default=[SAMPLE_PDF])
+    digest.add_argument("--synthetic-pages", type=int, default=200)
+    digest.add_argument("--latency", type=float, default=0.2)
+    digest.add_argument("--latency-per-1k-tokens", type=float, default=0.05,
+                        help="fake server seconds per 1,000 prompt tokens")
+    digest.set_defaults(func=bench_digest)
+
+    ratelimit = subparsers.add_parser("ratelimit", help="summary burst under rate limits: token bucket vs retries only")
+    ratelimit.add_argument("--requests", type=int, default=60)
+    ratelimit.add_argument("--workers", type=int, default=4)
+    ratelimit.add_argument("--rpm", type=int, default=20, help="requests per window allowed by the fake server")
+    ratelimit.add_argument("--tpm", type=int, default=40000, help="prompt tokens per window allowed by the fake server")
+    ratelimit.add_argument("--window", type=float, default=10.0, help="rate limit window in seconds (60 in production)")
+    ratelimit.add_argument("--prompt-tokens", type=int, default=2000)
+    ratelimit.add_argument("--latency", type=float, default=0.2)
+    ratelimit.set_defaults(func=bench_ratelimit)
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from extractor_pathologies import RULES
+from pdf_summary import SUMMARY_INPUT, SUMMARY_MODE
+
+# Subir este número cuando cambie la lógica de extracción o del resumen:
+# invalida todas las entradas guardadas con la versión anterior.
+EXTRACTION_VERSION = 3
+
+CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "1") == "1"
+CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", os.path.join("cache", "extraction.sqlite3"))
+CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def cache_version():
+    """
+    Version key of the cached data: changes whenever the pathology rules
+    (extractor_pathologies.RULES), EXTRACTION_VERSION or the settings that
+    shape the cached summary (SUMMARY_INPUT, SUMMARY_MODE) change.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(EXTRACTION_VERSION).encode())
+    digest.update(RULES.fingerprint().encode("utf-8"))
+    digest.update(f"{SUMMARY_INPUT}|{SUMMARY_MODE}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Persistent, size-bounded LRU cache of extraction results keyed by the
+    SHA-256 of the uploaded PDF. Backed by SQLite so every gunicorn worker
+    shares the same entries.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, version=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = version or cache_version()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " version TEXT NOT NULL,"
+                " payload BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key):
+        """
+        Returns the cached dict for `key`, or None on a miss or a stale version.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload FROM entries WHERE key = ? AND version = ?", (key, self.version)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, key, data):
+        payload = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        if len(payload) > self.max_bytes:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, version, payload, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, self.version, payload, len(payload), time.time()),
+            )
+            # Las entradas de versiones anteriores ya no sirven
+            conn.execute("DELETE FROM entries WHERE version != ?", (self.version,))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+
+
+_default_cache = None
+
+
+def get_extraction_cache():
+    """
+    Returns the process-wide cache, or None when EXTRACTION_CACHE_ENABLED=0.
+    """
+    global _default_cache
+    if not CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        _default_cache = ExtractionCache()
+    return _default_cache
@@ -1,108 +1,241 @@
-import pdfplumber
 import re
-from collections import defaultdict
-
-# Regex pattern para detectar inicios de patologías ROJO
-pattern = re.compile(
-    r"(?m)^\s*(\d{1,3})\s+([A-ZÁÉÍÓÚÜÑ ]+)\s+ROJO(?:\s+Foto)?",
-    re.MULTILINE
-)
-
-def extract_pathologies_from_pdf(file_stream):
-    pathology_dict = defaultdict(lambda: {"pages": [], "type": "", "description": "", "room": ""})
-
-    full_text = ""
-    page_positions = []
-    page_texts = []
-
-    with pdfplumber.open(file_stream) as pdf:
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text()
-            if text:
-                marker = f"\n<<PAGE {i+1}>>\n"
-                page_positions.append((len(full_text), i + 1))
-                full_text += marker + text
-                page_texts.append((i + 1, text))
-
-    matches = list(pattern.finditer(full_text))
+from functools import lru_cache
+
+SEVERITIES = ("ROJO", "AMARILLO", "VERDE")
+DEFAULT_SEVERITIES = ("ROJO",)
+
+
+class PathologyRules:
+    """
+    Shape of the pathology items of a report: the header line
+    ("<code> <TYPE> <SEVERITY> [Foto]"), the severities, and the lines that
+    end a description block. A single matcher is compiled per combination
+    of severities, so any subset is classified in one sweep over the text.
+    """
+
+    def __init__(self, severities=SEVERITIES, code=r"\d{1,3}", type_chars="A-ZÁÉÍÓÚÜÑ ",
+                 photo_marker="Foto", stop_markers=("-Identificación",), skip_lines=("foto",),
+                 page_break=r"^(Page\s+\d+/\d+|<<PAGE \d+>>)", description_lines=3, room_marker="▼"):
+        self.severities = tuple(severities)
+        self.code = code
+        self.type_chars = type_chars
+        self.photo_marker = photo_marker
+        self.stop_markers = tuple(stop_markers)
+        self.skip_lines = tuple(skip_lines)
+        self.page_break = re.compile(page_break)
+        self.description_lines = description_lines
+        self.room_marker = room_marker
+        self.header_pattern = lru_cache(maxsize=None)(self._compile_header)
+
+    def select(self, severities=None):
+        """
+        Normalizes a subset of severities (None: all of them) to a tuple in
+        rule order, so equal subsets share the same compiled matcher.
+        """
+        if severities is None:
+            return self.severities
+        if isinstance(severities, str):
+            severities = [severities]
+        requested = {severity.upper() for severity in severities}
+        unknown = requested.difference(self.severities)
+        if unknown:
+            raise ValueError(f"Severidad desconocida: {', '.join(sorted(unknown))}")
+        return tuple(severity for severity in self.severities if severity in requested)
+
+    def _compile_header(self, severities):
+        alternatives = "|".join(re.escape(severity) for severity in severities)
+        return re.compile(
+            rf"(?m)^\s*({self.code})\s+([{self.type_chars}]+)\s+({alternatives})(?:\s+{self.photo_marker})?",
+            re.MULTILINE
+        )
+
+    def fingerprint(self):
+        """
+        Text that changes whenever any rule changes (see extraction_cache).
+        """
+        return "\n".join([
+            self.header_pattern(self.severities).pattern,
+            self.photo_marker,
+            "|".join(self.stop_markers),
+            "|".join(self.skip_lines),
+            self.page_break.pattern,
+            str(self.description_lines),
+            self.room_marker,
+        ])
+
+
+RULES = PathologyRules()
+
+# Encabezados de patologías ROJO (el comportamiento histórico por defecto)
+pattern = RULES.header_pattern(DEFAULT_SEVERITIES)
+
+# Prefijos erróneos como "s " y caracteres no alfabéticos antes del texto real
+description_prefix_pattern = re.compile(r"^[^a-zA-Z]*(?:s\s+)?")
+
+
+def _page_room_index(page_text, severities, rules=RULES):
+    """
+    Single forward sweep over the lines of a page, tracking the last "▼" room
+    line seen. Maps every "<code> <type> <SEVERITY>" header that occurs in a
+    line to the room above its first occurrence.
+    """
+    index = {}
+    room = ""
+    for line in page_text.splitlines():
+        digit_positions = None
+        for severity in severities:
+            marker = " " + severity
+            severity_pos = line.find(marker)
+            if severity_pos == -1:
+                continue
+            if digit_positions is None:
+                digit_positions = [pos for pos, ch in enumerate(line) if ch.isdigit()]
+            while severity_pos != -1:
+                header_end = severity_pos + len(marker)
+                for pos in digit_positions:
+                    if pos >= severity_pos:
+                        break
+                    # Sólo códigos completos: "2 HUMEDAD ROJO" no se busca dentro de "12 HUMEDAD ROJO"
+                    if pos and line[pos - 1].isdigit():
+                        continue
+                    index.setdefault(line[pos:header_end], room)
+                severity_pos = line.find(marker, severity_pos + 1)
+        if rules.room_marker in line:
+            room = line.strip(rules.room_marker + " ").strip()
+    return index
+
+
+def _description_from_block(block_text, type_path, severity, rules=RULES):
+    description_lines = []
+    for line in block_text.strip().splitlines():
+        line_strip = line.strip()
+        if not line_strip or line_strip.lower() in rules.skip_lines:
+            continue
+        if any(marker in line_strip for marker in rules.stop_markers):
+            break
+        if rules.page_break.match(line_strip):
+            break
+        description_lines.append(line_strip)
+        if len(description_lines) >= rules.description_lines:
+            break
+
+    description = " ".join(description_lines).strip()
+
+    type_phrase = type_path.lower()
+    if description.lower().startswith(type_phrase):
+        description = description[len(type_phrase):].strip()
+    severity_word = severity.lower()
+    if description.lower().startswith(severity_word):
+        description = description[len(severity_word):].strip()
+
+    return description_prefix_pattern.sub("", description)
+
+
+def _scan_page(page_number, text, severities, rules=RULES):
+    """
+    Yields one header dict per header of the requested severities on a
+    single page, with the raw text of its block. A match never spans pages, and the description of a block
+    always stops at the page end, so each page can be scanned on its own.
+    """
+    matches = list(rules.header_pattern(severities).finditer(text))
+    room_index = _page_room_index(text, severities, rules) if matches else {}
 
     for i, match in enumerate(matches):
         code = match.group(1).strip()
         type_path = match.group(2).strip()
+        severity = match.group(3)
+        end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        block = text[match.end():end_pos]
 
-        start_pos = match.end()
-        end_pos = matches[i+1].start() if i + 1 < len(matches) else len(full_text)
-        block_text = full_text[start_pos:end_pos].strip()
-
-        match_start = match.start()
-        page_number = next((p for pos, p in reversed(page_positions) if match_start >= pos), "?")
-
-        # Verificar si se repite el código y tipo en la siguiente página y usar solo ese contenido si existe
-        if i + 1 < len(matches):
-            next_code = matches[i + 1].group(1).strip()
-            next_type = matches[i + 1].group(2).strip()
-            if next_code == code and next_type == type_path:
-                start_pos = matches[i + 1].end()
-                end_pos = matches[i + 2].start() if i + 2 < len(matches) else len(full_text)
-                block_text = full_text[start_pos:end_pos].strip()
-
-        description_lines = []
-        room = ""
-        lines = block_text.splitlines()
-
-        for line in lines:
-            line_strip = line.strip()
-            if not line_strip or line_strip.lower() == "foto":
-                continue
-            if "-Identificación" in line_strip:
-                break
-            if re.match(r"^(Page\s+\d+/\d+|<<PAGE \d+>>)", line_strip):
-                break
-            description_lines.append(line_strip)
-            if len(description_lines) >= 3:
-                break
-
-        description = " ".join(description_lines).strip()
-
-        type_phrase = type_path.lower()
-        if description.lower().startswith(type_phrase):
-            description = description[len(type_phrase):].strip()
-        if description.lower().startswith("rojo"):
-            description = description[4:].strip()
-
-        # Eliminar prefijos erróneos como "s " y caracteres no alfabéticos antes del texto real
-        description = re.sub(r"^[^a-zA-Z]*(?:s\s+)?", "", description)
-
-        # Nuevo enfoque: detectar habitación según línea con símbolo "▼" (triángulo negro hacia abajo)
-        if not room:
-            page_text = next((text for pg, text in page_texts if str(pg) == str(page_number)), "")
-            lines_page = page_text.splitlines()
-            match_header = f"{code} {type_path} ROJO"
-            match_line_idx = next((idx for idx, l in enumerate(lines_page) if match_header in l), None)
-            if match_line_idx is not None:
-                for prev_line in reversed(lines_page[:match_line_idx]):
-                    if "▼" in prev_line:
-                        room = prev_line.strip("\u25bc ").strip()
-                        break
-
+        yield {
+            "code": code,
+            "type": type_path,
+            "severity": severity,
+            "description": _description_from_block(block, type_path, severity, rules),
+            # Texto completo hasta el próximo encabezado (ver summary_digest)
+            "block": block,
+            # Habitación: última línea con "▼" antes de la primera aparición del encabezado en la página
+            "room": room_index.get(f"{code} {type_path} {severity}", ""),
+            "page": page_number,
+        }
+
+
+def iter_pathologies(page_texts, severities=DEFAULT_SEVERITIES, rules=RULES):
+    """
+    Yields each pathology header of the requested severities as soon as it
+    is complete, reading (page_number, text) pairs lazily: only the current
+    page is held in memory.
+
+    An item is complete once the next header is seen (or the input ends). If
+    the next header repeats the same code and type, the item continues on the
+    next page and takes its description from there. Headers of severities
+    not requested are not seen, as if they were plain text.
+    """
+    severities = rules.select(severities)
+    pending = None
+    for page_number, text in page_texts:
+        if not text:
+            continue
+        for header in _scan_page(page_number, text, severities, rules):
+            if pending is not None:
+                yield _complete_item(pending, header)
+            pending = header
+    if pending is not None:
+        yield _complete_item(pending, None)
+
+
+def _complete_item(header, next_header):
+    # Verificar si se repite el código y tipo en la siguiente página y usar solo ese contenido si existe
+    if next_header is not None and next_header["code"] == header["code"] and next_header["type"] == header["type"]:
+        return dict(header, description=next_header["description"])
+    return header
+
+
+def extract_pathologies_from_texts(page_texts, severities=DEFAULT_SEVERITIES, rules=RULES):
+    """
+    Extracts the pathology items of the requested severities (default ROJO,
+    None for all) from (page_number, text) pairs: one item per code, with
+    every page it appears on, sorted by code.
+    """
+    pathology_dict = {}
+
+    for item in iter_pathologies(page_texts, severities, rules):
+        code = item["code"]
         if code in pathology_dict:
-            if page_number not in pathology_dict[code]["pages"]:
-                pathology_dict[code]["pages"].append(page_number)
+            if item["page"] not in pathology_dict[code]["pages"]:
+                pathology_dict[code]["pages"].append(item["page"])
         else:
-            pathology_dict[code]["type"] = type_path
-            pathology_dict[code]["description"] = description
-            pathology_dict[code]["room"] = room
-            pathology_dict[code]["pages"] = [page_number]
+            pathology_dict[code] = dict(item, pages=[item["page"]])
 
     items = []
     for code, info in pathology_dict.items():
         items.append({
             "code": code,
             "type": info["type"],
+            "severity": info["severity"],
             "description": info["description"],
             "room": info["room"],
             "page": ", ".join(map(str, info["pages"]))
         })
 
     items.sort(key=lambda x: int(x["code"]))
-    return items
\ No newline at end of file
+    return items
+
+
+def extract_pathologies_from_pdf(document, severities=DEFAULT_SEVERITIES):
+    """
+    Extracts the pathology items of the requested severities from an already
+    parsed PDFDocument.
+    """
+    return extract_pathologies_from_texts(document.iter_pages(), severities)
+
+
+def group_by_severity(items):
+    """
+    {severity: items} of an extraction done with several severities, in rule
+    order; every severity is present even without items.
+    """
+    groups = {severity: [] for severity in RULES.severities}
+    for item in items:
+        groups[item["severity"]].append(item)
+    return groups
@@ -1,95 +1,194 @@
-import pdfplumber
-import re
 from datetime import datetime
 from collections import defaultdict
+import re
 from PyPDF2 import PdfReader, PdfWriter
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 import io
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
 import os
+from xml.sax.saxutils import escape
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfmetrics import stringWidth
 
 # Importar la función de extractor_pathologies.py
 from extractor_pathologies import extract_pathologies_from_pdf
 
-# Regex pattern para referencias internas
-pattern = re.compile(
-    r"(?m)^\s*(\d{1,3})\s+([A-ZÁÉÍÓÚÜÑ ]+)\s+ROJO(?:\s+Foto)?",
-    re.MULTILINE
-)
-
-def extract_front_page_info(file_stream):
-    with pdfplumber.open(file_stream) as pdf:
-        first_page = pdf.pages[0]
-        text = first_page.extract_text() or ""
-
-        # Extract address (heuristic: look for lines with address-like content)
-        address = ""
-        inspector = ""
-
-        lines = text.splitlines()
-        for i, line in enumerate(lines):
-            line_lower = line.lower()
-            if "formosa" in line_lower or "buenos aires" in line_lower or "ciudad autónoma" in line_lower:
-                address = line.strip()
-            if "inspector" in line_lower or "firmado por" in line_lower:
-                # Next line likely contains inspector name
-                if i + 1 < len(lines):
-                    inspector = lines[i + 1].strip()
-                break
-
-        # Use current date
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        return {
-            "address": address,
-            "inspector": inspector,
-            "date": date_str
-        }
+_SPANISH_MONTHS = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+    "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+_SPANISH_DATE = re.compile(r"\b(\d{1,2})\s+de\s+([a-záéíóú]+)\s+(?:de(?:l)?\s+)?(\d{4})\b", re.IGNORECASE)
+_NUMERIC_DATE = re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\b")
+
+
+def parse_inspection_date(text):
+    """
+    First date written on the page ("22 de Abril de 2025" or "22/04/2025")
+    as "YYYY-MM-DD", or "" if there is none.
+    """
+    candidates = []
+    for match in _SPANISH_DATE.finditer(text):
+        month = _SPANISH_MONTHS.get(match.group(2).lower())
+        if month:
+            candidates.append((match.start(), int(match.group(3)), month, int(match.group(1))))
+    for match in _NUMERIC_DATE.finditer(text):
+        candidates.append((match.start(), int(match.group(3)), int(match.group(2)), int(match.group(1))))
+    for _, year, month, day in sorted(candidates):
+        try:
+            return datetime(year, month, day).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return ""
+
+
+def extract_front_page_info(document):
+    text = document.page_text(1) or ""
+
+    # Extract address (heuristic: look for lines with address-like content)
+    address = ""
+    inspector = ""
+
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        line_lower = line.lower()
+        if "formosa" in line_lower or "buenos aires" in line_lower or "ciudad autónoma" in line_lower:
+            address = line.strip()
+        if "inspector" in line_lower or "firmado por" in line_lower:
+            # Next line likely contains inspector name
+            if i + 1 < len(lines):
+                inspector = lines[i + 1].strip()
+            break
+
+    # Use current date (fecha de emisión del informe generado)
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    return {
+        "address": address,
+        "inspector": inspector,
+        "date": date_str,
+        # Fecha de la inspección escrita en la portada ("" si no se encuentra)
+        "inspection_date": parse_inspection_date(text),
+    }
 
 from reportlab.lib.utils import ImageReader
 from reportlab.lib.units import inch
 
 from pdf_page3_generator import generate_page3_pdf
+from assets import assets, STATIC_PDFS
+from pdf_optimizer import optimize_pdf_writer, REPORT_OPTIMIZE_PROFILE
+from tracing import stage
+from report_styles import (TITLE, LONG_TABLE, LONG_TABLE_HEADER, LONG_TABLE_CELL,
+                           LONG_TABLE_CELL_PADDING)
+
+# Desde cuántos ítems la tabla se corta por páginas de antemano ("0": siempre)
+PATHOLOGY_TABLE_LONG_ROWS = int(os.getenv("PATHOLOGY_TABLE_LONG_ROWS", "100"))
 
-def generate_pathology_table_pdf(items):
+TABLE_HEADER = ["Código", "Tipo", "Descripción", "Habitación", "Página"]
+
+# Anchos fijos (en puntos) para el ancho útil de carta con márgenes de 1": la descripción se lleva el resto
+_LONG_TABLE_WIDTHS = (46, 88, None, 84, 44)
+
+
+def generate_pathology_table_pdf(items, long_table=None):
+    """
+    PDF with the pathology table: fixed column widths that fit the page and
+    wrapped cells for every size. Long lists (PATHOLOGY_TABLE_LONG_ROWS items
+    or more, or `long_table=True`) are also cut into one table per page
+    beforehand; shorter ones are one table that ReportLab splits.
+    """
+    if long_table is None:
+        long_table = len(items) >= PATHOLOGY_TABLE_LONG_ROWS
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-    
-    # Añadir título a la tabla
-    styles = getSampleStyleSheet()
-    title = Paragraph("Tabla de Patologías", styles['Heading1'])
-    elements.append(title)
-    elements.append(Spacer(1, 20))
-    
-    data = [["Código", "Tipo", "Descripción", "Habitación", "Página"]]
-    for item in items:
-        data.append([
-            item.get("code", ""),
-            item.get("type", ""),
-            item.get("description", ""),
-            item.get("room", ""),
-            item.get("page", "")
-        ])
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 4),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-    ]))
-
-    elements.append(table)
-    doc.build(elements)
+    # El frame de SimpleDocTemplate tiene 6 puntos de padding por lado
+    frame_width, frame_height = doc.width - 12, doc.height - 12
+    doc.build(_build_table_elements(items, frame_width, frame_height, paginate=long_table))
     buffer.seek(0)
     return buffer
 
+
+class _WrappedParagraph(Paragraph):
+    """
+    Paragraph that breaks its lines once per width: the row height is
+    measured before building the table, and the table wraps every cell
+    again when drawing it.
+    """
+
+    def wrap(self, availWidth, availHeight):
+        if getattr(self, "_wrapped_width", None) != availWidth:
+            self._wrapped_size = Paragraph.wrap(self, availWidth, availHeight)
+            self._wrapped_width = availWidth
+        return self._wrapped_size
+
+
+def _column_widths(available_width):
+    fixed = sum(width for width in _LONG_TABLE_WIDTHS if width)
+    return [width or available_width - fixed for width in _LONG_TABLE_WIDTHS]
+
+
+def _table_row(values, style, col_widths):
+    """
+    Cells of one row and the row height, measured once. Only text that does
+    not fit on one line becomes a wrapped Paragraph; the rest stays a plain
+    string, which ReportLab draws without measuring.
+    """
+    cells = []
+    height = style.leading
+    for value, width in zip(values, col_widths):
+        text = str(value)
+        inner_width = width - 2 * LONG_TABLE_CELL_PADDING
+        if "\n" not in text and stringWidth(text, style.fontName, style.fontSize) <= inner_width:
+            cells.append(text)
+            continue
+        cell = _WrappedParagraph(escape(text), style)
+        height = max(height, cell.wrap(inner_width, 0)[1])
+        cells.append(cell)
+    return cells, height + 2 * LONG_TABLE_CELL_PADDING
+
+
+def _build_table_elements(items, frame_width, frame_height, paginate=True):
+    """
+    Flowables of the pathology table, with fixed column widths and
+    precomputed row heights so ReportLab never measures columns; each row is
+    wrapped once. With `paginate` there is one Table per page, each with its
+    own header row, and no table is ever split, which keeps the cost linear
+    in the number of items; otherwise a single Table repeating its header.
+    """
+    col_widths = _column_widths(frame_width)
+
+    title = Paragraph("Tabla de Patologías", TITLE)
+    title_height = title.wrap(frame_width, frame_height)[1] + TITLE.spaceAfter + 20
+    header, header_height = _table_row(TABLE_HEADER, LONG_TABLE_HEADER, col_widths)
+
+    elements = [title, Spacer(1, 20)]
+    rows, heights = [], []
+    available = frame_height - title_height - header_height
+
+    def flush():
+        table = Table([header] + rows, colWidths=col_widths, rowHeights=[header_height] + heights, repeatRows=1)
+        table.setStyle(LONG_TABLE)
+        elements.append(table)
+
+    for item in items:
+        cells, height = _table_row(
+            [item.get("code", ""), item.get("type", ""), item.get("description", ""),
+             item.get("room", ""), item.get("page", "")],
+            LONG_TABLE_CELL, col_widths,
+        )
+        if paginate and rows and height > available:
+            flush()
+            elements.append(PageBreak())
+            rows, heights = [], []
+            available = frame_height - header_height
+        rows.append(cells)
+        heights.append(height)
+        available -= height
+
+    if rows or not items:
+        flush()
+    return elements
+
+
 def generate_custom_page(info):
     buffer = io.BytesIO()
     c = canvas.Canvas(buffer, pagesize=letter)
@@ -102,7 +201,7 @@ def generate_custom_page(info):
     # Ajustar el gráfico de líneas para que ocupe desde margen izquierdo a derecho
     lineas_image_width = width  # full width, zero margin
     lineas_image_height = 200
-    c.drawImage("images/lineas_check_front.png",
+    c.drawImage(assets.image("lineas_check_front"),
                 0,  # left edge
                 (height - lineas_image_height) / 2,  # vertically centered
                 lineas_image_width,
@@ -112,7 +211,7 @@ def generate_custom_page(info):
     # Colocar el logo encima de las líneas y centrado verticalmente
     logo_width = 400  # Ajustar según el tamaño real de tu logo
     logo_height = 160
-    c.drawImage("images/Logo_check_front.png",
+    c.drawImage(assets.image("logo_check_front"),
                 (width - logo_width) / 2,  # horizontally centered
                 (height - logo_height) / 2,  # vertically centered
                 logo_width,
@@ -138,43 +237,73 @@ def generate_front_page_pdf(info):
     buffer.seek(0)
     return buffer
 
-def compose_final_report(original_pdf_path, front_page_info, pathology_items, output_path, form_data=None, summary_pdf=None):
-    # Generate pathology table PDF
-    pathology_table_pdf = generate_pathology_table_pdf(pathology_items)
-    
-    # Generate the custom page with background color and images
-    custom_page_pdf = generate_custom_page(front_page_info)
-    
-    # Load additional pages from PDF folder
-    page2_path = os.path.join("pdf", "page2.pdf")
-    page4_path = os.path.join("pdf", "page4.pdf")
-    termspage1_path = os.path.join("pdf", "termspage1.pdf")
-    termspage2_path = os.path.join("pdf", "termspage2.pdf")
-    lastpage_path = os.path.join("pdf", "lastpage.pdf")
-    
+def get_cover_pages():
+    """
+    The branded cover only depends on its two images, so it is rendered once
+    and reused as ready-made PDF pages until one of the images changes.
+    """
+    return assets.template_pages("cover", lambda: generate_custom_page(None),
+                                 images=("lineas_check_front", "logo_check_front"))
+
+def warm_report_templates():
+    """
+    Loads static pages and images, renders the memoised templates and goes
+    once through every generated page with placeholder data, so no request
+    pays for first-use costs: PyPDF2 resolves the objects of the static PDFs
+    lazily and ReportLab encodes the header image on first draw.
+    Called before forking the workers (see app.warm_up).
+    """
+    assets.preload()
+    get_cover_pages()
+    writer = PdfWriter()
+    for name in STATIC_PDFS:
+        add_static_pages(writer, name)
+    render_report_pages({}, [{"code": "1", "type": "HUMEDAD", "description": "", "room": "", "page": "1"}],
+                        form_data={"inspector": ""})
+
+def render_report_pages(front_page_info, pathology_items, form_data=None):
+    """
+    Renders the generated pages of the report that do not depend on the
+    summary, so they can be built while the summary is still being requested.
+    The cover is not rendered per request: see get_cover_pages().
+    """
     # Generate page3 dynamically from form data if provided
-    page3_pdf = None
-    if form_data:
-        page3_pdf = generate_page3_pdf(form_data)
+    with stage("page3"):
+        page3_pdf = generate_page3_pdf(form_data) if form_data else None
+    # Generate pathology table PDF
+    with stage("pathology_table"):
+        pathology_table_pdf = generate_pathology_table_pdf(pathology_items)
+    return {
+        "page3_pdf": page3_pdf,
+        "pathology_table_pdf": pathology_table_pdf,
+    }
+
+def add_static_pages(writer, name):
+    """
+    Appends the pages of a static PDF from the process-wide asset registry.
+    """
+    with assets.lock:
+        for page in assets.pdf_pages(name):
+            writer.add_page(page)
+
+def compose_final_report(original_pdf_path, front_page_info, pathology_items, output_path, form_data=None, summary_pdf=None, rendered_pages=None, optimize_profile=None):
+    if rendered_pages is None:
+        rendered_pages = render_report_pages(front_page_info, pathology_items, form_data)
+    page3_pdf = rendered_pages["page3_pdf"]
+    pathology_table_pdf = rendered_pages["pathology_table_pdf"]
     
     reader_original = PdfReader(original_pdf_path)
     writer = PdfWriter()
 
-    # Add our custom page as the first page
-    custom_reader = PdfReader(custom_page_pdf)
-    writer.add_page(custom_reader.pages[0])
+    # Add our custom page as the first page (memoised, no rendering)
+    with assets.lock:
+        writer.add_page(get_cover_pages()[0])
     
-    # Add page2 from pdf folder
-    if os.path.exists(page2_path):
-        page2_reader = PdfReader(page2_path)
-        for page in page2_reader.pages:
-            writer.add_page(page)
+    # Add page2 from pdf folder (preloaded by the asset registry)
+    add_static_pages(writer, "page2")
     
     # Add page4 from pdf folder (added as per user request)
-    if os.path.exists(page4_path):
-        page4_reader = PdfReader(page4_path)
-        for page in page4_reader.pages:
-            writer.add_page(page)
+    add_static_pages(writer, "page4")
     
     # Add dynamically generated page3 or try to load it from pdf folder
     if page3_pdf:
@@ -183,11 +312,7 @@ def compose_final_report(original_pdf_path, front_page_info, pathology_items, ou
             writer.add_page(page)
     else:
         # Fallback to static file if form_data not provided
-        page3_path = os.path.join("pdf", "page3.pdf")
-        if os.path.exists(page3_path):
-            page3_reader = PdfReader(page3_path)
-            for page in page3_reader.pages:
-                writer.add_page(page)
+        add_static_pages(writer, "page3")
     
     # Keep original front page as the next page
     if len(reader_original.pages) > 0:
@@ -213,11 +338,14 @@ def compose_final_report(original_pdf_path, front_page_info, pathology_items, ou
         writer.add_page(reader_original.pages[i])
 
     # Add terms pages in order
-    for path in [termspage1_path, termspage2_path, lastpage_path]:
-        if os.path.exists(path):
-            term_reader = PdfReader(path)
-            for page in term_reader.pages:
-                writer.add_page(page)
+    for name in ["termspage1", "termspage2", "lastpage"]:
+        add_static_pages(writer, name)
+
+    # Optional size optimisation ("email" / "web", see pdf_optimizer.PROFILES)
+    if optimize_profile is None:
+        optimize_profile = REPORT_OPTIMIZE_PROFILE
+    if optimize_profile:
+        optimize_pdf_writer(writer, optimize_profile)
 
     # Save final composed PDF
     with open(output_path, "wb") as f_out:
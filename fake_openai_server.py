@@ -0,0 +1,168 @@
+"""
+Local fake of the OpenAI chat-completions endpoint, for running the summary
+stage offline (tests, benchmarks, load tests).
+
+    python fake_openai_server.py --port 8001 --latency 0.5 --latency-per-1k-tokens 0.05
+    python fake_openai_server.py --port 8001 --rpm 60 --tpm 20000
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=fake python app.py
+
+Responses are deterministic and include a `usage` block estimated from the
+prompt size. The response time is `latency` plus `token_latency` seconds per
+1,000 prompt tokens, so larger prompts answer later as with the real API.
+
+With `rpm` / `tpm`, requests beyond that many requests / prompt tokens per
+`window` seconds (60: per minute) are answered with a 429 and a Retry-After
+header, like the real rate limits.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, failure_rate=0.0, token_latency=0.0, rpm=0, tpm=0, window=60.0):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.token_latency = token_latency
+        self.failure_rate = failure_rate
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.requests = []
+        self.rate_limited = 0
+        # Cupo disponible de pedidos y tokens
+        self.quota = {}
+        self.checked_at = time.time()
+        self.lock = threading.Lock()
+
+    def check_rate_limit(self, prompt_tokens):
+        """
+        Charges one request and its prompt tokens to the quotas, which refill
+        continuously (`rpm` / `tpm` per `window` seconds) as the real API
+        does. Returns None if accepted, or the seconds until it would fit.
+        """
+        now = time.time()
+        with self.lock:
+            elapsed, self.checked_at = now - self.checked_at, now
+            wait = 0.0
+            for name, limit, amount in (("requests", self.rpm, 1), ("tokens", self.tpm, prompt_tokens)):
+                if not limit:
+                    continue
+                self.quota[name] = min(limit, self.quota.get(name, limit) + elapsed * limit / self.window)
+                needed = min(amount, limit)
+                if self.quota[name] < needed:
+                    wait = max(wait, (needed - self.quota[name]) * self.window / limit)
+            if wait:
+                self.rate_limited += 1
+                return wait
+            for name, amount in (("requests", 1), ("tokens", prompt_tokens)):
+                if name in self.quota:
+                    self.quota[name] -= amount
+        return None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        messages = request.get("messages", [])
+        prompt_tokens = sum(len(m.get("content", "")) // 4 + 1 for m in messages)
+
+        with self.server.lock:
+            self.server.requests.append({"time": time.time(), "prompt_tokens": prompt_tokens})
+
+        retry_after = self.server.check_rate_limit(prompt_tokens)
+        if retry_after is not None:
+            self._send_json(429, {"error": {"message": "simulated rate limit", "type": "requests",
+                                            "code": "rate_limit_exceeded"}},
+                            headers={"Retry-After": f"{retry_after:.2f}"})
+            return
+
+        delay = self.server.latency + self.server.token_latency * prompt_tokens / 1000
+        if delay:
+            time.sleep(delay)
+
+        if random.random() < self.server.failure_rate:
+            self._send_json(500, {"error": {"message": "simulated failure", "type": "server_error"}})
+            return
+
+        user_content = messages[-1].get("content", "") if messages else ""
+        content = f"Resumen simulado: {len(user_content.splitlines())} líneas, {prompt_tokens} tokens de entrada."
+        completion_tokens = len(content) // 4 + 1
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+def start_fake_server(host="127.0.0.1", port=0, **options):
+    """
+    Starts the fake server in a background thread and returns it.
+    Use `server.base_url` as OPENAI_BASE_URL and `server.shutdown()` to stop it.
+    """
+    server = FakeOpenAIServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--latency-per-1k-tokens", type=float, default=0.0, help="seconds added per 1,000 prompt tokens")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per window before answering 429 (0: no limit)")
+    parser.add_argument("--tpm", type=int, default=0, help="prompt tokens per window before answering 429 (0: no limit)")
+    parser.add_argument("--window", type=float, default=60.0, help="rate limit window in seconds")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer((args.host, args.port), latency=args.latency, failure_rate=args.failure_rate,
+                              token_latency=args.latency_per_1k_tokens, rpm=args.rpm, tpm=args.tpm,
+                              window=args.window)
+    print(f"Fake OpenAI server on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
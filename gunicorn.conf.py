@@ -0,0 +1,11 @@
+# Configuración de gunicorn (se carga automáticamente desde el directorio de trabajo)
+
+# Importar la app en el master antes de forkear: openai, reportlab, pdfplumber y los
+# estilos (report_styles) se cargan una vez y cada worker nuevo los hereda ya listos
+preload_app = True
+
+
+def when_ready(server):
+    # Pre-cargar páginas estáticas, imágenes, la portada y las plantillas, también antes de forkear
+    from app import warm_up
+    warm_up()
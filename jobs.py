@@ -0,0 +1,249 @@
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pipeline import run_report_pipeline
+
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Horas que se conservan los jobs terminados (done o failed) antes de borrarlos
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+# Minutos sin avance tras los que un job queued o running se da por fallido (su proceso murió)
+JOB_STALE_MINUTES = float(os.getenv("JOB_STALE_MINUTES", "60"))
+# Segundos mínimos entre dos barridos de jobs vencidos en un mismo proceso
+JOB_SWEEP_INTERVAL = float(os.getenv("JOB_SWEEP_INTERVAL", "600"))
+
+logger = logging.getLogger(__name__)
+
+# Estados de un job: queued -> running -> done | failed
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class JobStore:
+    """
+    On-disk job store shared by every web worker and job process.
+    Each job keeps its input and output PDF under JOBS_DIR/<job_id>/.
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self.db_path = os.path.join(jobs_dir, "jobs.sqlite3")
+        os.makedirs(jobs_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " stage TEXT NOT NULL,"
+                " progress INTEGER NOT NULL,"
+                " error TEXT,"
+                " form_data TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def input_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), "input.pdf")
+
+    def output_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), "reporte_final.pdf")
+
+    def create(self, form_data):
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, stage, progress, form_data, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, "queued", 0, json.dumps(form_data, ensure_ascii=False), now, now),
+            )
+        return job_id
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["form_data"] = json.loads(job["form_data"])
+        return job
+
+    def fail_stale(self, max_age_seconds, error):
+        """
+        Marks as failed the queued and running jobs not updated for more than
+        `max_age_seconds`, e.g. because their process was killed. Returns how many.
+        """
+        cutoff = time.time() - max_age_seconds
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ?"
+                " WHERE status IN (?, ?) AND updated_at < ?",
+                (STATUS_FAILED, error, time.time(), STATUS_QUEUED, STATUS_RUNNING, cutoff),
+            )
+            return cursor.rowcount
+
+    def purge(self, max_age_seconds):
+        """
+        Deletes the finished and failed jobs last updated more than
+        `max_age_seconds` ago, with their files. Returns how many were deleted.
+        """
+        cutoff = time.time() - max_age_seconds
+        with self._connect() as conn:
+            job_ids = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (STATUS_DONE, STATUS_FAILED, cutoff),
+            )]
+        for job_id in job_ids:
+            # Primero los archivos: si falla el borrado, el job sigue registrado y se reintenta
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+            with self._connect() as conn:
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return len(job_ids)
+
+
+def _run_job(jobs_dir, job_id):
+    """
+    Job process entry point: runs the pipeline and records per-stage progress.
+    Returns the trace of the run, also when it failed (None if tracing is disabled);
+    it is already in the shared metrics.
+    """
+    store = JobStore(jobs_dir)
+    job = store.get(job_id)
+
+    def progress(stage, percent):
+        store.update(job_id, stage=stage, progress=percent)
+
+    store.update(job_id, status=STATUS_RUNNING, stage="starting", progress=5)
+    try:
+        result = run_report_pipeline(store.input_path(job_id), store.output_path(job_id), job["form_data"],
+                                     progress=progress)
+    except Exception as e:
+        # El traceback queda en el log; el cliente sólo ve un mensaje corto
+        logger.exception("Job %s failed", job_id)
+        store.update(job_id, status=STATUS_FAILED, error=f"Report generation failed ({type(e).__name__})")
+        return getattr(e, "report_trace", None)
+    store.update(job_id, status=STATUS_DONE, stage="done", progress=100)
+    return result.get("trace")
+
+
+def _job_done(store, job_id, executor, future):
+    """
+    Done callback of a job in the web process: marks the job failed if its
+    process died (the pool is then rebuilt). Its trace was already recorded
+    in the shared metrics by the job process.
+    """
+    try:
+        future.result()
+    except Exception as e:
+        logger.error("Job %s process failed: %r", job_id, e)
+        store.update(job_id, status=STATUS_FAILED, error="Report generation failed (worker process died)")
+        if isinstance(e, BrokenProcessPool):
+            _discard_executor(executor)
+
+
+_store = None
+_executor = None
+_last_sweep = None
+
+
+def get_job_store():
+    global _store
+    if _store is None:
+        _store = JobStore()
+    return _store
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # forkserver: un fork del worker web copiaría el estado de sus pools de hilos
+        # (pipeline._summary_executor) sin los hilos, y el resumen del job nunca correría
+        _executor = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+    return _executor
+
+
+def _discard_executor(executor):
+    """
+    Drops `executor` after one of its processes died: a broken pool rejects
+    every later job, so the next submit creates a new one.
+    """
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _sweep_expired_jobs(store):
+    """
+    Fails the queued and running jobs without progress for JOB_STALE_MINUTES
+    and removes finished jobs older than JOB_RETENTION_HOURS, at most once
+    per JOB_SWEEP_INTERVAL seconds in each process.
+    """
+    global _last_sweep
+    now = time.monotonic()
+    if _last_sweep is not None and now - _last_sweep < JOB_SWEEP_INTERVAL:
+        return
+    _last_sweep = now
+    try:
+        stale = store.fail_stale(JOB_STALE_MINUTES * 60, "Report generation failed (no progress)")
+        deleted = store.purge(JOB_RETENTION_HOURS * 3600)
+    except Exception:
+        logger.exception("Could not remove expired jobs")
+        return
+    if stale:
+        logger.warning("Marked %d stalled jobs as failed", stale)
+    if deleted:
+        logger.info("Removed %d expired jobs", deleted)
+
+
+def submit_job(file_storage, form_data):
+    """
+    Saves the upload into the job store and queues it on the local worker pool.
+    Returns the job id immediately.
+    """
+    store = get_job_store()
+    _sweep_expired_jobs(store)
+    job_id = store.create(form_data)
+    try:
+        file_storage.save(store.input_path(job_id))
+        try:
+            executor = _get_executor()
+            future = executor.submit(_run_job, store.jobs_dir, job_id)
+        except BrokenProcessPool:
+            # Un proceso del pool murió (p. ej. por memoria): pool nuevo y un reintento
+            logger.warning("Job pool broken, starting a new one")
+            _discard_executor(executor)
+            executor = _get_executor()
+            future = executor.submit(_run_job, store.jobs_dir, job_id)
+    except Exception:
+        # Sin job en cola no debe quedar una fila queued huérfana
+        store.update(job_id, status=STATUS_FAILED, error="Report generation could not be queued")
+        raise
+    future.add_done_callback(functools.partial(_job_done, store, job_id, executor))
+    return job_id
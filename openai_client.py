@@ -0,0 +1,320 @@
+"""
+Shared OpenAI client for the summary requests.
+
+- One client per process, with a keep-alive connection pool, reused by
+  every request and thread instead of a new connection per call.
+- Explicit connect/read timeouts.
+- Retries of 429, timeouts, connection errors and 5xx with exponential
+  backoff and full jitter (honouring Retry-After); the SDK's own retries are
+  disabled so there is a single retry policy.
+- A token bucket on requests and tokens per minute shared by every worker
+  process through a local SQLite file, so a burst of uploads is spread
+  under the account limits instead of failing together on 429s. A 429
+  empties the buckets, which pauses the other workers as well.
+- An optional deadline per call: no retry, backoff or rate limit wait goes
+  past it, so an abandoned summary stops spending threads and tokens.
+"""
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import openai
+
+from openai_config import OPENAI_API_KEY
+
+logger = logging.getLogger(__name__)
+
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "1"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "60"))
+
+# Límites de la cuenta por período (60 s = por minuto); 0 desactiva el límite.
+# OPENAI_TPM desactivado por defecto: con el límite de la cuenta, fijarlo teniendo en
+# cuenta SUMMARY_TIMEOUT (un resumen que espera cupo más que eso se pierde)
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "0"))
+OPENAI_RATE_LIMIT_PERIOD = float(os.getenv("OPENAI_RATE_LIMIT_PERIOD", "60"))
+OPENAI_RATE_LIMIT_PATH = os.getenv("OPENAI_RATE_LIMIT_PATH", os.path.join("cache", "openai_rate_limit.sqlite3"))
+# Espera máxima por cupo antes de dar el pedido por fallido
+OPENAI_RATE_LIMIT_MAX_WAIT = float(os.getenv("OPENAI_RATE_LIMIT_MAX_WAIT", "300"))
+# Tokens de respuesta que se reservan antes de conocer el uso real
+OPENAI_EXPECTED_COMPLETION_TOKENS = int(os.getenv("OPENAI_EXPECTED_COMPLETION_TOKENS", "1000"))
+
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+class RateLimitWaitTimeout(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    """
+    Token buckets shared by every process using the same SQLite file. Each
+    bucket holds up to `capacity` units and refills `capacity` per `period`
+    seconds; acquire() takes units from all of them atomically, or waits.
+    """
+
+    def __init__(self, path, limits, period=60.0):
+        self.path = path
+        self.period = period
+        # Buckets sin límite (0) no se registran
+        self.limits = {name: capacity for name, capacity in limits.items() if capacity > 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " name TEXT PRIMARY KEY,"
+                " level REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _levels(self, conn, now):
+        levels = {}
+        for name, capacity in self.limits.items():
+            row = conn.execute("SELECT level, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                levels[name] = capacity
+            else:
+                level, updated_at = row
+                levels[name] = min(capacity, level + (now - updated_at) * capacity / self.period)
+        return levels
+
+    def _store(self, conn, levels, now):
+        conn.executemany(
+            "INSERT OR REPLACE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+            [(name, level, now) for name, level in levels.items()],
+        )
+
+    def acquire(self, max_wait=None, **amounts):
+        """
+        Takes `amounts` ({bucket: units}) from the buckets, waiting until all
+        of them have enough. Returns the seconds waited. An amount larger
+        than the bucket only waits for a full bucket.
+        """
+        if not self.limits:
+            return 0.0
+        start = time.monotonic()
+        while True:
+            conn = self._connect()
+            try:
+                # BEGIN IMMEDIATE: lectura y descuento atómicos entre procesos
+                conn.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                levels = self._levels(conn, now)
+                wait = 0.0
+                for name, amount in amounts.items():
+                    if name not in self.limits:
+                        continue
+                    needed = min(amount, self.limits[name])
+                    if levels[name] < needed:
+                        wait = max(wait, (needed - levels[name]) * self.period / self.limits[name])
+                if wait == 0.0:
+                    for name, amount in amounts.items():
+                        if name in levels:
+                            levels[name] -= amount
+                self._store(conn, levels, now)
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+
+            waited = time.monotonic() - start
+            if wait == 0.0:
+                return waited
+            if max_wait is not None and waited + wait > max_wait:
+                raise RateLimitWaitTimeout(f"No rate limit capacity within {max_wait:.0f} s")
+            time.sleep(wait + random.uniform(0, 0.05))
+
+    def adjust(self, **amounts):
+        """
+        Corrects a reservation once the real usage is known: positive amounts
+        are taken (the level may go below zero), negative ones returned.
+        """
+        self._update(lambda name, level: level - amounts.get(name, 0))
+
+    def drain(self):
+        """
+        Empties every bucket, e.g. after a 429: all processes wait for the refill.
+        """
+        self._update(lambda name, level: min(level, 0.0))
+
+    def _update(self, change):
+        if not self.limits:
+            return
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            levels = {name: change(name, level) for name, level in self._levels(conn, now).items()}
+            self._store(conn, levels, now)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+_limiter = None
+_overrides = {}
+
+
+def configure_openai_client(**overrides):
+    """
+    Overrides client options (base_url, api_key, ...) and drops the current
+    client; e.g. to point the summary at fake_openai_server.
+    """
+    global _client
+    with _lock:
+        _overrides.update(overrides)
+        _client = None
+
+
+def get_openai_client():
+    """
+    Returns the client of this process, creating it on first use. Worker
+    processes never reuse a client (and its connections) from their parent.
+    """
+    global _client, _client_pid
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            # Limits es la clase del cliente HTTP que use el SDK (httpx)
+            limits = type(openai.DEFAULT_CONNECTION_LIMITS)(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+            )
+            options = {
+                "api_key": OPENAI_API_KEY,
+                "timeout": openai.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                "max_retries": 0,
+                "http_client": openai.DefaultHttpxClient(limits=limits),
+            }
+            options.update(_overrides)
+            _client = openai.OpenAI(**options)
+            _client_pid = os.getpid()
+        return _client
+
+
+def configure_rate_limiter(path=None, rpm=None, tpm=None, period=None):
+    """
+    Replaces the rate limiter of this process; options not given keep their
+    OPENAI_* setting. rpm or tpm 0 disables that limit.
+    """
+    global _limiter
+    limits = {
+        "requests": OPENAI_RPM if rpm is None else rpm,
+        "tokens": OPENAI_TPM if tpm is None else tpm,
+    }
+    with _lock:
+        _limiter = TokenBucket(path or OPENAI_RATE_LIMIT_PATH, limits,
+                               period=OPENAI_RATE_LIMIT_PERIOD if period is None else period)
+
+
+def get_rate_limiter():
+    global _limiter
+    with _lock:
+        if _limiter is None:
+            _limiter = TokenBucket(OPENAI_RATE_LIMIT_PATH, {"requests": OPENAI_RPM, "tokens": OPENAI_TPM},
+                                   period=OPENAI_RATE_LIMIT_PERIOD)
+        return _limiter
+
+
+def _is_retryable(error):
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in _RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt, base=None, maximum=None):
+    """
+    Full-jitter exponential backoff: uniform in [0, min(maximum, base * 2**attempt)].
+    """
+    base = OPENAI_BACKOFF_BASE if base is None else base
+    maximum = OPENAI_BACKOFF_MAX if maximum is None else maximum
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+def _remaining(deadline):
+    """
+    Seconds left until `deadline` (a time.monotonic() value); raises
+    DeadlineExceeded once it has passed. None without deadline.
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("OpenAI request deadline exceeded")
+    return remaining
+
+
+def create_chat_completion(messages, estimated_tokens, max_retries=None, deadline=None, **options):
+    """
+    chat.completions.create() through the shared client, within the rate
+    limit and with retries. `estimated_tokens` is reserved from the token
+    bucket before sending and corrected with the usage of the response.
+    With `deadline` (a time.monotonic() value) the request timeout, the
+    rate limit wait and the retries are cut to it, and DeadlineExceeded
+    (or the last error) is raised instead of going past it.
+    """
+    max_retries = OPENAI_MAX_RETRIES if max_retries is None else max_retries
+    limiter = get_rate_limiter()
+    reserved = estimated_tokens + OPENAI_EXPECTED_COMPLETION_TOKENS
+
+    for attempt in range(max_retries + 1):
+        remaining = _remaining(deadline)
+        max_wait = OPENAI_RATE_LIMIT_MAX_WAIT if remaining is None else min(OPENAI_RATE_LIMIT_MAX_WAIT, remaining)
+        limiter.acquire(max_wait=max_wait, requests=1, tokens=reserved)
+        request_options = dict(options)
+        remaining = _remaining(deadline)
+        if remaining is not None:
+            request_options["timeout"] = openai.Timeout(min(OPENAI_TIMEOUT, remaining),
+                                                        connect=min(OPENAI_CONNECT_TIMEOUT, remaining))
+        try:
+            response = get_openai_client().chat.completions.create(messages=messages, **request_options)
+        except Exception as error:
+            # El pedido fallido no consume tokens: se devuelve la reserva
+            limiter.adjust(tokens=-reserved)
+            if attempt == max_retries or not _is_retryable(error):
+                raise
+            if isinstance(error, openai.RateLimitError):
+                limiter.drain()
+            delay = max(backoff_delay(attempt), _retry_after(error) or 0)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                # El reintento llegaría tarde: se corta aquí
+                raise
+            logger.warning("OpenAI request failed (%s), retry %d/%d in %.1f s",
+                           type(error).__name__, attempt + 1, max_retries, delay)
+            time.sleep(delay)
+            continue
+
+        usage = getattr(response, "usage", None)
+        total_tokens = getattr(usage, "total_tokens", None)
+        if total_tokens is not None:
+            limiter.adjust(tokens=total_tokens - reserved)
+        return response
@@ -0,0 +1,215 @@
+"""
+Cheap first pass over the raw content streams of a PDF to find the pages
+worth running pdfplumber's layout analysis on.
+
+Every string shown on a page is decoded through its font's ToUnicode map
+(or the simple font encoding) and concatenated in content stream order; no
+character positions, no layout. A page is a candidate if that text contains
+one of the tokens. Whenever a page cannot be decoded with certainty (a
+composite font without ToUnicode, inline images, nested parentheses...) it
+is kept as a candidate, so filtering never drops a page that matters.
+"""
+import re
+import time
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject
+
+try:
+    from pdfminer.glyphlist import glyphname2unicode
+except ImportError:
+    glyphname2unicode = {}
+
+# Operadores de texto del content stream: cambio de fuente y strings (literales o hex)
+_content_token = re.compile(
+    rb"/([^\s/\[\]()<>{}%]+)\s+[-+\d.]+\s+Tf"
+    rb"|\(((?:\\.|[^\\)])*)\)"
+    rb"|<([0-9A-Fa-f\s]*)>",
+    re.S,
+)
+_inline_image = re.compile(rb"(?:^|\s)BI\s")
+_cmap_bfchar = re.compile(rb"beginbfchar(.*?)endbfchar", re.S)
+_cmap_bfrange = re.compile(rb"beginbfrange(.*?)endbfrange", re.S)
+_cmap_hex = re.compile(rb"<([0-9A-Fa-f\s]*)>")
+_cmap_range_entry = re.compile(rb"<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>\s*(?:<([0-9A-Fa-f]+)>|\[([^\]]*)\])")
+_literal_escape = re.compile(rb"\\([0-7]{1,3}|.)", re.S)
+_LITERAL_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f", b"\n": b"", b"\r": b""}
+
+
+class _Undecodable(Exception):
+    pass
+
+
+def _hex_bytes(value):
+    value = re.sub(rb"\s", b"", value)
+    if len(value) % 2:
+        value += b"0"
+    return bytes.fromhex(value.decode("ascii"))
+
+
+def _utf16(value):
+    return _hex_bytes(value).decode("utf-16-be", errors="replace")
+
+
+def _parse_to_unicode(data):
+    """
+    {code bytes: text} and the code width in bytes from a ToUnicode CMap.
+    """
+    mapping = {}
+    for block in _cmap_bfchar.findall(data):
+        values = _cmap_hex.findall(block)
+        for source, target in zip(values[::2], values[1::2]):
+            mapping[_hex_bytes(source)] = _utf16(target)
+    for block in _cmap_bfrange.findall(data):
+        for low, high, target, targets in _cmap_range_entry.findall(block):
+            width = len(low) // 2
+            low, high = int(low, 16), int(high, 16)
+            if target:
+                base = _utf16(target)
+                for offset in range(high - low + 1):
+                    # Se incrementa el último carácter del destino
+                    mapping[(low + offset).to_bytes(width, "big")] = base[:-1] + chr(ord(base[-1]) + offset)
+            else:
+                for offset, value in enumerate(_cmap_hex.findall(targets)):
+                    mapping[(low + offset).to_bytes(width, "big")] = _utf16(value)
+    widths = {len(code) for code in mapping}
+    if len(widths) > 1:
+        raise _Undecodable("mixed code widths")
+    return mapping, widths.pop() if widths else 1
+
+
+def _simple_font_map(font):
+    """
+    {code byte: text} for a simple font without ToUnicode: Latin-1 patched
+    with the /Differences of its encoding.
+    """
+    mapping = {bytes([code]): chr(code) for code in range(256)}
+    encoding = font.get("/Encoding")
+    if hasattr(encoding, "get_object"):
+        encoding = encoding.get_object()
+    if isinstance(encoding, dict):
+        code = 0
+        for entry in encoding.get("/Differences", []):
+            if isinstance(entry, int):
+                code = entry
+                continue
+            mapping[bytes([code % 256])] = glyphname2unicode.get(str(entry)[1:], "")
+            code += 1
+    return mapping, 1
+
+
+def _font_decoder(font, cache):
+    key = id(font)
+    if key not in cache:
+        if "/ToUnicode" in font:
+            cache[key] = _parse_to_unicode(font["/ToUnicode"].get_object().get_data())
+        elif font.get("/Subtype") == "/Type0":
+            cache[key] = None
+        else:
+            cache[key] = _simple_font_map(font)
+    decoder = cache[key]
+    if decoder is None:
+        raise _Undecodable("composite font without ToUnicode")
+    return decoder
+
+
+def _unescape_literal(value):
+    if b"(" in _literal_escape.sub(b"", value):
+        # Paréntesis anidados sin escapar: la regex no alcanza para cortar el string
+        raise _Undecodable("nested parentheses")
+
+    def replace(match):
+        escape = match.group(1)
+        if escape[:1].isdigit():
+            return bytes([int(escape, 8) % 256])
+        return _LITERAL_ESCAPES.get(escape, escape)
+
+    return _literal_escape.sub(replace, value)
+
+
+def _decode(data, decoder):
+    mapping, width = decoder
+    return "".join(mapping.get(data[i:i + width], "") for i in range(0, len(data), width))
+
+
+def _stream_text(data, resources, cache, parts, visited):
+    if _inline_image.search(data):
+        raise _Undecodable("inline image")
+    fonts = resources.get("/Font", {}) if resources else {}
+    if hasattr(fonts, "get_object"):
+        fonts = fonts.get_object()
+
+    decoder = None
+    for font_name, literal, hex_string in _content_token.findall(data):
+        if font_name:
+            font = fonts.get("/" + font_name.decode("latin-1"))
+            decoder = _font_decoder(font.get_object(), cache) if font is not None else None
+        elif decoder is not None:
+            raw = _unescape_literal(literal) if literal or not hex_string else _hex_bytes(hex_string)
+            parts.append(_decode(raw, decoder))
+
+    # Texto dentro de formularios (XObject /Form); cada uno se recorre una vez
+    xobjects = resources.get("/XObject", {}) if resources else {}
+    if hasattr(xobjects, "get_object"):
+        xobjects = xobjects.get_object()
+    for ref in xobjects.values():
+        xobject = ref.get_object()
+        if xobject.get("/Subtype") != "/Form" or id(xobject) in visited:
+            continue
+        visited.add(id(xobject))
+        form_resources = xobject.get("/Resources")
+        if hasattr(form_resources, "get_object"):
+            form_resources = form_resources.get_object()
+        _stream_text(xobject.get_data(), form_resources or resources, cache, parts, visited)
+
+
+def raw_page_text(page, cache=None):
+    """
+    Text of a page in content stream order, without layout, or None if it
+    cannot be decoded reliably.
+    """
+    cache = {} if cache is None else cache
+    contents = page.get("/Contents")
+    if contents is None:
+        return ""
+    contents = contents.get_object()
+    streams = contents if isinstance(contents, ArrayObject) else [contents]
+    data = b"\n".join(stream.get_object().get_data() for stream in streams)
+
+    resources = page.get("/Resources")
+    if hasattr(resources, "get_object"):
+        resources = resources.get_object()
+    parts = []
+    try:
+        _stream_text(data, resources, cache, parts, set())
+    except _Undecodable:
+        return None
+    return "".join(parts)
+
+
+def candidate_pages(source, tokens):
+    """
+    Returns (page_numbers, stats): the 1-based pages whose raw text contains
+    any of `tokens` (or cannot be decoded), and the page count, number of
+    skipped pages and seconds spent.
+    """
+    start = time.perf_counter()
+    reader = PdfReader(source)
+    cache = {}
+    pages = []
+    for page_number, page in enumerate(reader.pages, start=1):
+        try:
+            text = raw_page_text(page, cache)
+        except Exception:
+            text = None
+        if text is None or any(token in text for token in tokens):
+            pages.append(page_number)
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    page_count = len(reader.pages)
+    return pages, {
+        "pages": page_count,
+        "pages_skipped": page_count - len(pages),
+        "prefilter_seconds": round(time.perf_counter() - start, 6),
+    }
@@ -0,0 +1,256 @@
+"""
+Persistent, searchable index of the pathology items of every processed
+report, so questions across reports ("every HUMEDAD item in Buenos Aires
+this year", "the history of a property_ficha") are SQL queries instead of
+re-extractions of archived PDFs.
+
+One row per report (keyed by the SHA-256 of the uploaded PDF) with its
+form_data and front page info, one row per item, and an FTS5 table over
+item descriptions, types and rooms. Backed by SQLite so every gunicorn
+worker, job process and batch run writes to the same file.
+
+`report_date` ("YYYY-MM-DD") is the inspection date written on page 1 of
+the report. When page 1 has no date it is the date the report was first
+indexed; processing the same PDF again never moves it.
+"""
+import json
+import os
+import sqlite3
+import time
+
+PATHOLOGY_INDEX_ENABLED = os.getenv("PATHOLOGY_INDEX_ENABLED", "1") == "1"
+PATHOLOGY_INDEX_PATH = os.getenv("PATHOLOGY_INDEX_PATH", os.path.join("index", "pathologies.sqlite3"))
+
+SEARCH_MAX_LIMIT = 1000
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS reports ("
+    " id INTEGER PRIMARY KEY,"
+    " file_sha256 TEXT NOT NULL UNIQUE,"
+    " file_name TEXT,"
+    " report_date TEXT NOT NULL,"
+    " address TEXT NOT NULL COLLATE NOCASE,"
+    " inspector TEXT NOT NULL,"
+    " client_name TEXT NOT NULL,"
+    " locality TEXT NOT NULL COLLATE NOCASE,"
+    " province TEXT NOT NULL COLLATE NOCASE,"
+    " property_ficha TEXT NOT NULL,"
+    " form_data TEXT NOT NULL,"
+    " front_page_info TEXT NOT NULL,"
+    " indexed_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS reports_date ON reports (report_date)",
+    "CREATE INDEX IF NOT EXISTS reports_locality ON reports (locality)",
+    "CREATE INDEX IF NOT EXISTS reports_province ON reports (province)",
+    "CREATE INDEX IF NOT EXISTS reports_ficha ON reports (property_ficha)",
+    "CREATE TABLE IF NOT EXISTS items ("
+    " id INTEGER PRIMARY KEY,"
+    " report_id INTEGER NOT NULL REFERENCES reports (id) ON DELETE CASCADE,"
+    " code TEXT NOT NULL,"
+    " type TEXT NOT NULL COLLATE NOCASE,"
+    " severity TEXT NOT NULL,"
+    " description TEXT NOT NULL,"
+    " room TEXT NOT NULL COLLATE NOCASE,"
+    " pages TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS items_report ON items (report_id)",
+    "CREATE INDEX IF NOT EXISTS items_type ON items (type, severity)",
+    "CREATE INDEX IF NOT EXISTS items_room ON items (room)",
+    # Tabla FTS de contenido externo: se mantiene a mano junto con items
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+    " description, type, room, content='items', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+]
+
+_REPORT_COLUMNS = ("file_name", "report_date", "address", "inspector", "client_name", "locality", "province",
+                   "property_ficha")
+
+
+def _fts_query(text):
+    """
+    Free text as an FTS5 query: every word must appear (prefix match), and
+    the user's quotes or operators are never parsed as FTS syntax.
+    """
+    terms = ['"' + word.replace('"', '""') + '"*' for word in text.split()]
+    return " ".join(terms)
+
+
+class PathologyIndex:
+    """
+    SQLite store of reports and their pathology items, with full-text
+    search over the items.
+    """
+
+    def __init__(self, path=PATHOLOGY_INDEX_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def add_report(self, file_sha256, front_page_info, pathology_items, form_data=None, file_name=None):
+        """
+        Indexes (or re-indexes) one report. Processing the same PDF again
+        replaces its items; its form_data is kept unless new form data is
+        given (an /extract call has none), and so is its report_date unless
+        the inspection date is now found.
+        """
+        form_data = form_data or {}
+        # Fecha de inspección de la portada; si no hay, la de la primera indexación
+        report_date = front_page_info.get("inspection_date") or ""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, form_data, file_name, report_date FROM reports WHERE file_sha256 = ?", (file_sha256,)
+            ).fetchone()
+            if row is not None:
+                report_id, old_form_data, old_file_name, old_report_date = row
+                form_data = form_data or json.loads(old_form_data)
+                file_name = file_name or old_file_name
+                report_date = report_date or old_report_date
+                self._delete_items(conn, report_id)
+                conn.execute("DELETE FROM reports WHERE id = ?", (report_id,))
+
+            cursor = conn.execute(
+                "INSERT INTO reports (file_sha256, file_name, report_date, address, inspector, client_name,"
+                " locality, province, property_ficha, form_data, front_page_info, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    file_sha256,
+                    file_name,
+                    report_date or front_page_info.get("date") or time.strftime("%Y-%m-%d"),
+                    form_data.get("property_address") or front_page_info.get("address", ""),
+                    form_data.get("inspector") or front_page_info.get("inspector", ""),
+                    form_data.get("client_name", ""),
+                    form_data.get("property_locality", ""),
+                    form_data.get("property_province", ""),
+                    form_data.get("property_ficha", ""),
+                    json.dumps(form_data, ensure_ascii=False),
+                    json.dumps(front_page_info, ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+            report_id = cursor.lastrowid
+            for item in pathology_items:
+                values = (item["type"], item.get("severity", "ROJO"), item["description"], item["room"])
+                item_id = conn.execute(
+                    "INSERT INTO items (report_id, code, type, severity, description, room, pages)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (report_id, item["code"], *values, item["page"]),
+                ).lastrowid
+                conn.execute(
+                    "INSERT INTO items_fts (rowid, description, type, room) VALUES (?, ?, ?, ?)",
+                    (item_id, item["description"], item["type"], item["room"]),
+                )
+            # Estadísticas para el planificador cada vez que el índice duplica su tamaño:
+            # sin ellas los filtros por tipo o localidad ordenan todas las filas
+            if report_id & (report_id - 1) == 0:
+                conn.execute("ANALYZE")
+        return report_id
+
+    def _delete_items(self, conn, report_id):
+        rows = conn.execute(
+            "SELECT id, description, type, room FROM items WHERE report_id = ?", (report_id,)
+        ).fetchall()
+        conn.executemany(
+            "INSERT INTO items_fts (items_fts, rowid, description, type, room) VALUES ('delete', ?, ?, ?, ?)", rows
+        )
+        conn.execute("DELETE FROM items WHERE report_id = ?", (report_id,))
+
+    def search(self, text=None, type=None, severity=None, room=None, locality=None, property_ficha=None,
+               date_from=None, date_to=None, limit=100, offset=0):
+        """
+        Items matching every given filter, newest report first, each with
+        the fields of its report:
+
+        - `text`: words in the description, type or room (accents ignored)
+        - `type`, `severity`, `property_ficha`: exact (type case-insensitive)
+        - `room`: prefix, e.g. "Baño" matches "Baño/6º piso"
+        - `locality`: property locality or province, or part of the address
+        - `date_from` / `date_to`: "YYYY-MM-DD", inclusive
+        """
+        conditions, params = [], []
+        if text:
+            conditions.append("i.id IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?)")
+            params.append(_fts_query(text))
+        if type:
+            conditions.append("i.type = ?")
+            params.append(type)
+        if severity:
+            conditions.append("i.severity = ?")
+            params.append(severity.upper())
+        if room:
+            conditions.append("i.room LIKE ? ESCAPE '\\'")
+            params.append(room.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if locality:
+            conditions.append("(r.locality = ? OR r.province = ? OR r.address LIKE ?)")
+            params += [locality, locality, f"%{locality}%"]
+        if property_ficha:
+            conditions.append("r.property_ficha = ?")
+            params.append(property_ficha)
+        if date_from:
+            conditions.append("r.report_date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("r.report_date <= ?")
+            params.append(date_to)
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+        query = (
+            "SELECT i.code, i.type, i.severity, i.description, i.room, i.pages AS page,"
+            " r.id AS report_id, r.file_sha256, " + ", ".join(f"r.{column}" for column in _REPORT_COLUMNS) +
+            " FROM items i JOIN reports r ON r.id = i.report_id" + where +
+            " ORDER BY r.report_date DESC, r.id DESC, CAST(i.code AS INTEGER) LIMIT ? OFFSET ?"
+        )
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(query, (*params, limit, max(0, int(offset)))).fetchall()
+        return [dict(row) for row in rows]
+
+    def property_history(self, property_ficha):
+        """
+        Every indexed report of a property, oldest first, with its form
+        data, front page info and items.
+        """
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            reports = conn.execute(
+                "SELECT * FROM reports WHERE property_ficha = ? ORDER BY report_date, id", (property_ficha,)
+            ).fetchall()
+            history = []
+            for report in reports:
+                entry = dict(report)
+                entry["form_data"] = json.loads(entry["form_data"])
+                entry["front_page_info"] = json.loads(entry["front_page_info"])
+                entry["items"] = [dict(row) for row in conn.execute(
+                    "SELECT code, type, severity, description, room, pages AS page FROM items"
+                    " WHERE report_id = ? ORDER BY CAST(code AS INTEGER)", (report["id"],)
+                )]
+                history.append(entry)
+        return history
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM items")
+            conn.execute("DELETE FROM reports")
+            conn.execute("INSERT INTO items_fts (items_fts) VALUES ('delete-all')")
+
+
+_default_index = None
+
+
+def get_pathology_index():
+    """
+    Returns the process-wide index, or None when PATHOLOGY_INDEX_ENABLED=0.
+    """
+    global _default_index
+    if not PATHOLOGY_INDEX_ENABLED:
+        return None
+    if _default_index is None:
+        _default_index = PathologyIndex()
+    return _default_index
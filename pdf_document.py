@@ -0,0 +1,204 @@
+import gc
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+from pdfminer.psparser import PSException
+from pdfplumber.utils.exceptions import PdfminerException
+from PyPDF2.errors import PyPdfError
+
+from tracing import add_value
+
+logger = logging.getLogger(__name__)
+
+# Procesos usados para extraer el texto de las páginas (1 = extracción serial)
+EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+# pdfminer no guarda los objetos ya leídos: los streams de las fotos se liberan con su página
+EXTRACT_LOW_MEMORY = os.getenv("PDF_EXTRACT_LOW_MEMORY", "1") == "1"
+# Techo de memoria residente del proceso durante la extracción, en MB (0 = sin techo)
+EXTRACT_MAX_RSS_MB = float(os.getenv("PDF_EXTRACT_MAX_RSS_MB", "0"))
+
+
+class ExtractionMemoryError(MemoryError):
+    pass
+
+
+# Errores de pdfplumber/pdfminer y de PyPDF2 (page_prefilter) ante un archivo que no es un PDF legible
+UNREADABLE_PDF_ERRORS = (PdfminerException, PSException, PyPdfError)
+
+
+class PDFDocument:
+    """
+    Parsed upload shared by every stage of the pipeline.
+
+    Holds the text of each page so that pdfplumber's layout analysis
+    (page.extract_text()) runs only once per request.
+    """
+
+    def __init__(self, path, page_texts, partial=False):
+        self.path = path
+        # page_texts[i] es el texto de la página i + 1 (None si no tiene texto)
+        self.page_texts = page_texts
+        # True si sólo se extrajeron algunas páginas (ver load_pdf_document(pages=...))
+        self.partial = partial
+
+    @property
+    def page_count(self):
+        return len(self.page_texts)
+
+    def page_text(self, page_number):
+        """
+        Returns the text of a page (1-based), or None if the page has no text.
+        """
+        if 1 <= page_number <= len(self.page_texts):
+            return self.page_texts[page_number - 1]
+        return None
+
+    def iter_pages(self):
+        """
+        Yields (page_number, text) for every page that contains text.
+        """
+        for i, text in enumerate(self.page_texts):
+            if text:
+                yield i + 1, text
+
+
+def current_rss_mb():
+    """
+    Resident memory of this process in MB, or None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+def _over_rss_ceiling(max_rss_mb):
+    if not max_rss_mb:
+        return False
+    rss = current_rss_mb()
+    return rss is not None and rss > max_rss_mb
+
+
+def _open_pdf(source, pages=None):
+    pdf = pdfplumber.open(source, pages=pages)
+    if EXTRACT_LOW_MEMORY:
+        pdf.doc.caching = False
+    return pdf
+
+
+def _iter_extracted_texts(source, page_numbers=None, max_rss_mb=None):
+    """
+    Yields (page_number, text) for every page, or only `page_numbers`. Each
+    page is released (layout, characters and, with PDF_EXTRACT_LOW_MEMORY,
+    the objects and photos pdfminer read for it) as soon as its text is
+    taken, so memory does not grow with the page count.
+
+    Above `max_rss_mb` (PDF_EXTRACT_MAX_RSS_MB) the PDF is closed and opened
+    again at the next page, which drops everything pdfminer still holds. If
+    the process is still above the ceiling after that, ExtractionMemoryError
+    is raised instead of letting the worker grow until it is killed.
+    """
+    max_rss_mb = EXTRACT_MAX_RSS_MB if max_rss_mb is None else max_rss_mb
+    remaining = sorted(page_numbers) if page_numbers is not None else None
+    while remaining is None or remaining:
+        with _open_pdf(source, remaining) as pdf:
+            pages = pdf.pages
+            remaining = []
+            for i, page in enumerate(pages):
+                text = page.extract_text()
+                page.close()
+                yield page.page_number, text
+                if i + 1 < len(pages) and _over_rss_ceiling(max_rss_mb):
+                    remaining = [later.page_number for later in pages[i + 1:]]
+                    break
+        if not remaining:
+            return
+        gc.collect()
+        if _over_rss_ceiling(max_rss_mb):
+            raise ExtractionMemoryError(
+                f"RSS {current_rss_mb():.0f} MB above PDF_EXTRACT_MAX_RSS_MB={max_rss_mb:.0f} "
+                f"with {len(remaining)} pages left"
+            )
+        logger.warning("RSS above %.0f MB: reopening the PDF at page %d", max_rss_mb, remaining[0])
+        add_value("pdf_reopens", 1)
+
+
+def iter_page_texts(source):
+    """
+    Yields (page_number, text) page by page without keeping earlier pages,
+    for streaming consumers such as extractor_pathologies.iter_pathologies.
+    """
+    return _iter_extracted_texts(source)
+
+
+def _extract_pages(path, page_numbers):
+    """
+    Worker entry point: opens the PDF by path and extracts the given pages.
+    Returns a list of (page_number, text) tuples.
+    """
+    return list(_iter_extracted_texts(path, page_numbers))
+
+
+def _page_count(source):
+    with pdfplumber.open(source) as pdf:
+        return len(pdf.pages)
+
+
+def _page_shards(page_numbers, shards):
+    size = max(1, -(-len(page_numbers) // shards))
+    return [page_numbers[start:start + size] for start in range(0, len(page_numbers), size)]
+
+
+def extract_page_texts_parallel(path, workers, executor=None, pages=None):
+    """
+    Extracts the text of every page (or only `pages`, 1-based) sharding the
+    pages across a process pool. Results are merged back in page order;
+    pages not extracted are None.
+    """
+    page_count = _page_count(path)
+    page_numbers = sorted(pages) if pages is not None else list(range(1, page_count + 1))
+
+    # Más rangos que procesos para repartir mejor las páginas pesadas (fotos)
+    shards = _page_shards(page_numbers, workers * 2)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(_extract_pages, path, shard) for shard in shards]
+        page_texts = [None] * page_count
+        for future in futures:
+            for page_number, text in future.result():
+                page_texts[page_number - 1] = text
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    return page_texts
+
+
+def load_pdf_document(source, workers=None, executor=None, pages=None):
+    """
+    Opens the PDF once and extracts the text of every page.
+    `source` can be a path or a binary file object. With `workers` > 1 (or an
+    `executor`) and a path source, pages are extracted in parallel processes.
+    With `pages` (1-based page numbers) only those pages are extracted and the
+    document is marked partial; see page_prefilter.candidate_pages().
+    Only the page texts are kept: see _iter_extracted_texts() for the memory
+    ceiling.
+    """
+    path = source if isinstance(source, str) else None
+    if workers is None:
+        workers = EXTRACT_WORKERS
+
+    if path and (workers > 1 or executor is not None):
+        page_texts = extract_page_texts_parallel(path, workers, executor=executor, pages=pages)
+    else:
+        texts = dict(_iter_extracted_texts(source, pages))
+        page_count = _page_count(source) if pages is not None else len(texts)
+        page_texts = [texts.get(page_number) for page_number in range(1, page_count + 1)]
+
+    return PDFDocument(path, page_texts, partial=pages is not None)
@@ -0,0 +1,236 @@
+import hashlib
+import io
+import math
+import os
+
+from PIL import Image, ImageChops, ImageStat
+from PyPDF2.generic import (
+    ArrayObject, ContentStream, DictionaryObject, IndirectObject, NameObject, NullObject, NumberObject, StreamObject,
+)
+
+# Perfiles de optimización del informe final: resolución máxima de las fotos
+# (en puntos por pulgada según el tamaño con que se muestran) y calidad JPEG
+PROFILES = {
+    "email": {"dpi": 96, "jpeg_quality": 60},
+    "web": {"dpi": 150, "jpeg_quality": 75},
+}
+
+# Perfil aplicado por compose_final_report cuando no se indica otro ("" = sin optimizar)
+REPORT_OPTIMIZE_PROFILE = os.getenv("REPORT_OPTIMIZE_PROFILE", "")
+
+# Sólo se recomprimen imágenes que bajen al menos este factor de tamaño
+MIN_SAVING = 0.9
+
+# Objetos que pueden compartirse entre páginas sin cambiar el documento
+_DEDUP_TYPES = {"/Font", "/FontDescriptor", "/ExtGState", "/Encoding"}
+
+_PIL_MODES = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}
+
+# La optimización reemplaza objetos en writer._objects y datos en StreamObject._data:
+# estructura interna de PyPDF2 3.0, fijada en requirements.txt (PyPDF2==3.0.1)
+
+
+def _multiply(m1, m2):
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+        c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+        e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2,
+    )
+
+
+def _collect_display_sizes(writer, contents, resources, ctm, sizes, depth=0):
+    """
+    Walks a content stream tracking the CTM and records, for each image
+    XObject, the largest size (in points) at which it is drawn.
+    """
+    if contents is None or depth > 8:
+        return
+    xobjects = resources.get("/XObject", {}) if resources else {}
+    if hasattr(xobjects, "get_object"):
+        xobjects = xobjects.get_object()
+    stack = []
+    for operands, operator in ContentStream(contents, writer).operations:
+        if operator == b"q":
+            stack.append(ctm)
+        elif operator == b"Q":
+            ctm = stack.pop() if stack else ctm
+        elif operator == b"cm":
+            ctm = _multiply(tuple(float(x) for x in operands), ctm)
+        elif operator == b"Do":
+            ref = xobjects.get(operands[0])
+            if not isinstance(ref, IndirectObject):
+                continue
+            xobject = ref.get_object()
+            subtype = xobject.get("/Subtype")
+            if subtype == "/Image":
+                a, b, c, d = ctm[:4]
+                size = (math.hypot(a, b), math.hypot(c, d))
+                previous = sizes.get(ref.idnum, (0, 0))
+                sizes[ref.idnum] = (max(previous[0], size[0]), max(previous[1], size[1]))
+            elif subtype == "/Form":
+                matrix = tuple(float(x) for x in xobject.get("/Matrix", (1, 0, 0, 1, 0, 0)))
+                form_resources = xobject.get("/Resources")
+                if hasattr(form_resources, "get_object"):
+                    form_resources = form_resources.get_object()
+                _collect_display_sizes(writer, xobject, form_resources or resources,
+                                       _multiply(matrix, ctm), sizes, depth + 1)
+
+
+def _image_display_sizes(writer):
+    sizes = {}
+    for page in writer.pages:
+        resources = page.get("/Resources")
+        if hasattr(resources, "get_object"):
+            resources = resources.get_object()
+        _collect_display_sizes(writer, page.get_contents(), resources, (1, 0, 0, 1, 0, 0), sizes)
+    return sizes
+
+
+def _decode_image(image):
+    """
+    Returns a PIL image for 8-bit RGB/Gray photos (raw or JPEG), None otherwise.
+    """
+    if image.get("/ImageMask") or "/Decode" in image or image.get("/BitsPerComponent") != 8:
+        return None
+    mode = _PIL_MODES.get(image.get("/ColorSpace"))
+    if mode is None:
+        return None
+    filters = image.get("/Filter", [])
+    if not isinstance(filters, ArrayObject):
+        filters = [filters]
+    data = image.get_data()
+    if filters and filters[-1] == "/DCTDecode":
+        decoded = Image.open(io.BytesIO(data))
+        decoded.load()
+        return decoded.convert(mode) if decoded.mode != mode else decoded
+    if all(f == "/FlateDecode" for f in filters) and not image.get("/DecodeParms"):
+        width, height = int(image["/Width"]), int(image["/Height"])
+        if len(data) == width * height * len(mode):
+            return Image.frombytes(mode, (width, height), data)
+    return None
+
+
+def _psnr(original, recompressed):
+    reference = original.resize(recompressed.size, Image.LANCZOS) if original.size != recompressed.size else original
+    rms = ImageStat.Stat(ImageChops.difference(reference, recompressed)).rms
+    mse = sum(value * value for value in rms) / len(rms)
+    return 99.0 if mse == 0 else 10 * math.log10(255 * 255 / mse)
+
+
+def _downsample_images(writer, dpi, jpeg_quality, stats, measure_quality):
+    for idnum, (width_pt, height_pt) in _image_display_sizes(writer).items():
+        image = writer._objects[idnum - 1]
+        if not isinstance(image, StreamObject):
+            continue
+        try:
+            decoded = _decode_image(image)
+        except Exception:
+            decoded = None
+        if decoded is None:
+            continue
+
+        scale = min(1.0, max(width_pt * dpi / 72 / decoded.width, height_pt * dpi / 72 / decoded.height))
+        size = (max(1, round(decoded.width * scale)), max(1, round(decoded.height * scale)))
+        resized = decoded.resize(size, Image.LANCZOS) if size != decoded.size else decoded
+        buffer = io.BytesIO()
+        resized.save(buffer, format="JPEG", quality=jpeg_quality, optimize=True)
+        data = buffer.getvalue()
+        if len(data) >= len(image._data) * MIN_SAVING:
+            continue
+
+        stats["image_bytes_before"] += len(image._data)
+        stats["image_bytes_after"] += len(data)
+        stats["images_recompressed"] += 1
+        if measure_quality:
+            stats["psnr"].append(_psnr(decoded, Image.open(io.BytesIO(data)).convert(decoded.mode)))
+
+        image._data = data
+        image[NameObject("/Filter")] = NameObject("/DCTDecode")
+        image[NameObject("/Width")] = NumberObject(size[0])
+        image[NameObject("/Height")] = NumberObject(size[1])
+        if "/DecodeParms" in image:
+            del image["/DecodeParms"]
+        # Evitar que PyPDF2 escriba datos decodificados cacheados
+        if hasattr(image, "decoded_self"):
+            image.decoded_self = None
+
+
+def _dedup_key(obj):
+    if isinstance(obj, StreamObject):
+        pass
+    elif isinstance(obj, DictionaryObject) and obj.get("/Type") in _DEDUP_TYPES:
+        pass
+    else:
+        return None
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer, None)
+    return hashlib.sha256(buffer.getvalue()).digest()
+
+
+def _remap_references(obj, remap):
+    if isinstance(obj, DictionaryObject):
+        items = obj.items()
+    elif isinstance(obj, ArrayObject):
+        items = enumerate(obj)
+    else:
+        return
+    for key, value in list(items):
+        if isinstance(value, IndirectObject):
+            if value.idnum in remap:
+                obj[key] = IndirectObject(remap[value.idnum], 0, value.pdf)
+        else:
+            _remap_references(value, remap)
+
+
+def _dedup_objects(writer, stats, max_passes=4):
+    """
+    Points every reference to identical streams (images, font programs,
+    content) and identical font/graphics-state dictionaries at one copy.
+    Repeated until stable, since merging font files makes their font
+    descriptors identical too.
+    """
+    for _ in range(max_passes):
+        canonical = {}
+        remap = {}
+        for index, obj in enumerate(writer._objects):
+            key = _dedup_key(obj)
+            if key is None:
+                continue
+            if key in canonical:
+                remap[index + 1] = canonical[key]
+            else:
+                canonical[key] = index + 1
+        if not remap:
+            return
+        for obj in writer._objects:
+            _remap_references(obj, remap)
+        for idnum in remap:
+            duplicate = writer._objects[idnum - 1]
+            if isinstance(duplicate, StreamObject):
+                stats["dedup_bytes"] += len(duplicate._data)
+            writer._objects[idnum - 1] = NullObject()
+        stats["objects_deduplicated"] += len(remap)
+
+
+def optimize_pdf_writer(writer, profile, measure_quality=False):
+    """
+    Size optimisation of a composed report before it is written: photos are
+    downsampled to the profile DPI (based on the size at which they are
+    drawn) and recompressed as JPEG, then identical streams and fonts are
+    deduplicated across the merged pages. Returns statistics.
+    """
+    settings = PROFILES[profile]
+    stats = {
+        "profile": profile,
+        "images_recompressed": 0,
+        "image_bytes_before": 0,
+        "image_bytes_after": 0,
+        "objects_deduplicated": 0,
+        "dedup_bytes": 0,
+        "psnr": [],
+    }
+    _downsample_images(writer, settings["dpi"], settings["jpeg_quality"], stats, measure_quality)
+    _dedup_objects(writer, stats)
+    return stats
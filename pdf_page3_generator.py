@@ -1,55 +1,23 @@
 import io
-from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph, Spacer, Table, TableStyle, KeepTogether
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph, Spacer, Table, KeepTogether
 from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.colors import HexColor
-from reportlab.lib.units import mm, inch
-from reportlab.lib.utils import ImageReader
-from datetime import datetime
+from reportlab.lib.units import inch
+
+from assets import assets
+from report_styles import PAGE3_TITLE, CARD_TITLE, CARD_TABLE
 
 def generate_page3_pdf(form_data):
     buffer = io.BytesIO()
     doc = BaseDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
     elements = []
 
-    # Custom styles for cards and footer
-    card_paragraph_style = ParagraphStyle(
-        'CardParagraph',
-        parent=styles['Normal'],
-        fontName='Helvetica',
-        fontSize=11,
-        leading=14,
-        textColor=colors.HexColor("#233D4C"),
-        spaceAfter=4,
-    )
-    card_title_style = ParagraphStyle(
-        'CardTitle',
-        parent=styles['Heading2'],
-        fontName='Helvetica-Bold',
-        fontSize=13,
-        textColor=colors.HexColor("#233D4C"),
-        spaceAfter=8,
-    )
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontName='Helvetica',
-        fontSize=10,
-        alignment=2,  # right
-        textColor=colors.HexColor("#233D4C"),
-    )
-
-    # Título
-    title_style = styles['Heading1']
-    title_style.textColor = HexColor("#233D4C")
-    title = Paragraph("Datos del Informe", title_style)
+    # Título (estilos compartidos y de solo lectura: ver report_styles)
+    title = Paragraph("Datos del Informe", PAGE3_TITLE)
     elements.append(title)
     elements.append(Spacer(1, 5))
 
     # Card-like Inspector Section
-    elements.append(Paragraph("Información del Inspector", card_title_style))
+    elements.append(Paragraph("Información del Inspector", CARD_TITLE))
     elements.append(Spacer(1, 6))
     inspector_data = [
         ["Nombre:", form_data.get("inspector", "")],
@@ -57,22 +25,12 @@ def generate_page3_pdf(form_data):
         ["Email:", form_data.get("inspector_email", "")]
     ]
     inspector_table = Table(inspector_data, colWidths=[100, 400])
-    inspector_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.whitesmoke),
-        ('BOX', (0, 0), (-1, -1), 1, colors.HexColor("#cccccc")),
-        ('ROUNDED', (0, 0), (-1, -1), 8),
-        ('INNERPADDING', (0, 0), (-1, -1), 8),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor("#233D4C")),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('SHADOW', (0, 0), (-1, -1), 2, 2, colors.HexColor("#e0e0e0")),
-    ]))
+    inspector_table.setStyle(CARD_TABLE)
     elements.append(KeepTogether([inspector_table]))
     elements.append(Spacer(1, 16))
 
     # Card-like Client Section
-    elements.append(Paragraph("Datos del Cliente", card_title_style))
+    elements.append(Paragraph("Datos del Cliente", CARD_TITLE))
     elements.append(Spacer(1, 6))
     client_data = [
         ["Nombre:", form_data.get("client_name", "")],
@@ -85,22 +43,12 @@ def generate_page3_pdf(form_data):
         ["CUIT:", form_data.get("client_cuit", "")]
     ]
     client_table = Table(client_data, colWidths=[100, 400])
-    client_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.whitesmoke),
-        ('BOX', (0, 0), (-1, -1), 1, colors.HexColor("#cccccc")),
-        ('ROUNDED', (0, 0), (-1, -1), 8),
-        ('INNERPADDING', (0, 0), (-1, -1), 8),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor("#233D4C")),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('SHADOW', (0, 0), (-1, -1), 2, 2, colors.HexColor("#e0e0e0")),
-    ]))
+    client_table.setStyle(CARD_TABLE)
     elements.append(KeepTogether([client_table]))
     elements.append(Spacer(1, 16))
 
     # Card-like Property Section
-    elements.append(Paragraph("Datos del Inmueble", card_title_style))
+    elements.append(Paragraph("Datos del Inmueble", CARD_TITLE))
     elements.append(Spacer(1, 6))
     property_data = [
         ["Dirección:", form_data.get("property_address", "")],
@@ -111,17 +59,7 @@ def generate_page3_pdf(form_data):
         ["Ficha:", form_data.get("property_ficha", "")]
     ]
     property_table = Table(property_data, colWidths=[100, 400])
-    property_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.whitesmoke),
-        ('BOX', (0, 0), (-1, -1), 1, colors.HexColor("#cccccc")),
-        ('ROUNDED', (0, 0), (-1, -1), 8),
-        ('INNERPADDING', (0, 0), (-1, -1), 8),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor("#233D4C")),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('SHADOW', (0, 0), (-1, -1), 2, 2, colors.HexColor("#e0e0e0")),
-    ]))
+    property_table.setStyle(CARD_TABLE)
     elements.append(KeepTogether([property_table]))
     elements.append(Spacer(1, 18))
 
@@ -136,7 +74,7 @@ def generate_page3_pdf(form_data):
     def on_page(canvas, doc):
         width, height = letter
         # Draw header image (logoheader.png) with specified width (138px) and proportional height
-        header_img = ImageReader("images/Logoheader.png")
+        header_img = assets.image("logo_header")
         header_width = 138
         orig_width, orig_height = 708, 90  # Actual image size
         header_height = int(orig_height * (header_width / orig_width))  # ≈ 17.54 px, rounded to 18
@@ -1,52 +1,347 @@
-import openai
+import logging
 import os
-from openai_config import OPENAI_API_KEY
+import time
+from concurrent.futures import ThreadPoolExecutor
+from openai_client import create_chat_completion, DeadlineExceeded
+from tracing import add_value, submit_in_context, stage
+from summary_digest import build_digest
 import io
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
+from report_styles import TITLE, NORMAL
 from datetime import datetime
 
-openai.api_key = OPENAI_API_KEY
-
-def get_pdf_summary(file_path):
-    """
-    Reads the PDF file content and sends a prompt to OpenAI ChatCompletion API to get the summary text.
-    """
-    # For simplicity, extract text from the PDF file (could be improved)
-    from pdfplumber import open as pdfplumber_open
-    with pdfplumber_open(file_path) as pdf:
-        full_text = ""
-        for page in pdf.pages:
-            full_text += page.extract_text() + "\n"
-
-    system_prompt = (
-        "Eres un inspector profesional de propiedades trabajando para una empresa de inspección. "
-        "Tu tarea es procesar documentos de inspección de propiedades (informes técnicos) y generar resúmenes formales, claros, detallados y estructurados. "
-        "Tu estilo debe ser siempre: Formal, técnico y neutro. Claro y profesional, como un informe que podría ser entregado a un cliente. "
-        "No alarmista, pero sí indicando prioridades de reparación si corresponde. "
-        "Objetivo de cada respuesta: Generar un Resumen de Inspección organizado en secciones: Condiciones Generales, Estado Eléctrico, Estado de Plomería, Estado del Sistema de Gas, Humedad, Aislaciones, Aberturas, Estructura (terminaciones), Recomendaciones Finales. "
-        "Cuando se detecten patologías críticas (color rojo) o fallas relevantes, indicarlo en cada sección de forma respetuosa, proponiendo acciones de mantenimiento o reparación, pero sin ser alarmista. "
-        "Dar conclusiones finales indicando qué sistemas son prioritarios para intervenir. "
-        "Utiliza siempre viñetas o guiones para listar observaciones dentro de cada sección. "
-        "Utiliza recomendaciones específicas al final de cada grupo de observaciones. "
-        "Cada informe debe estar referido exclusivamente al estado al día de la inspección. "
-        "Si se requiere hacer un anexo (sobre humedades, filtraciones, terrazas verdes, piletas, etc.) debe escribirse como anexo formal adicional, especificando que se refiere al día de inspección. "
-        "IMPORTANTE: No inventes datos técnicos si no están en el texto proporcionado. No exageres conclusiones si el informe base no las marca como críticas. "
-        "Todo tu análisis debe ser coherente, profesional, y orientado a la preservación y mejora de la propiedad inspeccionada."
+logger = logging.getLogger(__name__)
+
+# "openai" llama a la API real; "local" genera un resumen sin red (pruebas offline)
+SUMMARY_BACKEND = os.getenv("SUMMARY_BACKEND", "openai")
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o")
+
+# "single" envía todo el texto en un mensaje; "chunked" hace map-reduce por partes;
+# "auto" usa chunked sólo si el texto supera SUMMARY_SINGLE_MAX_TOKENS
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "auto")
+SUMMARY_SINGLE_MAX_TOKENS = int(os.getenv("SUMMARY_SINGLE_MAX_TOKENS", "60000"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "12000"))
+SUMMARY_CHUNK_CONCURRENCY = int(os.getenv("SUMMARY_CHUNK_CONCURRENCY", "4"))
+# Reintentos por parte además del primer intento (0 = uno solo), para los errores que
+# openai_client no reintenta o cuando éste agota los suyos
+SUMMARY_CHUNK_RETRIES = int(os.getenv("SUMMARY_CHUNK_RETRIES", "2"))
+# Tokens máximos de las observaciones que recibe un paso "reduce"; si las partes suman
+# más, se combinan antes por grupos (reduce jerárquico)
+SUMMARY_REDUCE_MAX_TOKENS = int(os.getenv("SUMMARY_REDUCE_MAX_TOKENS", str(SUMMARY_SINGLE_MAX_TOKENS)))
+
+# "digest" envía el extracto estructurado de summary_digest; "raw" el texto completo de cada página.
+# "raw" por defecto: el extracto todavía omite las páginas sin ítems (resumen y conclusión del inspector)
+SUMMARY_INPUT = os.getenv("SUMMARY_INPUT", "raw")
+
+SUMMARY_SECTIONS = [
+    "Condiciones Generales", "Estado Eléctrico", "Estado de Plomería", "Estado del Sistema de Gas",
+    "Humedad", "Aislaciones", "Aberturas", "Estructura (terminaciones)", "Recomendaciones Finales",
+]
+
+SYSTEM_PROMPT = (
+    "Eres un inspector profesional de propiedades trabajando para una empresa de inspección. "
+    "Tu tarea es procesar documentos de inspección de propiedades (informes técnicos) y generar resúmenes formales, claros, detallados y estructurados. "
+    "Tu estilo debe ser siempre: Formal, técnico y neutro. Claro y profesional, como un informe que podría ser entregado a un cliente. "
+    "No alarmista, pero sí indicando prioridades de reparación si corresponde. "
+    "Objetivo de cada respuesta: Generar un Resumen de Inspección organizado en secciones: Condiciones Generales, Estado Eléctrico, Estado de Plomería, Estado del Sistema de Gas, Humedad, Aislaciones, Aberturas, Estructura (terminaciones), Recomendaciones Finales. "
+    "Cuando se detecten patologías críticas (color rojo) o fallas relevantes, indicarlo en cada sección de forma respetuosa, proponiendo acciones de mantenimiento o reparación, pero sin ser alarmista. "
+    "Dar conclusiones finales indicando qué sistemas son prioritarios para intervenir. "
+    "Utiliza siempre viñetas o guiones para listar observaciones dentro de cada sección. "
+    "Utiliza recomendaciones específicas al final de cada grupo de observaciones. "
+    "Cada informe debe estar referido exclusivamente al estado al día de la inspección. "
+    "Si se requiere hacer un anexo (sobre humedades, filtraciones, terrazas verdes, piletas, etc.) debe escribirse como anexo formal adicional, especificando que se refiere al día de inspección. "
+    "IMPORTANTE: No inventes datos técnicos si no están en el texto proporcionado. No exageres conclusiones si el informe base no las marca como críticas. "
+    "Todo tu análisis debe ser coherente, profesional, y orientado a la preservación y mejora de la propiedad inspeccionada."
+)
+
+# Paso "map": cada parte del informe se reduce a observaciones, sin redactar el resumen final
+CHUNK_SYSTEM_PROMPT = (
+    "Eres un inspector profesional de propiedades. Recibirás una parte de un informe de inspección. "
+    "Extrae de forma concisa todas las observaciones técnicas, agrupadas por sistema (" + ", ".join(SUMMARY_SECTIONS[:-1]) + "), "
+    "indicando la habitación y si la patología es crítica (color rojo). "
+    "No redactes conclusiones ni inventes datos que no estén en el texto."
+)
+
+# Reduce intermedio: combina las observaciones de varias partes, todavía sin redactar el resumen
+MERGE_SYSTEM_PROMPT = (
+    "Eres un inspector profesional de propiedades. Recibirás las observaciones extraídas de varias partes "
+    "consecutivas de un informe de inspección. Combínalas en una sola lista concisa agrupada por sistema ("
+    + ", ".join(SUMMARY_SECTIONS[:-1]) + "), sin repetir observaciones, conservando la habitación y si la "
+    "patología es crítica (color rojo). No redactes conclusiones ni inventes datos que no estén en el texto."
+)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.encoding_for_model("gpt-4o")
+except Exception:
+    _encoding = None
+
+def estimate_tokens(text):
+    """
+    Token count of `text`: exact with tiktoken if installed, else ~4 chars per token.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+def _local_completion(messages):
+    """
+    Offline stand-in for the chat completion call: builds a deterministic
+    summary from the prompt so the whole flow can run without the OpenAI API.
+    """
+    text = messages[-1]["content"]
+    critical = [line.strip() for line in text.splitlines() if line.rstrip().endswith("ROJO")]
+    if "Patologías ROJO" in text:
+        # Extracto de summary_digest: los ítems de la sección ROJO
+        section = text.split("Patologías ROJO", 1)[1].split("\n\n", 1)[0]
+        critical += [line[2:].split(":", 1)[0] for line in section.splitlines() if line.startswith("- ")]
+    paragraphs = [f"Resumen generado localmente ({len(text.splitlines())} líneas analizadas)."]
+    for section in SUMMARY_SECTIONS:
+        paragraphs.append(f"{section}:")
+    if critical:
+        paragraphs.append("Patologías críticas: " + "; ".join(critical))
+    return "\n\n".join(paragraphs)
+
+def _chat_completion(messages, deadline=None):
+    """
+    Single chat completion call. Returns (text, total_tokens).
+    `deadline`: see openai_client.create_chat_completion().
+    """
+    if SUMMARY_BACKEND == "local":
+        text = _local_completion(messages)
+        tokens = sum(estimate_tokens(m["content"]) for m in messages) + estimate_tokens(text)
+        add_value("summary_tokens", tokens)
+        return text, tokens
+
+    # Cliente compartido: pool de conexiones, timeouts, reintentos y límite de RPM/TPM
+    response = create_chat_completion(
+        messages,
+        estimated_tokens=sum(estimate_tokens(m["content"]) for m in messages),
+        deadline=deadline,
+        model=SUMMARY_MODEL,
     )
+    usage = getattr(response, "usage", None)
+    tokens = getattr(usage, "total_tokens", None)
+    add_value("summary_tokens", tokens or 0)
+    return response.choices[0].message.content.strip(), tokens
+
+def split_into_chunks(page_texts, token_budget):
+    """
+    Groups consecutive pages into chunks of at most `token_budget` tokens.
+    A page larger than the budget is split on line boundaries.
+    Returns a list of (first_page, last_page, text).
+    """
+    chunks = []
+    current, current_tokens, first_page = [], 0, None
+
+    def flush(last_page):
+        nonlocal current, current_tokens, first_page
+        if current:
+            chunks.append((first_page, last_page, "\n".join(current)))
+        current, current_tokens, first_page = [], 0, None
+
+    for page_number, text in enumerate(page_texts, start=1):
+        if not text:
+            continue
+        pieces = [text]
+        if estimate_tokens(text) > token_budget:
+            pieces, piece, piece_tokens = [], [], 0
+            for line in text.splitlines():
+                line_tokens = estimate_tokens(line)
+                if piece and piece_tokens + line_tokens > token_budget:
+                    pieces.append("\n".join(piece))
+                    piece, piece_tokens = [], 0
+                piece.append(line)
+                piece_tokens += line_tokens
+            if piece:
+                pieces.append("\n".join(piece))
+
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > token_budget:
+                flush(prev_page)
+            if first_page is None:
+                first_page = page_number
+            current.append(piece)
+            current_tokens += piece_tokens
+            prev_page = page_number
+
+    if current:
+        flush(prev_page)
+    return chunks
+
+def _complete_with_retries(messages, label, retries, deadline=None):
+    """
+    Chat completion retried `retries` times after the first attempt, never
+    past `deadline`. Returns (text, total_tokens, attempts).
+    """
+    for attempt in range(retries + 1):
+        try:
+            text, tokens = _chat_completion(messages, deadline)
+            return text, tokens, attempt + 1
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            delay = min(2 ** (attempt + 1), 30)
+            if attempt == retries or (deadline is not None and time.monotonic() + delay >= deadline):
+                raise
+            logger.warning("Summary %s failed (attempt %d/%d), retrying", label, attempt + 1, retries + 1)
+            time.sleep(delay)
 
+def _summarize_chunk(index, first_page, last_page, text, retries, deadline=None):
     messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"Resumen de inspección del archivo cargado:\n{full_text}"}
+        {"role": "system", "content": CHUNK_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Parte {index + 1} del informe (páginas {first_page}-{last_page}):\n{text}"}
     ]
+    start = time.perf_counter()
+    partial, tokens, attempts = _complete_with_retries(messages, f"chunk {index + 1}", retries, deadline)
+    metrics = {
+        "chunk": index + 1,
+        "pages": f"{first_page}-{last_page}",
+        "input_tokens": estimate_tokens(text),
+        "total_tokens": tokens,
+        "attempts": attempts,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    return (first_page, last_page, partial), metrics
 
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=messages
+def _format_parts(parts):
+    return "\n\n".join(
+        f"Parte {index} (páginas {first_page}-{last_page}):\n{text}"
+        for index, (first_page, last_page, text) in enumerate(parts, start=1)
     )
 
-    summary = response.choices[0].message.content.strip()
+def _group_parts(parts, token_budget):
+    """
+    Groups consecutive (first_page, last_page, text) parts so the observations
+    of each group fit in `token_budget` tokens.
+    """
+    groups, current, current_tokens = [], [], 0
+    for part in parts:
+        part_tokens = estimate_tokens(_format_parts([part]))
+        if current and current_tokens + part_tokens > token_budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(part)
+        current_tokens += part_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+def _merge_parts(level, index, parts, retries, deadline=None):
+    observations = _format_parts(parts)
+    first_page, last_page = parts[0][0], parts[-1][1]
+    messages = [
+        {"role": "system", "content": MERGE_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Observaciones de las páginas {first_page}-{last_page} del informe:\n{observations}"}
+    ]
+    start = time.perf_counter()
+    merged, tokens, attempts = _complete_with_retries(messages, f"merge {level}.{index + 1}", retries, deadline)
+    metrics = {
+        "chunk": f"merge {level}.{index + 1}",
+        "pages": f"{first_page}-{last_page}",
+        "input_tokens": estimate_tokens(observations),
+        "total_tokens": tokens,
+        "attempts": attempts,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    return (first_page, last_page, merged), metrics
+
+def summarize_chunked(page_texts, token_budget=None, concurrency=None, retries=None, reduce_budget=None,
+                      deadline=None):
+    """
+    Map-reduce summary for long reports: the text is split by page under a
+    token budget, the chunks are summarised concurrently (bounded
+    parallelism, per-chunk retry) and the partial results are reduced into
+    the sections required by SYSTEM_PROMPT. While the partial results exceed
+    `reduce_budget` tokens they are first merged in groups, level by level.
+    No request or retry goes past `deadline` (a time.monotonic() value).
+    Returns (summary, metrics) where metrics has one entry per chunk and merge plus the final reduce step.
+    """
+    token_budget = token_budget or SUMMARY_CHUNK_TOKENS
+    concurrency = concurrency or SUMMARY_CHUNK_CONCURRENCY
+    retries = SUMMARY_CHUNK_RETRIES if retries is None else retries
+    reduce_budget = reduce_budget or SUMMARY_REDUCE_MAX_TOKENS
+
+    chunks = split_into_chunks(page_texts, token_budget)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            submit_in_context(executor, _summarize_chunk, index, first_page, last_page, text, retries, deadline)
+            for index, (first_page, last_page, text) in enumerate(chunks)
+        ]
+        results = [future.result() for future in futures]
+        parts = [part for part, _ in results]
+        metrics = [m for _, m in results]
+
+        level = 0
+        while len(parts) > 1 and estimate_tokens(_format_parts(parts)) > reduce_budget:
+            groups = _group_parts(parts, reduce_budget)
+            if len(groups) == len(parts):
+                # Cada parte ya supera el presupuesto por sí sola: combinar de a dos
+                groups = [parts[i:i + 2] for i in range(0, len(parts), 2)]
+            level += 1
+            futures = [
+                submit_in_context(executor, _merge_parts, level, index, group, retries, deadline)
+                for index, group in enumerate(groups)
+            ]
+            results = [future.result() for future in futures]
+            parts = [part for part, _ in results]
+            metrics += [m for _, m in results]
+
+    partials = _format_parts(parts)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Resumen de inspección a partir de las observaciones de cada parte del archivo cargado:\n{partials}"}
+    ]
+    start = time.perf_counter()
+    summary, tokens, attempts = _complete_with_retries(messages, "reduce", retries, deadline)
+    metrics.append({
+        "chunk": "reduce",
+        "input_tokens": estimate_tokens(partials),
+        "total_tokens": tokens,
+        "attempts": attempts,
+        "seconds": round(time.perf_counter() - start, 3),
+    })
+    logger.info("Chunked summary: %d chunks, %d merge levels, metrics=%s", len(chunks), level, metrics)
+    return summary, metrics
+
+def summary_input(document, input_mode=None):
+    """
+    Returns (intro, pages): the opening of the user message and the texts to
+    summarise, per SUMMARY_INPUT ("digest" or "raw").
+    """
+    input_mode = input_mode or SUMMARY_INPUT
+    if input_mode == "raw":
+        return "Resumen de inspección del archivo cargado:", document.page_texts
+    if input_mode != "digest":
+        raise ValueError(f"Unknown summary input: {input_mode}")
+    intro = ("Resumen de inspección del archivo cargado. El texto es un extracto estructurado del informe: "
+             "patologías agrupadas por severidad (ROJO crítico, AMARILLO menor, VERDE en condiciones) y ambiente, "
+             "sin encabezados ni textos repetidos:")
+    with stage("summary_digest"):
+        return intro, [build_digest(document.page_texts)]
+
+def get_pdf_summary(document, mode=None, input_mode=None, deadline=None):
+    """
+    Sends the text of an already parsed PDFDocument to OpenAI ChatCompletion API to get the summary text.
+    `input_mode` ("digest" or "raw", default SUMMARY_INPUT) selects what is sent.
+    Past `deadline` (a time.monotonic() value) it stops retrying and raises.
+    """
+    mode = mode or SUMMARY_MODE
+    intro, pages = summary_input(document, input_mode)
+    full_text = "".join((text or "") + "\n" for text in pages)
+
+    if mode == "chunked" or (mode == "auto" and estimate_tokens(full_text) > SUMMARY_SINGLE_MAX_TOKENS):
+        summary, _ = summarize_chunked(pages, deadline=deadline)
+        return summary
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{intro}\n{full_text}"}
+    ]
+
+    summary, _ = _chat_completion(messages, deadline)
     return summary
 
 def generate_summary_page(summary_text):
@@ -55,21 +350,20 @@ def generate_summary_page(summary_text):
     """
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
     elements = []
 
-    title = Paragraph("Resumen del Informe", styles['Heading1'])
+    title = Paragraph("Resumen del Informe", TITLE)
     elements.append(title)
     elements.append(Spacer(1, 20))
 
     # Split summary into paragraphs if needed
     for paragraph in summary_text.split('\n\n'):
-        elements.append(Paragraph(paragraph.strip(), styles['Normal']))
+        elements.append(Paragraph(paragraph.strip(), NORMAL))
         elements.append(Spacer(1, 12))
 
     # Add date at the bottom
     elements.append(Spacer(1, 40))
-    date_paragraph = Paragraph(f"Fecha del resumen: {datetime.now().strftime('%d/%m/%Y')}", styles['Normal'])
+    date_paragraph = Paragraph(f"Fecha del resumen: {datetime.now().strftime('%d/%m/%Y')}", NORMAL)
     elements.append(date_paragraph)
 
     doc.build(elements)
@@ -0,0 +1,296 @@
+import csv
+import io
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+from extractorv2 import extract_pathologies_from_pdf, extract_front_page_info, compose_final_report, render_report_pages
+from extractor_pathologies import RULES, DEFAULT_SEVERITIES, extract_pathologies_from_texts
+from pdf_document import PDFDocument, load_pdf_document
+from page_prefilter import candidate_pages
+from extraction_cache import get_extraction_cache, file_sha256
+from pathology_index import get_pathology_index
+from pdf_summary import get_pdf_summary, generate_summary_page
+from upload_workspace import open_mapped
+from tracing import trace, stage, set_value, submit_in_context
+
+logger = logging.getLogger(__name__)
+
+# Segundos máximos de espera del resumen; al vencer se arma el informe sin la página de resumen
+SUMMARY_TIMEOUT = float(os.getenv("SUMMARY_TIMEOUT", "120"))
+
+# Sin resumen sólo se analiza el layout de la portada y de las páginas candidatas
+PAGE_PREFILTER = os.getenv("PAGE_PREFILTER", "1") == "1"
+
+# El resumen es una llamada de red: basta con hilos para solaparlo con el resto
+_summary_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SUMMARY_THREADS", "4")))
+
+
+def iter_items_csv(items, file_column=False, severity_column=False):
+    """
+    Pathology items as CSV text, one line at a time, for streamed responses.
+    With `file_column` each row starts with the item's source file
+    (`item["file"]`), for reports that combine several PDFs; with
+    `severity_column` the severity follows the type.
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    def line(row):
+        writer.writerow(row)
+        text = output.getvalue()
+        output.seek(0)
+        output.truncate()
+        return text
+
+    header = ["Número", "Tipo de Patología", "Descripción Corta", "Habitación", "Página"]
+    if severity_column:
+        header.insert(2, "Severidad")
+    yield line(["Archivo"] + header if file_column else header)
+    for item in items:
+        row = [item["code"], item["type"], item["description"], item["room"], item["page"]]
+        if severity_column:
+            row.insert(2, item["severity"])
+        yield line([item["file"]] + row if file_column else row)
+
+
+def items_to_csv(items, file_column=False, severity_column=False):
+    """
+    Pathology items as CSV text; see iter_items_csv().
+    """
+    return "".join(iter_items_csv(items, file_column, severity_column))
+
+
+def _no_progress(stage, percent):
+    pass
+
+
+def load_extraction_document(input_path, severities=DEFAULT_SEVERITIES):
+    """
+    Partial document for runs that only need the front page info and the
+    pathology items: pdfplumber's layout analysis runs on the front page and
+    on the pages whose raw text may contain a header of one of `severities`.
+    """
+    with stage("prefilter"):
+        # Toda página con un encabezado contiene la palabra de su severidad
+        pages, stats = candidate_pages(input_path, RULES.select(severities))
+    set_value("pages_skipped", stats["pages_skipped"])
+    with stage("text_extraction"):
+        return load_pdf_document(input_path, pages=sorted(set(pages) | {1}))
+
+
+def run_extraction_pipeline(input_path, severities=DEFAULT_SEVERITIES, file_name=None):
+    """
+    Front page info and pathology items of an uploaded report, without
+    summary, rendering or composition. Reuses the extraction cache and,
+    with PAGE_PREFILTER, only analyses the layout of the candidate pages.
+    `file_name` is the original name of the upload, for the pathology index.
+    """
+    with trace("extract") as current:
+        result = _run_extraction(input_path, RULES.select(severities), file_name)
+    if current is not None:
+        result["trace"] = current.as_dict()
+    return result
+
+
+def _run_extraction(input_path, severities, file_name):
+    cache = get_extraction_cache()
+    with stage("cache_lookup"):
+        cache_key = file_sha256(input_path) if cache else None
+        cached = cache.get(cache_key) if cache else None
+    set_value("cache_hit", int(cached is not None))
+
+    if cached is not None:
+        front_page_info = dict(cached["front_page_info"], date=datetime.now().strftime("%Y-%m-%d"))
+        if severities == DEFAULT_SEVERITIES:
+            pathology_items = cached["pathology_items"]
+        else:
+            # Sólo se guardan los ítems por defecto: los demás salen del texto guardado
+            with stage("pathologies"):
+                document = PDFDocument(input_path, cached["page_texts"])
+                pathology_items = extract_pathologies_from_texts(document.iter_pages(), severities)
+        set_value("pages", len(cached["page_texts"]))
+    else:
+        if PAGE_PREFILTER:
+            document = load_extraction_document(input_path, severities)
+        else:
+            with stage("text_extraction"):
+                document = load_pdf_document(input_path)
+        set_value("pages", document.page_count)
+        with stage("front_page"):
+            front_page_info = extract_front_page_info(document)
+        with stage("pathologies"):
+            pathology_items = extract_pathologies_from_pdf(document, severities)
+        # Con el texto completo se guarda como un informe sin resumen (se pide al generar el informe)
+        if cache and not document.partial and severities == DEFAULT_SEVERITIES:
+            cache.put(cache_key, {
+                "page_texts": document.page_texts,
+                "front_page_info": front_page_info,
+                "pathology_items": pathology_items,
+                "summary_text": None,
+            })
+    set_value("pathology_items", len(pathology_items))
+
+    page_texts = cached["page_texts"] if cached is not None else None if document.partial else document.page_texts
+    _index_report(input_path, cache_key, file_name, None, front_page_info, pathology_items, page_texts)
+
+    return {
+        "front_page_info": front_page_info,
+        "pathology_items": pathology_items,
+    }
+
+
+def _index_report(input_path, file_key, file_name, form_data, front_page_info, pathology_items, page_texts):
+    """
+    Adds the report to the pathology index (see pathology_index.py). With
+    the full page texts the items of every severity are indexed; otherwise
+    only `pathology_items`. Indexing never fails the request.
+    """
+    index = get_pathology_index()
+    if index is None:
+        return
+    with stage("index"):
+        try:
+            if page_texts is not None:
+                # Una pasada más sobre el texto ya extraído, con todas las severidades
+                pathology_items = extract_pathologies_from_texts(PDFDocument(input_path, page_texts).iter_pages(), None)
+            index.add_report(file_key or file_sha256(input_path), front_page_info, pathology_items,
+                             form_data=form_data, file_name=file_name)
+        except Exception:
+            logger.exception("Could not add report %s to the pathology index", file_name or input_path)
+
+
+def _summarize(document, deadline):
+    with stage("summary"):
+        return get_pdf_summary(document, deadline=deadline)
+
+
+def _wait_summary(future, deadline, timeout):
+    """
+    Returns the summary text, or None if it failed or did not arrive by
+    `deadline` (`timeout` seconds after it was submitted).
+    """
+    try:
+        return future.result(timeout=max(0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        # Si sigue en cola no llega a correr; si ya corre, get_pdf_summary
+        # deja de reintentar y de esperar al pasar el mismo deadline
+        future.cancel()
+        logger.warning("Summary timed out after %.0f s; composing report without summary page", timeout)
+    except Exception:
+        logger.exception("Summary failed; composing report without summary page")
+    return None
+
+
+def run_report_pipeline(input_path, output_path, form_data, progress=None, summary_timeout=None, skip_summary=False,
+                        file_name=None):
+    """
+    Runs every stage for one uploaded report and writes it to `output_path`.
+
+    Dependency graph: text -> {summary, front page info, pathology items};
+    items -> table, form data -> page 3; all of them -> composition. The
+    summary request runs in the background from the moment the text is
+    available, so latency is about max(summary, rest) instead of the sum.
+
+    `progress(stage, percent)` is called as each stage starts. With
+    `skip_summary` no summary is requested and the report has no summary page.
+    The items are added to the pathology index under `file_name`.
+    Returns the front page info, the pathology items and, when tracing is
+    enabled, the stage timings under "trace" (see tracing.py).
+    """
+    with trace("report") as current:
+        result = _run_stages(input_path, output_path, form_data, progress, summary_timeout, skip_summary, file_name)
+    if current is not None:
+        result["trace"] = current.as_dict()
+    return result
+
+
+def _run_stages(input_path, output_path, form_data, progress, summary_timeout, skip_summary, file_name):
+    progress = progress or _no_progress
+    if summary_timeout is None:
+        summary_timeout = SUMMARY_TIMEOUT
+
+    # Re-uploads of the same report reuse the cached extraction and summary
+    cache = get_extraction_cache()
+    with stage("cache_lookup"):
+        cache_key = file_sha256(input_path) if cache else None
+        cached = cache.get(cache_key) if cache else None
+    set_value("cache_hit", int(cached is not None))
+
+    progress("extracting", 10)
+    summary_future = None
+    if cached is not None:
+        front_page_info = dict(cached["front_page_info"], date=datetime.now().strftime("%Y-%m-%d"))
+        pathology_items = cached["pathology_items"]
+        summary_text = cached["summary_text"]
+        if summary_text is None and not skip_summary:
+            # El resumen había fallado: se vuelve a pedir con el texto guardado
+            document = PDFDocument(input_path, cached["page_texts"])
+            summary_deadline = time.monotonic() + summary_timeout
+            summary_future = submit_in_context(_summary_executor, _summarize, document, summary_deadline)
+        set_value("pages", len(cached["page_texts"]))
+    else:
+        # Parse the upload once; every stage reuses the same page texts
+        if skip_summary and PAGE_PREFILTER:
+            document = load_extraction_document(input_path)
+        else:
+            with stage("text_extraction"):
+                document = load_pdf_document(input_path)
+        summary_text = None
+        set_value("pages", document.page_count)
+
+        # Start the summary as soon as the text is available
+        if not skip_summary:
+            summary_deadline = time.monotonic() + summary_timeout
+            summary_future = submit_in_context(_summary_executor, _summarize, document, summary_deadline)
+
+        # Extract front page info
+        with stage("front_page"):
+            front_page_info = extract_front_page_info(document)
+
+        # Extract pathology items
+        with stage("pathologies"):
+            pathology_items = extract_pathologies_from_pdf(document)
+    set_value("pathology_items", len(pathology_items))
+
+    # Cover, page 3 and pathology table overlap with the summary request
+    progress("rendering", 40)
+    rendered_pages = render_report_pages(front_page_info, pathology_items, form_data)
+
+    if summary_future is not None:
+        progress("summarizing", 60)
+        with stage("summary_wait"):
+            summary_text = _wait_summary(summary_future, summary_deadline, summary_timeout)
+
+    # A partial document has no text for the summary: it is not cached
+    if cache and (cached is None or summary_future is not None) and not document.partial:
+        cache.put(cache_key, {
+            "page_texts": document.page_texts,
+            "front_page_info": front_page_info,
+            "pathology_items": pathology_items,
+            "summary_text": summary_text,
+        })
+
+    progress("composing", 80)
+    if skip_summary:
+        summary_text = None
+    with stage("summary_page"):
+        summary_pdf = generate_summary_page(summary_text) if summary_text else None
+
+    # Compose final report PDF; PyPDF2 reads the original through a memory map
+    # instead of loading the whole file into memory
+    with stage("compose"), open_mapped(input_path) as original_pdf:
+        compose_final_report(original_pdf, front_page_info, pathology_items, output_path, form_data,
+                             summary_pdf=summary_pdf, rendered_pages=rendered_pages)
+    set_value("output_bytes", os.path.getsize(output_path))
+
+    page_texts = cached["page_texts"] if cached is not None else None if document.partial else document.page_texts
+    _index_report(input_path, cache_key, file_name, form_data, front_page_info, pathology_items, page_texts)
+
+    return {
+        "front_page_info": front_page_info,
+        "pathology_items": pathology_items,
+        "summary_available": summary_text is not None,
+    }
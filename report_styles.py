@@ -0,0 +1,109 @@
+"""
+Paragraph and table styles of the generated report pages, built once at
+import (before gunicorn forks its workers, see gunicorn.conf.py) and shared
+by every request and thread.
+
+The shared styles are frozen: setting an attribute or adding a table
+command raises instead of silently changing every later report. To vary a
+style, derive a new one with `FrozenParagraphStyle(name, parent=STYLE, ...)`.
+"""
+from reportlab.lib import colors
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.platypus import TableStyle
+
+# Fuentes usadas en las páginas generadas: sus métricas se cargan una sola vez
+REPORT_FONTS = ("Helvetica", "Helvetica-Bold")
+
+_CELL_PADDING = 4
+
+
+class FrozenParagraphStyle(ParagraphStyle):
+    """
+    ParagraphStyle that cannot be modified once built.
+    """
+
+    def __init__(self, name, parent=None, **kw):
+        super().__init__(name, parent, **kw)
+        self.__dict__["_frozen"] = True
+
+    def __setattr__(self, name, value):
+        if self.__dict__.get("_frozen"):
+            raise AttributeError(f"Style {self.name!r} is shared and read-only; derive a new style instead")
+        super().__setattr__(name, value)
+
+
+class FrozenTableStyle(TableStyle):
+    """
+    TableStyle whose commands cannot be added to or changed.
+    """
+
+    def __init__(self, cmds=None, parent=None, **kw):
+        super().__init__(cmds, parent, **kw)
+        self._cmds = tuple(self._cmds)
+
+    def add(self, *cmd):
+        raise AttributeError("Table style is shared and read-only; build a new TableStyle instead")
+
+
+def _frozen_sample_styles():
+    """
+    ReportLab's sample stylesheet (Normal, Heading1...) as frozen styles.
+    Parent attributes are already copied into each style.
+    """
+    styles = {}
+    for name, style in getSampleStyleSheet().byName.items():
+        if isinstance(style, ParagraphStyle):
+            attributes = {key: value for key, value in style.__dict__.items() if key not in ("name", "parent")}
+            styles[name] = FrozenParagraphStyle(name, **attributes)
+    return styles
+
+
+for _font in REPORT_FONTS:
+    pdfmetrics.getFont(_font)
+
+SAMPLE_STYLES = _frozen_sample_styles()
+NORMAL = SAMPLE_STYLES["Normal"]
+TITLE = SAMPLE_STYLES["Heading1"]
+
+# Página 3: datos del informe
+PAGE3_TITLE = FrozenParagraphStyle("Page3Title", parent=TITLE, textColor=colors.HexColor("#233D4C"))
+CARD_TITLE = FrozenParagraphStyle(
+    "CardTitle",
+    parent=SAMPLE_STYLES["Heading2"],
+    fontName="Helvetica-Bold",
+    fontSize=13,
+    textColor=colors.HexColor("#233D4C"),
+    spaceAfter=8,
+)
+CARD_TABLE = FrozenTableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.whitesmoke),
+    ('BOX', (0, 0), (-1, -1), 1, colors.HexColor("#cccccc")),
+    ('ROUNDED', (0, 0), (-1, -1), 8),
+    ('INNERPADDING', (0, 0), (-1, -1), 8),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor("#233D4C")),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('SHADOW', (0, 0), (-1, -1), 2, 2, colors.HexColor("#e0e0e0")),
+])
+
+# Tabla de patologías: anchos fijos y celdas con ajuste de línea
+LONG_TABLE_CELL_PADDING = _CELL_PADDING
+LONG_TABLE_HEADER = FrozenParagraphStyle("PathologyHeader", parent=NORMAL, fontName="Helvetica-Bold",
+                                         fontSize=10, leading=12)
+LONG_TABLE_CELL = FrozenParagraphStyle("PathologyCell", parent=NORMAL, fontSize=9, leading=11)
+LONG_TABLE = FrozenTableStyle([
+    ('FONTNAME', (0, 0), (-1, 0), LONG_TABLE_HEADER.fontName),
+    ('FONTNAME', (0, 1), (-1, -1), LONG_TABLE_CELL.fontName),
+    ('FONTSIZE', (0, 0), (-1, 0), LONG_TABLE_HEADER.fontSize),
+    ('FONTSIZE', (0, 1), (-1, -1), LONG_TABLE_CELL.fontSize),
+    ('LEADING', (0, 0), (-1, 0), LONG_TABLE_HEADER.leading),
+    ('LEADING', (0, 1), (-1, -1), LONG_TABLE_CELL.leading),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (-1, -1), _CELL_PADDING),
+    ('RIGHTPADDING', (0, 0), (-1, -1), _CELL_PADDING),
+    ('TOPPADDING', (0, 0), (-1, -1), _CELL_PADDING),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), _CELL_PADDING),
+])
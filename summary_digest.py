@@ -0,0 +1,187 @@
+"""
+Compact input for the summary request, built from the extraction output
+instead of the raw text of every page.
+
+    Portada            front page lines (address, inspection date, inspector)
+    Datos del inmueble lines repeated on most pages (address, surfaces...), once
+    Ambientes          every "▼" room, once
+    ROJO / AMARILLO / VERDE
+      ▼ room
+        - <code> <TYPE> (pág. n): description -Identificación: ... -Recomendación: ...
+
+Page footers, "Foto" placeholders, stray numbers from the floor plans,
+repeated headers and continuation headers are dropped. A paragraph
+("-Posibles causas: ...") already given for an earlier item is replaced by
+a reference to that item. Pages without items (index, how to read the
+report, terms and conditions) are left out.
+"""
+import re
+import unicodedata
+from collections import Counter
+
+from extractor_pathologies import RULES, iter_pathologies
+
+SEVERITY_LABELS = {
+    "ROJO": "ROJO (crítico: reparar o consultar a un experto)",
+    "AMARILLO": "AMARILLO (defectos menores)",
+    "VERDE": "VERDE (en condiciones)",
+}
+
+# Líneas de relleno de las fotos, además de las que ignora la extracción
+_PHOTO_LINES = ("foto", "fotos")
+
+# Comienzo de un párrafo de la descripción: "-Identificación:", "- Posibles causas:", "-Recomendación:"
+_paragraph_start = re.compile(r"\s*,?\s*(?=-\s?[A-ZÁÉÍÓÚ][a-záéíóúñ ]{2,30}:)")
+_paragraph_title = re.compile(r"-\s?([A-ZÁÉÍÓÚ][a-záéíóúñ ]{2,30}):")
+_letters = re.compile(r"[^\W\d_]{2}")
+_spaces = re.compile(r"\s+")
+
+
+def _fold(text):
+    """
+    Lowercase without accents, for comparisons that ignore both.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def _repeated_lines(pages):
+    """
+    Lines present on at least half of the pages (and on 3 or more): the
+    header the report repeats on every page.
+    """
+    counts = Counter()
+    for _, text in pages:
+        counts.update({line.strip() for line in text.splitlines() if line.strip()})
+    threshold = max(3, len(pages) // 2)
+    return {line for line, count in counts.items() if count >= threshold}
+
+
+def _useful_lines(text, repeated, rules):
+    """
+    Lines of `text` worth sending: no repeated header, footer, photo
+    placeholder or floor plan measurement (lines without words).
+    """
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line in repeated or _fold(line) in _PHOTO_LINES or line.lower() in rules.skip_lines:
+            continue
+        if rules.page_break.match(line) or not _letters.search(line):
+            continue
+        yield line
+
+
+def _block_lines(block, repeated, rules):
+    lines = []
+    for line in block.splitlines():
+        # Lo que sigue a un "▼" es de otro ambiente
+        if rules.room_marker in line:
+            break
+        lines.append(line)
+    return list(_useful_lines("\n".join(lines), repeated, rules))
+
+
+def _item_text(item, lines):
+    """
+    Description of an item in one line, without the "<Type> <severity>"
+    caption that precedes it in the report.
+    """
+    caption = _fold(f"{item['type']} {item['severity']}")
+    if lines and _fold(lines[0]) == caption:
+        lines = lines[1:]
+    return _spaces.sub(" ", " ".join(lines)).strip()
+
+
+def _compact_paragraphs(code, text, seen):
+    """
+    Replaces every "-Title: ..." paragraph already sent for another item by
+    a reference to it; `seen` maps folded paragraphs to the first item code.
+    """
+    parts = [part for part in _paragraph_start.split(text) if part.strip(" ,.")]
+    if not parts:
+        return text
+    result, references = [parts[0]], set()
+    for part in parts[1:]:
+        key = _fold(part.strip(" ,."))
+        first = seen.setdefault(key, code)
+        if first == code:
+            result.append(part)
+            continue
+        title = _paragraph_title.match(part.strip())
+        result.append(f"-{title.group(1) if title else 'Detalle'}: igual que ítem {first}.")
+        references.add(first)
+    if len(parts) > 1 and len(references) == 1 and all("igual que ítem" in part for part in result[1:]):
+        # Observación idéntica a la de otro ítem: una sola referencia
+        return f"{parts[0].strip(' ,.')} (misma observación que ítem {references.pop()})."
+    return " ".join(part.strip() for part in result if part.strip())
+
+
+def build_digest(page_texts, rules=RULES):
+    """
+    Compact, structured text of a report for the summary prompt, from its
+    page texts (PDFDocument.page_texts). See the module docstring.
+    """
+    pages = [(number, text) for number, text in enumerate(page_texts, start=1) if text]
+    if not pages:
+        return ""
+    repeated = _repeated_lines(pages)
+
+    # Ítems de todas las severidades; la continuación en otra página se suma al mismo ítem
+    items = {}
+    for header in iter_pathologies(pages, None, rules):
+        lines = _block_lines(header["block"], repeated, rules)
+        item = items.get(header["code"])
+        if item is None:
+            items[header["code"]] = dict(header, lines=lines, pages=[header["page"]])
+            continue
+        item["lines"] += [line for line in lines if line not in item["lines"]]
+        if header["page"] not in item["pages"]:
+            item["pages"].append(header["page"])
+
+    rooms = []
+    header_lines = []
+    for _, text in pages:
+        for line in text.splitlines():
+            line = line.strip()
+            if rules.room_marker in line:
+                room = line.strip(rules.room_marker + " ").strip()
+                # Un ":" indica que el ambiente quedó pegado a otra línea (medidas, encabezado)
+                if room and ":" not in room and room not in rooms:
+                    rooms.append(room)
+            elif line in repeated and line not in header_lines and _letters.search(line) \
+                    and _fold(line) not in _PHOTO_LINES:
+                header_lines.append(line)
+
+    # "Baño" y "Baño/6º piso" son el mismo ambiente: queda el nombre completo
+    rooms = [room for room in rooms
+             if not any(other != room and other.startswith(room) and other[len(room):].lstrip().startswith("/")
+                        for other in rooms)]
+
+    sections = []
+    front_page = list(_useful_lines(pages[0][1], repeated, rules)) if pages[0][0] == 1 else []
+    if front_page:
+        sections.append("Portada:\n" + "\n".join(front_page))
+    if header_lines:
+        sections.append("Datos del inmueble:\n" + "\n".join(header_lines))
+    if rooms:
+        sections.append("Ambientes relevados: " + "; ".join(rooms))
+
+    seen = {}
+    for severity in rules.severities:
+        group = sorted((item for item in items.values() if item["severity"] == severity),
+                       key=lambda item: int(item["code"]))
+        if not group:
+            continue
+        by_room = {}
+        for item in group:
+            by_room.setdefault(item["room"] or "Sin ambiente", []).append(item)
+        lines = [f"Patologías {SEVERITY_LABELS.get(severity, severity)}: {len(group)} ítems"]
+        for room, room_items in by_room.items():
+            lines.append(f"{rules.room_marker} {room}")
+            for item in room_items:
+                pages_label = ", ".join(map(str, item["pages"]))
+                text = _compact_paragraphs(item["code"], _item_text(item, item["lines"]), seen)
+                lines.append(f"- {item['code']} {item['type']} (pág. {pages_label}): {text}")
+        sections.append("\n".join(lines))
+
+    return "\n\n".join(sections)
@@ -0,0 +1,210 @@
+"""
+Generates synthetic inspection reports shaped like the ones the extractor
+reads, for benchmarks and regression checks without real customer PDFs.
+
+    python synthetic_report.py /tmp/informe.pdf --pages 200 --items-per-page 3 --image-size 640x480
+
+Every page after the front page has the address block, a "▼ room" line,
+numbered "NN TIPO ROJO|AMARILLO|VERDE" headers followed by "Foto", a photo
+and the description, and a "Page x/y" footer. Every few pages the last item
+continues onto the next page, repeating its header there.
+"""
+import argparse
+import io
+import random
+
+from PIL import Image, ImageFilter
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics, rl_codecs
+from reportlab.pdfgen import canvas
+
+PATHOLOGY_TYPES = ["HUMEDAD", "ELECTRICIDAD", "ABERTURAS", "REVESTIMIENTOS", "PLOMERÍA", "ESTRUCTURA"]
+ROOMS = ["Cocina", "Baño", "Ante baño", "Living", "Dormitorio", "Balcón", "Lavadero", "Pasillo"]
+
+LINE_HEIGHT = 12
+FONT_SIZE = 9
+
+# Las fuentes estándar no tienen "▼" (y reportlab escribe "•" fuera de
+# WinAnsi): se usa Helvetica con una codificación cp1252 propia en la que el
+# byte 0x81 es el glifo "triagdn", así el texto extraído es igual al de los
+# informes reales. El triángulo se dibuja aparte.
+TEXT_FONT = "Helvetica-Informe"
+_TEXT_ENCODING = "rl_informe_encoding"
+
+
+def _register_text_font():
+    if TEXT_FONT in pdfmetrics.getRegisteredFontNames():
+        return
+    names = list(pdfmetrics.getEncoding("WinAnsiEncoding").vector)
+    names[0x81] = "triagdn"
+    decoding = {}
+    for code in range(32, 256):
+        try:
+            decoding[code] = ord(bytes([code]).decode("cp1252"))
+        except UnicodeDecodeError:
+            pass
+    decoding[0x81] = ord("▼")
+    rl_codecs.RL_Codecs.add_dynamic_codec(_TEXT_ENCODING, {u: c for c, u in decoding.items()}, decoding)
+    pdfmetrics.registerEncoding(pdfmetrics.Encoding(_TEXT_ENCODING, names))
+    pdfmetrics.registerFont(pdfmetrics.Font(TEXT_FONT, "Helvetica", _TEXT_ENCODING))
+
+
+def _photo(rng, size):
+    """
+    JPEG bytes of a blurred noise image: compresses about like a real photo.
+    """
+    width, height = size
+    image = Image.frombytes("RGB", size, rng.randbytes(width * height * 3))
+    image = image.filter(ImageFilter.GaussianBlur(2))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    buffer.seek(0)
+    return buffer
+
+
+def _item_lines(code, type_path, severity, rng):
+    description = rng.choice([
+        "Manchas de humedad en muro",
+        "Falta de puesta tierra",
+        "Fisura en revestimiento",
+        "Burlete deteriorado",
+        "Pérdida en sifón",
+    ])
+    return [
+        f"{code} {type_path} {severity}",
+        "Foto",
+        f"{type_path.capitalize()} {severity.lower()}",
+        description,
+        f"-Identificación: {description.lower()}., -Posibles causas: desgaste por uso y falta de",
+        "mantenimiento., -Recomendación: consultar a un profesional matriculado.",
+    ]
+
+
+def generate_synthetic_report(output, pages=60, items_per_page=3, image_size=(640, 480),
+                              rojo_ratio=0.5, continuation_every=5, seed=0):
+    """
+    Writes a synthetic report to `output` (path or binary file object).
+
+    `items_per_page` pathology items are drawn on every page after the front
+    page, a fraction `rojo_ratio` of them ROJO; `image_size` is the pixel size
+    of each photo (None for no photos). Returns the (page_number, text) pairs
+    drawn, in the same shape PDFDocument.iter_pages() yields, so callers can
+    check the extraction against extract_pathologies_from_texts().
+    """
+    _register_text_font()
+    rng = random.Random(seed)
+    page_width, page_height = letter
+    top, bottom = page_height - 48, 60
+
+    c = canvas.Canvas(output, pagesize=letter)
+    page_texts = []
+
+    line_height = LINE_HEIGHT
+
+    def draw_line(y, text, x=48):
+        c.drawString(x, y, text)
+        lines.append(text)
+        return y - line_height
+
+    # Portada
+    c.setFont(TEXT_FONT, FONT_SIZE)
+    lines = []
+    y = draw_line(top, "Formosa 157, CABA, Buenos Aires")
+    y = draw_line(y, "22 de Abril de 2025")
+    draw_line(y, "Inspector: Mendez Mariano Jeremias")
+    page_texts.append((1, "\n".join(lines)))
+    c.showPage()
+
+    code = 1
+    continued = None
+    for page_number in range(2, pages + 1):
+        # Con muchos ítems por página se achica la letra para que el texto entre
+        text_lines = 5 + len(continued or ()) + 6 * items_per_page
+        line_height = min(LINE_HEIGHT, (top - bottom) / text_lines)
+        c.setFont(TEXT_FONT, min(FONT_SIZE, line_height * 0.75))
+        lines = []
+        y = draw_line(top, "Formosa 157, Piso 6, Depto 21")
+        y = draw_line(y, "Formosa 157, C1424 Buenos Aires, Ciudad Autónoma de Buenos Aires, AR")
+        y = draw_line(y, "SUPERFICIE TOTAL: 88.84 m² • SUPERFICIE DE LA VIVIENDA: 81.28 m² • PISOS: 1 •")
+        y = draw_line(y, "HABITACIONES: 13")
+
+        if continued is not None:
+            # Continuación del último ítem de la página anterior
+            for text in continued:
+                y = draw_line(y, text)
+            continued = None
+
+        # El glifo "▼" no tiene ancho en Helvetica: el texto arranca después del triángulo
+        size = line_height * 0.6
+        path = c.beginPath()
+        path.moveTo(48, y + size)
+        path.lineTo(48 + size, y + size)
+        path.lineTo(48 + size / 2, y)
+        path.close()
+        c.drawPath(path, stroke=0, fill=1)
+        y = draw_line(y, f"▼ {rng.choice(ROOMS)}/6º piso", x=48 + size)
+
+        # Alto disponible para la foto de cada ítem
+        text_height = 6 * line_height
+        photo_box = (y - bottom - items_per_page * text_height) / max(items_per_page, 1) - 6
+        for n in range(items_per_page):
+            severity = "ROJO" if rng.random() < rojo_ratio else rng.choice(["AMARILLO", "VERDE"])
+            item_lines = _item_lines(code, rng.choice(PATHOLOGY_TYPES), severity, rng)
+            is_continued = continuation_every and page_number % continuation_every == 0 \
+                and n == items_per_page - 1 and page_number < pages
+            shown = item_lines[:4] if is_continued else item_lines
+
+            y = draw_line(y, shown[0])
+            y = draw_line(y, shown[1])
+            if image_size and photo_box > 12:
+                width = min(photo_box * image_size[0] / image_size[1], page_width - 96)
+                height = width * image_size[1] / image_size[0]
+                photo_top = y + line_height * 0.6
+                c.drawImage(ImageReader(_photo(rng, image_size)), 48, photo_top - height, width, height)
+                y = photo_top - height - line_height
+            for text in shown[2:]:
+                y = draw_line(y, text)
+
+            if is_continued:
+                continued = [item_lines[0]] + item_lines[2:]
+            code = code % 999 + 1
+
+        c.setFont(TEXT_FONT, FONT_SIZE)
+        footer = f"Page {page_number}/{pages}"
+        c.drawRightString(page_width - 48, 30, footer)
+        lines.append(footer)
+        page_texts.append((page_number, "\n".join(lines)))
+        c.showPage()
+
+    c.save()
+    return page_texts
+
+
+def parse_image_size(value):
+    """
+    "640x480" -> (640, 480); "0" or "none" -> None.
+    """
+    if value in ("0", "none"):
+        return None
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--items-per-page", type=int, default=3)
+    parser.add_argument("--image-size", type=parse_image_size, default=(640, 480), help="WxH in pixels, or 0 for no photos")
+    parser.add_argument("--rojo-ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    page_texts = generate_synthetic_report(args.output, pages=args.pages, items_per_page=args.items_per_page,
+                                           image_size=args.image_size, rojo_ratio=args.rojo_ratio, seed=args.seed)
+    print(f"{args.output}: {len(page_texts)} páginas")
+
+
+if __name__ == "__main__":
+    main()
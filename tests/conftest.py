@@ -0,0 +1,22 @@
+"""
+Test settings, applied before the app modules read them: the caches, the
+index, the jobs, the rate limiter and the metrics live in a temporary directory and the
+summary is generated locally unless a test points it at the fake server.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+_STATE_DIR = tempfile.mkdtemp(prefix="extraccion-tests-")
+atexit.register(shutil.rmtree, _STATE_DIR, True)
+
+os.environ.update({
+    "SUMMARY_BACKEND": "local",
+    "EXTRACTION_CACHE_PATH": os.path.join(_STATE_DIR, "extraction.sqlite3"),
+    "PATHOLOGY_INDEX_PATH": os.path.join(_STATE_DIR, "pathologies.sqlite3"),
+    "JOBS_DIR": os.path.join(_STATE_DIR, "jobs"),
+    "OPENAI_RATE_LIMIT_PATH": os.path.join(_STATE_DIR, "openai_rate_limit.sqlite3"),
+    "TRACING_METRICS_PATH": os.path.join(_STATE_DIR, "metrics.sqlite3"),
+    "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "test"),
+})
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from batch import run_batch
+from test_upload_workspace import _tiny_report_pdf
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    path = tmp_path / "informes"
+    path.mkdir()
+    (path / "informe.pdf").write_bytes(_tiny_report_pdf())
+    return path
+
+
+def test_output_dir_cannot_be_the_input_dir(input_dir):
+    source = (input_dir / "informe.pdf").read_bytes()
+    with pytest.raises(ValueError):
+        run_batch(str(input_dir), str(input_dir / "." / ""), workers=1, skip_summary=True)
+
+    assert (input_dir / "informe.pdf").read_bytes() == source
+
+
+def test_output_linked_to_the_source_is_not_overwritten(input_dir, tmp_path):
+    source = (input_dir / "informe.pdf").read_bytes()
+    output_dir = tmp_path / "salida"
+    output_dir.mkdir()
+    os.symlink(input_dir / "informe.pdf", output_dir / "informe.pdf")
+
+    progress = run_batch(str(input_dir), str(output_dir), workers=1, skip_summary=True)
+
+    assert progress["informe.pdf"]["status"] == "failed"
+    assert (input_dir / "informe.pdf").read_bytes() == source
+
+
+def test_batch_writes_the_reports(input_dir, tmp_path):
+    progress = run_batch(str(input_dir), str(tmp_path / "salida"), workers=1, skip_summary=True)
+
+    assert progress["informe.pdf"]["status"] == "done"
+    assert (tmp_path / "salida" / "informe.pdf").read_bytes().startswith(b"%PDF")
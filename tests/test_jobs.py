@@ -0,0 +1,100 @@
+import io
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import jobs
+from test_upload_workspace import _tiny_report_pdf
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = jobs.JobStore(str(tmp_path / "jobs"))
+    monkeypatch.setattr(jobs, "_store", store)
+    yield store
+    if jobs._executor is not None:
+        jobs._discard_executor(jobs._executor)
+
+
+def _upload(data=None):
+    return FileStorage(io.BytesIO(data or _tiny_report_pdf()), filename="informe.pdf")
+
+
+def _wait_finished(store, job_id, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = store.get(job_id)
+        if job["status"] in (jobs.STATUS_DONE, jobs.STATUS_FAILED):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} still {store.get(job_id)['status']}")
+
+
+def _kill_pool(executor):
+    # Como el OOM killer: SIGKILL a los procesos del pool
+    deadline = time.monotonic() + 60
+    while not executor._processes and time.monotonic() < deadline:
+        time.sleep(0.05)
+    for process in list(executor._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+
+
+def test_killed_job_fails_and_the_pool_recovers(store):
+    job_id = jobs.submit_job(_upload(), {})
+    _kill_pool(jobs._executor)
+
+    job = _wait_finished(store, job_id)
+    assert job["status"] == jobs.STATUS_FAILED
+    assert "Traceback" not in job["error"]
+
+    next_job = jobs.submit_job(_upload(), {})
+    assert _wait_finished(store, next_job)["status"] == jobs.STATUS_DONE
+
+
+def test_submit_replaces_a_broken_pool(store, monkeypatch):
+    broken = ProcessPoolExecutor(max_workers=1)
+    broken.submit(time.sleep, 30)
+    _kill_pool(broken)
+    deadline = time.monotonic() + 30
+    while not broken._broken and time.monotonic() < deadline:
+        time.sleep(0.05)
+    monkeypatch.setattr(jobs, "_executor", broken)
+
+    job_id = jobs.submit_job(_upload(), {})
+
+    assert jobs._executor is not broken
+    assert _wait_finished(store, job_id)["status"] == jobs.STATUS_DONE
+
+
+def test_failed_submit_leaves_no_queued_job(store, monkeypatch):
+    def broken_executor():
+        raise RuntimeError("no processes")
+
+    monkeypatch.setattr(jobs, "_get_executor", broken_executor)
+    with pytest.raises(RuntimeError):
+        jobs.submit_job(_upload(), {})
+
+    with store._connect() as conn:
+        statuses = [row[0] for row in conn.execute("SELECT status FROM jobs")]
+    assert statuses == [jobs.STATUS_FAILED]
+
+
+def test_sweep_fails_stalled_jobs_and_purges_them_later(store, monkeypatch):
+    job_id = store.create({})
+    store.update(job_id, status=jobs.STATUS_RUNNING, stage="extracting")
+    with store._connect() as conn:
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - 7200, job_id))
+    fresh_id = store.create({})
+
+    monkeypatch.setattr(jobs, "_last_sweep", None)
+    jobs._sweep_expired_jobs(store)
+
+    assert store.get(job_id)["status"] == jobs.STATUS_FAILED
+    assert store.get(fresh_id)["status"] == jobs.STATUS_QUEUED
+    assert store.purge(0) == 1
+    assert store.get(job_id) is None
+    assert not os.path.exists(store.job_dir(job_id))
@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+from extractor_pathologies import RULES, extract_pathologies_from_texts, group_by_severity
+from pdf_document import load_pdf_document
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_REPORT = os.path.join(HERE, "..", "uploads", "test_report_final.pdf")
+
+
+def test_sample_report_matches_the_golden_items():
+    with open(os.path.join(HERE, "data", "test_report_final_items.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+
+    items = extract_pathologies_from_texts(load_pdf_document(SAMPLE_REPORT).iter_pages())
+
+    assert len(items) == 32
+    assert items == expected
+
+
+def test_header_repeated_on_the_next_page_continues_the_item():
+    pages = [
+        (1, "▼ Cocina\n5 HUMEDAD ROJO Foto\nFoto\nPage 1/2"),
+        (2, "5 HUMEDAD ROJO\nManchas en el cielorraso\nPage 2/2"),
+    ]
+
+    items = extract_pathologies_from_texts(pages)
+
+    assert items == [{"code": "5", "type": "HUMEDAD", "severity": "ROJO", "description": "Manchas en el cielorraso",
+                      "room": "Cocina", "page": "1, 2"}]
+
+
+def test_next_header_with_another_code_ends_the_item():
+    pages = [
+        (1, "▼ Cocina\n5 HUMEDAD ROJO\nManchas en el cielorraso\nPage 1/2"),
+        (2, "▼ Baño\n6 HUMEDAD ROJO\nMoho en la ducha\nPage 2/2"),
+    ]
+
+    items = extract_pathologies_from_texts(pages)
+
+    assert [(item["code"], item["description"], item["room"]) for item in items] == [
+        ("5", "Manchas en el cielorraso", "Cocina"),
+        ("6", "Moho en la ducha", "Baño"),
+    ]
+
+
+def test_room_lookup_does_not_match_a_code_inside_a_longer_one():
+    page = "\n".join([
+        "▼ Cocina",
+        "12 HUMEDAD ROJO",
+        "Manchas en el cielorraso",
+        "▼ Baño",
+        "2 HUMEDAD ROJO",
+        "Moho en la ducha",
+    ])
+
+    items = extract_pathologies_from_texts([(1, page)])
+
+    assert {item["code"]: item["room"] for item in items} == {"2": "Baño", "12": "Cocina"}
+
+
+def test_select_normalizes_case_and_rule_order():
+    assert RULES.select(["verde", "Rojo"]) == ("ROJO", "VERDE")
+    assert RULES.select("amarillo") == ("AMARILLO",)
+    assert RULES.select(None) == ("ROJO", "AMARILLO", "VERDE")
+
+
+def test_select_rejects_an_unknown_severity():
+    with pytest.raises(ValueError):
+        RULES.select(["ROJO", "AZUL"])
+
+
+def test_one_sweep_returns_every_severity():
+    page = "\n".join([
+        "▼ Cocina",
+        "1 HUMEDAD ROJO",
+        "Manchas en el cielorraso",
+        "2 ELECTRICIDAD AMARILLO",
+        "Tapa de toma floja",
+        "3 CARPINTERIA VERDE",
+        "Puerta en buen estado",
+    ])
+
+    items = extract_pathologies_from_texts([(1, page)], severities=None)
+
+    assert [(item["code"], item["severity"]) for item in items] == [("1", "ROJO"), ("2", "AMARILLO"), ("3", "VERDE")]
+    assert {severity: [item["code"] for item in group] for severity, group in group_by_severity(items).items()} == {
+        "ROJO": ["1"], "AMARILLO": ["2"], "VERDE": ["3"],
+    }
+
+
+def test_description_stops_at_a_header_of_another_requested_severity():
+    page = "1 HUMEDAD ROJO\nManchas en el cielorraso\n2 ELECTRICIDAD AMARILLO\nTapa de toma floja\n"
+
+    combined = extract_pathologies_from_texts([(1, page)], severities=("ROJO", "AMARILLO"))
+    rojo_only = extract_pathologies_from_texts([(1, page)])
+
+    assert combined[0]["description"] == "Manchas en el cielorraso"
+    assert combined[1]["description"] == "Tapa de toma floja"
+    # Sin pedir AMARILLO su encabezado es texto de la descripción
+    assert "ELECTRICIDAD" in rojo_only[0]["description"]
@@ -0,0 +1,31 @@
+import pdfplumber
+import pytest
+from reportlab.platypus import Table
+
+from benchmarks.common import synthetic_items
+from extractorv2 import _build_table_elements, generate_pathology_table_pdf
+
+# Frame de SimpleDocTemplate en carta con márgenes de 1" (menos 6 puntos de padding por lado)
+FRAME_WIDTH, FRAME_HEIGHT = 456, 636
+
+
+@pytest.mark.parametrize("rows", [5, 32, 150])
+@pytest.mark.parametrize("paginate", [False, True])
+def test_table_fits_the_frame(rows, paginate):
+    elements = _build_table_elements(synthetic_items(rows), FRAME_WIDTH, FRAME_HEIGHT, paginate=paginate)
+    tables = [element for element in elements if isinstance(element, Table)]
+
+    assert tables
+    for table in tables:
+        assert sum(table._colWidths) <= FRAME_WIDTH
+    assert sum(len(table._cellvalues) - 1 for table in tables) == rows
+
+
+@pytest.mark.parametrize("long_table", [False, True])
+def test_rendered_table_stays_inside_the_page(long_table):
+    items = synthetic_items(32)
+    with pdfplumber.open(generate_pathology_table_pdf(items, long_table=long_table)) as pdf:
+        for page in pdf.pages:
+            assert all(0 <= char["x0"] and char["x1"] <= page.width for char in page.chars)
+        text = "\n".join(page.extract_text() for page in pdf.pages)
+    assert all(item["room"] in text for item in items)
@@ -0,0 +1,119 @@
+import json
+import os
+import subprocess
+import sys
+
+import pdfplumber
+import pytest
+
+import pdf_document
+from pdf_document import ExtractionMemoryError, iter_page_texts, load_pdf_document
+from synthetic_report import generate_synthetic_report
+
+
+@pytest.fixture(scope="module")
+def report_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("pdf") / "sintetico.pdf")
+    generate_synthetic_report(path, pages=6, items_per_page=2, image_size=(64, 48))
+    return path
+
+
+@pytest.fixture(scope="module")
+def expected_texts(report_path):
+    with pdfplumber.open(report_path) as pdf:
+        return [page.extract_text() for page in pdf.pages]
+
+
+def _ceiling_checks(monkeypatch, results):
+    """
+    Replaces the RSS check with the given sequence of answers (then False).
+    """
+    answers = iter(results)
+    monkeypatch.setattr(pdf_document, "_over_rss_ceiling", lambda max_rss_mb: next(answers, False))
+
+
+@pytest.mark.parametrize("low_memory", [True, False])
+def test_load_matches_pdfplumber(report_path, expected_texts, monkeypatch, low_memory):
+    monkeypatch.setattr(pdf_document, "EXTRACT_LOW_MEMORY", low_memory)
+    document = load_pdf_document(report_path, workers=1)
+
+    assert document.page_texts == expected_texts
+    assert not document.partial
+
+
+def test_low_memory_disables_the_object_cache(report_path, monkeypatch):
+    monkeypatch.setattr(pdf_document, "EXTRACT_LOW_MEMORY", True)
+    with pdf_document._open_pdf(report_path) as pdf:
+        assert pdf.doc.caching is False
+
+
+def test_iter_page_texts_streams_in_order(report_path, expected_texts):
+    assert list(iter_page_texts(report_path)) == list(enumerate(expected_texts, start=1))
+
+
+def test_selected_pages_only(report_path, expected_texts):
+    document = load_pdf_document(report_path, workers=1, pages=[2, 5])
+
+    assert document.partial
+    assert document.page_texts == [None, expected_texts[1], None, None, expected_texts[4], None]
+
+
+def test_reopens_the_pdf_above_the_ceiling(report_path, expected_texts, monkeypatch):
+    # Sobre el techo después de la página 2; debajo otra vez tras reabrir
+    _ceiling_checks(monkeypatch, [False, True, False])
+    opened = []
+    open_pdf = pdf_document._open_pdf
+    monkeypatch.setattr(pdf_document, "_open_pdf", lambda source, pages=None: opened.append(pages) or open_pdf(source, pages))
+    texts = list(pdf_document._iter_extracted_texts(report_path, max_rss_mb=1))
+
+    assert texts == list(enumerate(expected_texts, start=1))
+    assert opened == [None, [3, 4, 5, 6]]
+
+
+def test_raises_when_still_above_the_ceiling(report_path, monkeypatch):
+    monkeypatch.setattr(pdf_document, "_over_rss_ceiling", lambda max_rss_mb: True)
+    texts = pdf_document._iter_extracted_texts(report_path, max_rss_mb=1)
+
+    assert next(texts)[0] == 1
+    with pytest.raises(ExtractionMemoryError):
+        list(texts)
+
+
+def test_no_ceiling_by_default(report_path, monkeypatch):
+    monkeypatch.setattr(pdf_document, "current_rss_mb", lambda: 10 ** 6)
+
+    assert len(list(pdf_document._iter_extracted_texts(report_path, max_rss_mb=0))) == 6
+
+
+def test_current_rss():
+    rss = pdf_document.current_rss_mb()
+    assert rss is None or rss > 0
+
+
+# Crecimiento admitido del pico por página: sólo los textos de las páginas que se conservan
+MAX_PEAK_GROWTH_MB_PER_PAGE = 0.02
+
+
+def _extraction_peak_mb(path):
+    """
+    Peak RSS added by extracting `path` in a fresh interpreter, with the
+    environment of the test run (e.g. PDF_EXTRACT_LOW_MEMORY).
+    """
+    code = f"from benchmarks.extraction import _memory_worker; _memory_worker({path!r})"
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    return json.loads(output.splitlines()[-1])["peak_mb"]
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(not os.path.exists("/proc/self/clear_refs"), reason="needs Linux peak RSS reset")
+def test_peak_memory_stays_flat_with_page_count(tmp_path):
+    peaks = {}
+    for pages in (50, 1000):
+        path = str(tmp_path / f"sintetico-{pages}.pdf")
+        generate_synthetic_report(path, pages=pages, image_size=(640, 480))
+        peaks[pages] = _extraction_peak_mb(path)
+        os.remove(path)
+
+    growth = (peaks[1000] - peaks[50]) / (1000 - 50)
+    assert growth <= MAX_PEAK_GROWTH_MB_PER_PAGE, f"peak grows {growth * 1024:.1f} KB per page: {peaks}"
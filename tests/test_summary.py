@@ -0,0 +1,133 @@
+import time
+
+import openai
+import pytest
+
+import openai_client
+import pdf_summary
+from fake_openai_server import start_fake_server
+from pdf_document import PDFDocument
+
+_sleep = time.sleep
+
+
+def _page_texts(pages, lines=40):
+    return [
+        "\n".join(f"{line + 1} HUMEDAD ROJO Baño/{page}º piso: manchas de humedad en muro" for line in range(lines))
+        for page in range(1, pages + 1)
+    ]
+
+
+@pytest.fixture
+def fake_openai(tmp_path, monkeypatch):
+    """
+    Points the summary at a local fake OpenAI server, without rate limits or
+    client retries, and without the waits between chunk retries.
+    """
+    servers = []
+
+    def start(**options):
+        server = start_fake_server(**options)
+        servers.append(server)
+        openai_client.configure_openai_client(base_url=server.base_url, api_key="fake")
+        return server
+
+    monkeypatch.setattr(pdf_summary, "SUMMARY_BACKEND", "openai")
+    monkeypatch.setattr(pdf_summary.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(openai_client, "OPENAI_MAX_RETRIES", 0)
+    openai_client.configure_rate_limiter(str(tmp_path / "rate_limit.sqlite3"), rpm=0, tpm=0)
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    openai_client.configure_openai_client(base_url=None, api_key=None)
+    openai_client.configure_rate_limiter()
+
+
+def test_single_summary_is_one_request(fake_openai):
+    server = fake_openai()
+    summary = pdf_summary.get_pdf_summary(PDFDocument(None, _page_texts(3)), mode="single", input_mode="raw")
+
+    assert summary.startswith("Resumen simulado")
+    assert len(server.requests) == 1
+
+
+def test_chunked_summary_covers_every_page(fake_openai):
+    server = fake_openai()
+    summary, metrics = pdf_summary.summarize_chunked(_page_texts(12), token_budget=1000, concurrency=3)
+
+    chunks = [m for m in metrics if isinstance(m["chunk"], int)]
+    assert summary.startswith("Resumen simulado")
+    assert len(chunks) > 1
+    assert metrics[-1]["chunk"] == "reduce"
+    assert len(server.requests) == len(metrics)
+    covered = set()
+    for m in chunks:
+        first, last = map(int, m["pages"].split("-"))
+        covered.update(range(first, last + 1))
+    assert covered == set(range(1, 13))
+
+
+def test_reduce_is_hierarchical_above_the_budget(fake_openai):
+    server = fake_openai()
+    summary, metrics = pdf_summary.summarize_chunked(_page_texts(12), token_budget=500, reduce_budget=60)
+
+    merges = [m for m in metrics if str(m["chunk"]).startswith("merge")]
+    assert merges
+    assert metrics[-1]["chunk"] == "reduce"
+    assert metrics[-1]["input_tokens"] <= 60
+    assert len(server.requests) == len(metrics)
+    assert summary.startswith("Resumen simulado")
+
+
+def test_reduce_is_single_within_the_budget(fake_openai):
+    fake_openai()
+    _, metrics = pdf_summary.summarize_chunked(_page_texts(12), token_budget=1000, reduce_budget=100000)
+
+    assert not [m for m in metrics if str(m["chunk"]).startswith("merge")]
+
+
+def test_zero_chunk_retries_is_a_single_attempt(fake_openai):
+    server = fake_openai(failure_rate=1.0)
+    with pytest.raises(openai.InternalServerError):
+        pdf_summary.summarize_chunked(_page_texts(1), concurrency=1, retries=0)
+
+    assert len(server.requests) == 1
+
+
+def test_chunk_retries_default(fake_openai, monkeypatch):
+    monkeypatch.setattr(pdf_summary, "SUMMARY_CHUNK_RETRIES", 2)
+    server = fake_openai(failure_rate=1.0)
+    with pytest.raises(openai.InternalServerError):
+        pdf_summary.summarize_chunked(_page_texts(1), concurrency=1)
+
+    assert len(server.requests) == 3
+
+
+def test_past_deadline_sends_no_request(fake_openai):
+    server = fake_openai()
+    with pytest.raises(openai_client.DeadlineExceeded):
+        pdf_summary.get_pdf_summary(PDFDocument(None, _page_texts(3)), mode="single", input_mode="raw",
+                                    deadline=time.monotonic() - 1)
+
+    assert server.requests == []
+
+
+def test_slow_request_is_cut_at_the_deadline(fake_openai, monkeypatch):
+    # La latencia del servidor falso necesita el time.sleep real
+    monkeypatch.setattr(time, "sleep", _sleep)
+    fake_openai(latency=5)
+    started = time.monotonic()
+    with pytest.raises(openai.APITimeoutError):
+        pdf_summary.get_pdf_summary(PDFDocument(None, _page_texts(3)), mode="single", input_mode="raw",
+                                    deadline=started + 0.5)
+
+    assert time.monotonic() - started < 2
+
+
+def test_chunk_is_not_retried_past_the_deadline(fake_openai):
+    server = fake_openai(failure_rate=1.0)
+    with pytest.raises(openai.InternalServerError):
+        pdf_summary.summarize_chunked(_page_texts(1), concurrency=1, retries=3, deadline=time.monotonic() + 1)
+
+    assert len(server.requests) == 1
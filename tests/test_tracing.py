@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import jobs
+import tracing
+from tracing import metrics_text, stage, trace
+
+
+def _requests_total(name, status):
+    prefix = f'report_requests_total{{trace="{name}",status="{status}"}} '
+    for line in metrics_text().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return 0
+
+
+def test_failed_trace_is_recorded_and_attached_to_the_error():
+    before = _requests_total("test-error", "error")
+    with pytest.raises(ValueError) as error:
+        with trace("test-error"):
+            with stage("parse"):
+                raise ValueError("corrupt")
+
+    record = error.value.report_trace
+    assert record["status"] == "error"
+    assert [entry["stage"] for entry in record["stages"]] == ["parse"]
+    assert _requests_total("test-error", "error") == before + 1
+
+
+def test_peak_rss_is_measured_from_the_start_of_the_trace():
+    if not tracing._reset_peak_rss():
+        pytest.skip("peak RSS cannot be reset on this platform")
+    block = bytearray(256 * 2 ** 20)
+    block[::4096] = b"x" * len(block[::4096])
+    peak_with_block = tracing._peak_rss_bytes()
+    del block
+
+    with trace("test-peak") as current:
+        pass
+
+    assert current.as_dict()["peak_rss_bytes"] < peak_with_block - 128 * 2 ** 20
+
+
+def test_failed_job_returns_its_trace(tmp_path):
+    store = jobs.JobStore(str(tmp_path))
+    job_id = store.create({})
+    with open(store.input_path(job_id), "wb") as f:
+        f.write(b"%PDF-1.4 corrupt")
+
+    record = jobs._run_job(store.jobs_dir, job_id)
+
+    assert store.get(job_id)["status"] == jobs.STATUS_FAILED
+    assert record["trace"] == "report"
+    assert record["status"] == "error"
+
+
+def test_metrics_are_shared_between_processes():
+    before = _requests_total("test-other-process", "ok")
+    code = "from tracing import trace\nwith trace('test-other-process'):\n    pass\n"
+    subprocess.run([sys.executable, "-c", code], check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    assert _requests_total("test-other-process", "ok") == before + 1
+
+
+def test_histogram_renders_cumulative_buckets(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "_store", tracing.MetricStore(str(tmp_path / "metrics.sqlite3")))
+    for pages in (3, 30, 3000):
+        tracing.record_trace({"trace": "report", "status": "ok", "duration_s": 1.0, "peak_rss_bytes": 0,
+                              "stages": [], "values": {"pages": pages}})
+
+    lines = metrics_text().splitlines()
+    assert 'report_pages_bucket{le="5.0"} 1' in lines
+    assert 'report_pages_bucket{le="50.0"} 2' in lines
+    assert 'report_pages_bucket{le="+Inf"} 3' in lines
+    assert "report_pages_sum 3033.0" in lines
+    assert "report_summary_tokens_total 0" in lines
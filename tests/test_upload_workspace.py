@@ -0,0 +1,138 @@
+import io
+import os
+import tempfile
+
+import pytest
+
+import upload_workspace
+from upload_workspace import create_request_workspace, open_mapped, request_workspace
+
+
+def _tiny_report_pdf():
+    """
+    Two-page PDF with one ROJO item, enough to run the whole pipeline quickly.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    c.drawString(72, 720, "Formosa 157, CABA, Buenos Aires")
+    c.showPage()
+    for y, line in zip(range(720, 600, -15), ["▼ Cocina", "1 HUMEDAD ROJO", "Foto", "Manchas de humedad", "Page 2/2"]):
+        c.drawString(72, y, line)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def tmp_dir(tmp_path, monkeypatch):
+    """
+    Empty directory used as both the workspace and the system temporary
+    directory, so any file a request leaves behind shows up in it.
+    """
+    monkeypatch.setattr(upload_workspace, "UPLOAD_TMP_DIR", str(tmp_path))
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def client(tmp_dir):
+    from app import app
+    return app.test_client()
+
+
+def test_workspace_is_removed_after_success(tmp_dir):
+    with request_workspace() as workspace:
+        with open(workspace.input_path, "wb") as f:
+            f.write(b"%PDF-1.4")
+        assert os.path.dirname(workspace.path) == str(tmp_dir)
+
+    assert not os.path.exists(workspace.path)
+    assert os.listdir(tmp_dir) == []
+
+
+def test_workspace_is_removed_after_an_exception(tmp_dir):
+    with pytest.raises(RuntimeError):
+        with request_workspace() as workspace:
+            with open(workspace.output_path, "wb") as f:
+                f.write(b"%PDF-1.4")
+            raise RuntimeError("pipeline failed")
+
+    assert os.listdir(tmp_dir) == []
+
+
+def test_workspace_cleanup_is_idempotent(tmp_dir):
+    workspace = create_request_workspace()
+    workspace.cleanup()
+    workspace.cleanup()
+
+    assert os.listdir(tmp_dir) == []
+
+
+def test_open_mapped_reads_empty_and_regular_files(tmp_path):
+    empty, regular = tmp_path / "empty.pdf", tmp_path / "regular.pdf"
+    empty.write_bytes(b"")
+    regular.write_bytes(b"%PDF-1.4 data")
+
+    with open_mapped(str(empty)) as stream:
+        assert stream.read() == b""
+    with open_mapped(str(regular)) as stream:
+        assert stream[:8] == b"%PDF-1.4"
+
+
+def test_process_pdf_leaves_no_temporary_files(client, tmp_dir):
+    response = client.post("/process_pdf", data={"pdf_file": (io.BytesIO(_tiny_report_pdf()), "informe.pdf")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert response.data.startswith(b"%PDF")
+    # Como un servidor WSGI: cerrar la respuesta libera el archivo enviado
+    response.close()
+
+    assert os.listdir(tmp_dir) == []
+
+
+@pytest.mark.slow
+def test_process_pdf_requests_leave_no_temporary_files(client, tmp_dir):
+    pdf_bytes = _tiny_report_pdf()
+    for n in range(1000):
+        # Uno de cada diez con un PDF corrupto, que falla a mitad del pipeline
+        data = pdf_bytes if n % 10 else b"%PDF-1.4 corrupt"
+        response = client.post("/process_pdf", data={"pdf_file": (io.BytesIO(data), "informe.pdf")},
+                               content_type="multipart/form-data")
+        assert response.status_code == (200 if n % 10 else 500)
+        if n % 10:
+            assert response.data.startswith(b"%PDF")
+        # Como un servidor WSGI: cerrar la respuesta libera el archivo enviado
+        response.close()
+
+    assert os.listdir(tmp_dir) == []
+
+
+def test_process_pdf_failure_leaves_no_temporary_files(client, tmp_dir):
+    response = client.post("/process_pdf", data={"pdf_file": (io.BytesIO(b"%PDF-1.4 corrupt"), "informe.pdf")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 500
+    response.close()
+
+    assert os.listdir(tmp_dir) == []
+
+
+def test_extract_leaves_no_temporary_files(client, tmp_dir):
+    response = client.post("/extract", data={"pdf_file": (io.BytesIO(_tiny_report_pdf()), "informe.pdf")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert [item["type"] for item in response.get_json()["pathology_items"]] == ["HUMEDAD"]
+
+    assert os.listdir(tmp_dir) == []
+
+
+@pytest.mark.parametrize("data", [b"not a pdf", b"%PDF-1.4 corrupt", b""])
+def test_extract_rejects_an_unreadable_upload(client, tmp_dir, data):
+    response = client.post("/extract", data={"pdf_file": (io.BytesIO(data), "informe.pdf")},
+                           content_type="multipart/form-data")
+
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+    assert os.listdir(tmp_dir) == []
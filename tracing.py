@@ -0,0 +1,398 @@
+"""
+Per-request stage tracing and Prometheus metrics for the report pipeline.
+
+    with trace("report") as t:          # one per report
+        with stage("text_extraction"):  # wall time, CPU time, peak RSS
+            ...
+        set_value("pages", 73)
+
+The current trace lives in a context variable: stage() and set_value() are
+no-ops outside a trace, and work submitted with submit_in_context() to a
+thread pool records into the trace of the caller. With TRACING_ENABLED=0
+trace() yields None and nothing is recorded.
+
+Peak RSS is measured from the start of the trace where Linux allows
+resetting the high-water mark (/proc/self/clear_refs): the reset is skipped
+while another trace of the process is running, so concurrent reports share
+one window. Elsewhere it is the peak since the process started.
+
+Finished traces are aggregated into histograms and counters kept in a
+SQLite file (TRACING_METRICS_PATH) shared by every web worker and job
+process on the host, so metrics_text() (the /metrics endpoint) shows the
+same totals whichever worker answers. With TRACE_LOG=1 each trace is also
+logged as a single JSON line.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import os
+import resource
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1"
+TRACE_LOG = os.getenv("TRACE_LOG", "0") == "1"
+# Métricas compartidas por todos los procesos (workers de gunicorn, jobs, lotes)
+TRACING_METRICS_PATH = os.getenv("TRACING_METRICS_PATH", os.path.join("cache", "metrics.sqlite3"))
+
+if TRACE_LOG and not logger.handlers:
+    # Una línea JSON por informe en stderr aunque la app no configure logging
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_current_trace = contextvars.ContextVar("report_trace", default=None)
+
+# Trazas abiertas en el proceso: el pico de memoria sólo se reinicia sin otras en curso
+_active_traces = 0
+_active_lock = threading.Lock()
+
+
+def _reset_peak_rss():
+    """
+    Restarts the peak RSS of the process (VmHWM) at the current RSS.
+    Returns False where /proc/self/clear_refs is not available.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes():
+    """
+    Peak RSS of the process since the last _reset_peak_rss() (VmHWM), or
+    since the process started where /proc is not available.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Trace:
+    """
+    Stage timings and values (page count, tokens, ...) of one report.
+    Stages may be recorded from several threads.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.status = "ok"
+        self.stages = []
+        self.values = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def add_stage(self, name, wall, cpu):
+        # Pico del proceso desde el inicio de la traza hasta el fin de la etapa, no sólo de la etapa
+        with self._lock:
+            self.stages.append({
+                "stage": name,
+                "wall_s": round(wall, 6),
+                "cpu_s": round(cpu, 6),
+                "peak_rss_bytes": _peak_rss_bytes(),
+            })
+
+    def set(self, key, value):
+        with self._lock:
+            self.values[key] = value
+
+    def add(self, key, amount):
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def finish(self, status="ok"):
+        self.status = status
+        self.duration = time.perf_counter() - self._start
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "trace": self.name,
+                "status": self.status,
+                "duration_s": round(self.duration or 0, 6),
+                "peak_rss_bytes": _peak_rss_bytes(),
+                "stages": list(self.stages),
+                "values": dict(self.values),
+            }
+
+
+@contextmanager
+def trace(name):
+    """
+    Starts a trace for the current context; on exit it is added to the
+    metrics and optionally logged. Yields the Trace, or None when disabled.
+    If the block raises, the finished trace (Trace.as_dict()) is attached to
+    the exception as `report_trace`, for callers in another process.
+    """
+    global _active_traces
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    with _active_lock:
+        _active_traces += 1
+        if _active_traces == 1:
+            _reset_peak_rss()
+    current = Trace(name)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    except BaseException as error:
+        current.finish("error")
+        error.report_trace = current.as_dict()
+        raise
+    else:
+        current.finish()
+    finally:
+        _current_trace.reset(token)
+        with _active_lock:
+            _active_traces -= 1
+        record = current.as_dict()
+        record_trace(record)
+        if TRACE_LOG:
+            logger.info(json.dumps(record, ensure_ascii=False))
+
+
+@contextmanager
+def stage(name):
+    """
+    Records wall and CPU time of the block as a stage of the current trace.
+    CPU time is per thread, so stages running concurrently do not overlap.
+    """
+    current = _current_trace.get()
+    if current is None:
+        yield
+        return
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        current.add_stage(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def set_value(key, value):
+    current = _current_trace.get()
+    if current is not None:
+        current.set(key, value)
+
+
+def add_value(key, amount):
+    current = _current_trace.get()
+    if current is not None and amount:
+        current.add(key, amount)
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """
+    executor.submit() that runs `fn` in a copy of the caller's context, so
+    its stages and values go to the caller's trace.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+
+    def observe(self, value, *label_values):
+        """
+        Increments for one observation: its bucket and the sum (key -1).
+        """
+        labels = json.dumps(label_values)
+        return [(self.name, labels, bisect.bisect_left(self.buckets, value), 1), (self.name, labels, -1, value)]
+
+    def render(self, series):
+        """
+        `series`: {label values: {bucket index or -1: value}} from MetricStore.
+        """
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, values in sorted(series.items()):
+            labels = [f'{name}="{value}"' for name, value in zip(self.labels, label_values)]
+            cumulative = 0
+            for index, bound in enumerate(self.buckets + (float("inf"),)):
+                cumulative += int(values.get(index, 0))
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_labels = ",".join(labels + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {values.get(-1, 0.0)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+
+    def inc(self, amount, *label_values):
+        return [(self.name, json.dumps(label_values), 0, amount)]
+
+    def render(self, series):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        # Sin etiquetas el contador figura aunque todavía valga 0
+        for label_values, values in sorted((series or ({} if self.labels else {(): {}})).items()):
+            value = values.get(0, 0)
+            labels = ",".join(f'{name}="{v}"' for name, v in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+
+class MetricStore:
+    """
+    Metric values shared by every process using the same SQLite file: one
+    row per metric, label values and key (histogram bucket, -1 for the sum,
+    0 for a counter), only ever incremented.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS metric_values ("
+                " metric TEXT NOT NULL,"
+                " labels TEXT NOT NULL,"
+                " key INTEGER NOT NULL,"
+                " value REAL NOT NULL,"
+                " PRIMARY KEY (metric, labels, key))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def add(self, increments):
+        """
+        Applies [(metric, labels JSON, key, amount)] in one transaction.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO metric_values (metric, labels, key, value) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (metric, labels, key) DO UPDATE SET value = value + excluded.value",
+                increments,
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def series(self):
+        """
+        Returns {metric: {label values: {key: value}}}.
+        """
+        result = {}
+        conn = self._connect()
+        try:
+            for metric, labels, key, value in conn.execute("SELECT metric, labels, key, value FROM metric_values"):
+                result.setdefault(metric, {}).setdefault(tuple(json.loads(labels)), {})[key] = value
+        finally:
+            conn.close()
+        return result
+
+
+_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_store = None
+_store_lock = threading.Lock()
+_reports = Counter("report_requests_total", "Requests processed, by kind (report, extract) and status.",
+                   ("trace", "status"))
+_report_seconds = Histogram("report_duration_seconds", "Wall time of a whole request, by kind.",
+                            _SECONDS_BUCKETS, ("trace",))
+_stage_seconds = Histogram("report_stage_duration_seconds", "Wall time of each pipeline stage.",
+                           _SECONDS_BUCKETS, ("stage",))
+_stage_cpu = Counter("report_stage_cpu_seconds_total", "CPU time of each pipeline stage.", ("stage",))
+_pages = Histogram("report_pages", "Pages of the uploaded report.", (5, 10, 25, 50, 100, 250, 500, 1000))
+_items = Histogram("report_pathology_items", "ROJO pathology items per report.", (0, 5, 10, 25, 50, 100, 250, 500))
+_output_bytes = Histogram("report_output_bytes", "Size of the composed report.",
+                          tuple(2 ** n * 1024 * 1024 for n in range(-2, 8)))
+_summary_tokens = Counter("report_summary_tokens_total", "Tokens used by summary requests.")
+_peak_rss = Histogram("report_peak_rss_bytes", "Peak RSS of the process during each report.",
+                      tuple(2 ** n * 1024 * 1024 for n in range(5, 13)))
+
+
+_METRICS = (_reports, _report_seconds, _stage_seconds, _stage_cpu, _pages, _items, _output_bytes,
+            _summary_tokens, _peak_rss)
+
+
+def configure_metrics_store(path=None):
+    """
+    Replaces the metric store of this process (default TRACING_METRICS_PATH).
+    """
+    global _store
+    with _store_lock:
+        _store = MetricStore(path or TRACING_METRICS_PATH)
+
+
+def get_metrics_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetricStore(TRACING_METRICS_PATH)
+        return _store
+
+
+def record_trace(record):
+    """
+    Adds a finished trace (Trace.as_dict()) to the shared metrics. A store
+    error is logged, never raised: metrics must not fail a report.
+    """
+    values = record["values"]
+    increments = _reports.inc(1, record["trace"], record["status"])
+    increments += _report_seconds.observe(record["duration_s"], record["trace"])
+    for entry in record["stages"]:
+        increments += _stage_seconds.observe(entry["wall_s"], entry["stage"])
+        increments += _stage_cpu.inc(entry["cpu_s"], entry["stage"])
+    if "pages" in values:
+        increments += _pages.observe(values["pages"])
+    if "pathology_items" in values:
+        increments += _items.observe(values["pathology_items"])
+    if "output_bytes" in values:
+        increments += _output_bytes.observe(values["output_bytes"])
+    if values.get("summary_tokens"):
+        increments += _summary_tokens.inc(values["summary_tokens"])
+    increments += _peak_rss.observe(record["peak_rss_bytes"])
+    try:
+        get_metrics_store().add(increments)
+    except sqlite3.Error:
+        logger.exception("Could not record the %s trace in the metrics", record["trace"])
+
+
+def metrics_text():
+    """
+    Metrics of every process sharing the store, in the Prometheus text
+    exposition format.
+    """
+    series = get_metrics_store().series()
+    lines = []
+    for metric in _METRICS:
+        lines += metric.render(series.get(metric.name, {}))
+    return "\n".join(lines) + "\n"
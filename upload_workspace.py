@@ -0,0 +1,71 @@
+import mmap
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# Directorio para los archivos temporales de cada request (None = el del sistema)
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+
+
+class RequestWorkspace:
+    """
+    Private temporary directory holding the spooled upload and the composed
+    output of one request.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.input_path = os.path.join(path, "input.pdf")
+        self.output_path = os.path.join(path, "reporte_final.pdf")
+
+    def save_upload(self, file_storage):
+        """
+        Spools the upload to disk once, copying in chunks from Werkzeug's
+        own spooled stream instead of reading it into memory.
+        """
+        file_storage.save(self.input_path)
+        return self.input_path
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def create_request_workspace():
+    """
+    Creates a workspace the caller must `cleanup()`; for responses that are
+    streamed from the workspace after the view has returned.
+    """
+    return RequestWorkspace(tempfile.mkdtemp(prefix="informe-", dir=UPLOAD_TMP_DIR))
+
+
+@contextmanager
+def request_workspace():
+    """
+    Yields a RequestWorkspace and removes it, with every file inside,
+    when the block exits, whether it succeeded or failed.
+    """
+    workspace = create_request_workspace()
+    try:
+        yield workspace
+    finally:
+        workspace.cleanup()
+
+
+@contextmanager
+def open_mapped(path):
+    """
+    Read-only memory map of a file, usable as a binary stream by PyPDF2 and
+    pdfplumber. Readers share the OS page cache instead of copying the
+    whole file into a bytes object.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap no admite archivos vacíos
+            yield f
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()